@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Compare le chargement carte par carte et le chargement groupé (Card.load_many).
+Compte les requêtes AnkiConnect et mesure le temps total de chaque méthode.
+
+Nécessite Anki + AnkiConnect lancés.
+Usage: uv run python -m benchmarks.bench_card_loading "<deck_name>" [chunk_size]
+"""
+import sys
+import time
+
+from src.anki_interface import card as card_module
+from src.anki_interface import Card, get_cards_ids
+
+
+class _RequestCounter:
+    """Enveloppe anki_request pour compter les appels par action."""
+
+    def __init__(self, func):
+        self.func = func
+        self.counts: dict[str, int] = {}
+
+    def __call__(self, action, **params):
+        self.counts[action] = self.counts.get(action, 0) + 1
+        return self.func(action, **params)
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+
+def _measure(label: str, load) -> None:
+    original = card_module.anki_request
+    counter = _RequestCounter(original)
+    card_module.anki_request = counter
+    try:
+        start = time.perf_counter()
+        cards = load()
+        elapsed = time.perf_counter() - start
+    finally:
+        card_module.anki_request = original
+
+    loaded = sum(1 for c in cards if c.exists)
+    print(f"{label:<12} {loaded:>6} cartes  {counter.total:>6} requêtes  {elapsed:>8.3f} s  {counter.counts}")
+
+
+def main():
+    if len(sys.argv) < 2:
+        print('Usage: uv run python -m benchmarks.bench_card_loading "<deck_name>" [chunk_size]')
+        sys.exit(1)
+    deck_name = sys.argv[1]
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else card_module.CARDS_INFO_CHUNK_SIZE
+
+    card_ids = get_cards_ids(deck_name)
+    if not card_ids:
+        print(f"Aucune carte trouvée pour {deck_name!r} (Anki est-il lancé ?)")
+        sys.exit(1)
+
+    print(f"Deck {deck_name!r} : {len(card_ids)} cartes, chunk_size={chunk_size}")
+    _measure("par carte", lambda: [Card(cid) for cid in card_ids])
+    _measure("load_many", lambda: Card.load_many(card_ids, chunk_size=chunk_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Mesure le coût base de données par requête des routes qui lisent ou écrivent cards.db.
+
+Les fonctions des routes API sont appelées directement dans une même boucle
+asyncio (sans serveur ni client HTTP, dont le bruit masquerait le coût de la
+base), au-dessus d'une cards.db temporaire remplie de cartes synthétiques :
+data/ n'est pas touché. Pour chaque route : durée moyenne et médiane par
+requête. Mesure aussi l'accès seul : connexion par appel contre cards_db_conn,
+compare les lectures de payloads à cache vide et chaud, et affiche les plans
+des requêtes de file et de blocking (leur usage des index est vérifié par
+tests/test_query_plans.py).
+
+Usage: uv run python -m benchmarks.bench_cards_db [--cards 5000] [--requests 300]
+"""
+import argparse
+import asyncio
+import json
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+
+def _fill(conn, n_cards: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    card_ids = [str(1_600_000_000_000 + i) for i in range(n_cards)]
+    today = date.today()
+    rows = []
+    tags = []
+    for card_id in card_ids:
+        # Collection mûre : surtout des cartes en révision, échéances étalées sur l'année
+        card_type = rng.choice((0,) + (2,) * 17 + (1, 3))
+        if card_type == 0:
+            due_date = None
+        else:
+            due_date = (today + timedelta(days=rng.randint(-10, 365) if card_type == 2 else 0)).isoformat()
+        rows.append((
+            card_id, card_type, card_type, due_date,
+            rng.randint(0, 3000), rng.randint(0, 400), rng.choice((2.5, 2.3, 1.3)),
+            json.dumps({"Front": f"Recto {card_id}", "Back": f"Verso {card_id}"}),
+            json.dumps([f"img_{card_id}.png"] if rng.random() < 0.3 else []),
+            1 if rng.random() < 0.05 else 0,
+        ))
+        tags.extend((card_id, f"tag{k}") for k in rng.sample(range(40), rng.randint(0, 3)))
+    conn.executemany(
+        """INSERT INTO cards (card_id, card_type, queue, due_date, raw_due, interval, ease_factor,
+                              texts_json, image_filenames_json, is_blocking)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        rows,
+    )
+    conn.executemany("INSERT INTO card_tags (card_id, tag) VALUES (?, ?)", tags)
+    conn.commit()
+    return card_ids
+
+
+class _JsonRequest:
+    """Corps JSON d'une requête POST, tel que le lisent les routes (await request.json())."""
+
+    def __init__(self, payload: dict):
+        self._payload = payload
+
+    async def json(self) -> dict:
+        return self._payload
+
+
+def _measure(label: str, call, n: int) -> None:
+    call()  # chauffe
+    durations = []
+    for _ in range(n):
+        start = time.perf_counter()
+        response = call()
+        durations.append((time.perf_counter() - start) * 1000)
+        if response is not None and hasattr(response, "status_code"):
+            assert response.status_code < 400, response.body
+    print(f"{label:<32} moyenne {statistics.mean(durations):>7.3f} ms  "
+          f"médiane {statistics.median(durations):>7.3f} ms")
+
+
+def _print_query_plans(routes, conn) -> None:
+    """Affiche les plans (EXPLAIN QUERY PLAN) des requêtes de file et de blocking."""
+    today = date.today().toordinal()
+    for label, sql, params in (
+        ("/due_cards", routes._DUE_CARDS_SQL, (today,)),
+        ("/reschedule_distant_cards", routes._DISTANT_CARDS_SQL, (today + 5,)),
+        ("/blocking_cards", routes._BLOCKING_CARDS_SQL, ()),
+    ):
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        print(f"{label:<32} {' ; '.join(plan)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cards', type=int, default=5000)
+    parser.add_argument('--requests', type=int, default=300)
+    args = parser.parse_args()
+
+    from src.anki_sketching.api import routes
+    from src.anki_sketching.api.card_payloads import get_card_payload_cache
+    from src.graph import cards_db
+    from src.graph.media_manifest import reconcile_media
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        cards_db.get_cards_db_path = lambda: tmp_dir / "cards.db"
+        routes.get_data_dir = lambda: tmp_dir
+        routes.get_images_dir = lambda: tmp_dir / "images"
+
+        conn = cards_db.get_cards_db_conn()
+        cards_db.migrate_cards_db(conn)
+        card_ids = _fill(conn, args.cards)
+        print("Plans de requête")
+        _print_query_plans(routes, conn)
+
+        # Images référencées par les cartes, puis premier inventaire du manifeste
+        images_dir = tmp_dir / "images"
+        images_dir.mkdir()
+        for (image_json,) in conn.execute("SELECT image_filenames_json FROM cards"):
+            for filename in json.loads(image_json):
+                (images_dir / filename).write_bytes(b"")
+        start = time.perf_counter()
+        report = reconcile_media(conn, images_dir)
+        print(f"Manifeste des médias : {report['scanned']} fichiers inventoriés "
+              f"en {(time.perf_counter() - start) * 1000:.1f} ms")
+        conn.close()
+
+        def lookup(conn):
+            return conn.execute("SELECT interval FROM cards WHERE card_id = ?",
+                                (card_ids[0],)).fetchone()
+
+        def per_call_connection():
+            # Ancien accès : connexion ouverte, schéma rejoué et fermée à chaque appel
+            conn = sqlite3.connect(str(cards_db.get_cards_db_path()))
+            try:
+                conn.executescript(cards_db._SCHEMA_SQL)
+                return lookup(conn)
+            finally:
+                conn.close()
+
+        def pooled_connection():
+            with cards_db.cards_db_conn() as conn:
+                return lookup(conn)
+
+        print(f"Accès seul (une lecture par clé primaire), {args.requests * 10} appels")
+        _measure("connexion par appel", per_call_connection, args.requests * 10)
+        _measure("cards_db_conn (réutilisée)", pooled_connection, args.requests * 10)
+
+        loop = asyncio.new_event_loop()
+        rng = random.Random(1)
+        n = args.requests
+        print(f"{args.cards} cartes, {n} requêtes par route")
+
+        def get(handler):
+            return lambda: loop.run_until_complete(handler())
+
+        def post(handler, payload):
+            return lambda: loop.run_until_complete(handler(_JsonRequest(payload())))
+
+        _measure("GET /blocking_cards", get(routes.get_blocking_cards), n)
+        payload_cache = get_card_payload_cache()
+
+        def cold(call):
+            def run():
+                payload_cache.clear()
+                return call()
+            return run
+
+        _measure("GET /due_cards (cache vide)", cold(get(routes.get_due_cards)), n // 10)
+        _measure("GET /due_cards", get(routes.get_due_cards), n // 10)
+        _measure("GET /card_info_all", get(routes.card_info_all), n)
+        _measure("GET /all_tags", get(routes.all_tags_endpoint), n)
+        _measure("POST /get_cards_by_ids (20)", post(
+            routes.get_cards_by_ids, lambda: {"card_ids": rng.sample(card_ids, 20)}), n)
+        _measure("POST /get_cards_by_ids (500)", post(
+            routes.get_cards_by_ids, lambda: {"card_ids": rng.sample(card_ids, 500)}), n // 10)
+        _measure(f"POST /get_cards_by_ids ({len(card_ids)}, cache vide)", cold(post(
+            routes.get_cards_by_ids, lambda: {"card_ids": card_ids})), n // 30)
+        _measure(f"POST /get_cards_by_ids ({len(card_ids)})", post(
+            routes.get_cards_by_ids, lambda: {"card_ids": card_ids}), n // 30)
+        _measure("POST /set_card_info", post(
+            routes.set_card_info_endpoint, lambda: {"card_id": rng.choice(card_ids), "min_interval": 3}), n)
+        _measure("POST /review_card", post(
+            routes.review_card_endpoint, lambda: {"card_id": rng.choice(card_ids), "action": "maintain"}), n)
+        _measure("POST /add_tag (20)", post(
+            routes.add_tag_endpoint, lambda: {"card_ids": rng.sample(card_ids, 20), "tag": "bench"}), n)
+        _measure(f"POST /add_tag ({len(card_ids)})", post(
+            routes.add_tag_endpoint, lambda: {"card_ids": card_ids, "tag": "tout"}), n // 10)
+        _measure(f"POST /remove_tag ({len(card_ids)})", post(
+            routes.remove_tag_endpoint, lambda: {"card_ids": card_ids, "tag": "tout"}), n // 10)
+        _measure("GET /tag_cards", lambda: loop.run_until_complete(
+            routes.tag_cards_endpoint(f"tag{rng.randrange(40)}")), n)
+        local_ids = []
+
+        def create_local():
+            response = post(routes.create_local_card_endpoint, lambda: {"front_text": "recto"})()
+            local_ids.append(json.loads(response.body)["card"]["card_id"])
+            return response
+
+        _measure("POST /create_local_card", create_local, n)
+        _measure("POST /delete_local_card", post(
+            routes.delete_local_card_endpoint, lambda: {"card_id": local_ids.pop()}), n)
+        loop.close()
+        stats = payload_cache.stats()
+        print(f"Cache des payloads : {stats['entries']} entrées, taux de succès {stats['hit_rate']:.0%}, "
+              f"{stats['outdated']} versions périmées")
+
+if __name__ == "__main__":
+    main()
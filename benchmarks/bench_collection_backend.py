@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Compare la lecture directe de collection.anki2 avec le chargement via AnkiConnect,
+puis vérifie que les deux sources renvoient les mêmes données.
+
+La partie AnkiConnect (et la validation) nécessite Anki + AnkiConnect lancés.
+Usage: uv run python -m benchmarks.bench_collection_backend "<deck_name>" [collection_path]
+"""
+import sys
+import time
+
+from src.anki_interface import Card, get_cards_ids, validate_against_ankiconnect
+
+
+def main():
+    if len(sys.argv) < 2:
+        print('Usage: uv run python -m benchmarks.bench_collection_backend "<deck_name>" [collection_path]')
+        sys.exit(1)
+    deck_name = sys.argv[1]
+    collection_path = sys.argv[2] if len(sys.argv) > 2 else None
+
+    start = time.perf_counter()
+    cards = Card.from_collection(deck_name, collection_path)
+    elapsed = time.perf_counter() - start
+    if cards is None:
+        print("collection.anki2 introuvable ou illisible")
+        sys.exit(1)
+    print(f"collection.anki2 : {len(cards):>6} cartes  {elapsed:>8.3f} s")
+
+    card_ids = get_cards_ids(deck_name)
+    if not card_ids:
+        print("AnkiConnect indisponible : comparaison ignorée")
+        return
+
+    start = time.perf_counter()
+    remote = Card.load_many(card_ids)
+    elapsed = time.perf_counter() - start
+    print(f"AnkiConnect      : {sum(1 for c in remote if c.exists):>6} cartes  {elapsed:>8.3f} s")
+
+    report = validate_against_ankiconnect(deck_name, collection_path)
+    print(f"Validation : {report['checked']} cartes comparées, "
+          f"{len(report['mismatches'])} différences, "
+          f"{len(report['missing_in_collection'])} absentes de la collection, "
+          f"{len(report['missing_in_ankiconnect'])} absentes d'AnkiConnect")
+    for card_id, key, local, other in report['mismatches'][:20]:
+        print(f"  {card_id} {key}: collection={local!r} ankiconnect={other!r}")
+
+
+if __name__ == "__main__":
+    main()
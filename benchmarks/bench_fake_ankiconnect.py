@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Mesure import_deck et les helpers anki_interface contre le faux AnkiConnect.
+
+Pour chaque scénario : durée et nombre d'appels reçus par le serveur, par
+action (un multi compte aussi ses sous-actions). Un changement du nombre
+d'allers-retours se voit donc sans Anki Desktop. L'import écrit dans une
+cards.db et un dossier d'images temporaires : data/ n'est pas touché.
+
+Usage: uv run python -m benchmarks.bench_fake_ankiconnect [--cards 5000] [--latency 0.002]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from benchmarks.fake_ankiconnect import FakeAnkiConnect, SyntheticCollection
+
+
+def _report(fake: FakeAnkiConnect, label: str, func):
+    fake.reset_counts()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    counts = fake.snapshot()
+    http = counts.pop('http')
+    detail = ", ".join(f"{action}={n}" for action, n in sorted(counts.items()))
+    print(f"{label:<28} {elapsed:>8.3f} s  {http:>5} requêtes HTTP  ({detail})")
+    return result
+
+
+def _interactive_latency_during(label: str, background, probe, samples: int = 20) -> None:
+    """Mesure la latence d'appels interactifs pendant qu'un travail de fond tourne."""
+    worker = threading.Thread(target=background)
+    worker.start()
+    time.sleep(0.2)
+    latencies = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        probe()
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.02)
+    worker.join()
+    print(f"{label:<28} médiane {statistics.median(latencies):>7.1f} ms  max {max(latencies):>7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cards', type=int, default=5000)
+    parser.add_argument('--decks', type=int, default=4)
+    parser.add_argument('--media', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.002)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    collection = SyntheticCollection(args.cards, args.decks, args.media)
+    fake = FakeAnkiConnect(collection, latency=args.latency, failure_rate=args.failure_rate)
+    fake.start()
+    # Le client AnkiConnect lit l'URL à l'import : la fixer avant d'importer src
+    os.environ['ANKI_CONNECT_URL'] = fake.url
+
+    from src.anki_interface import (
+        Card, anki_request, get_all_decks, get_anki_client, get_cards_ids, invalidate_anki_cache,
+    )
+    from src.anki_sketching.api import routes
+    from src.anki_sketching.api import scheduling_refresh
+    from src.anki_sketching.api.scheduling_refresh import SchedulingRefresher
+    from src.graph import cards_db
+
+    print(f"{len(collection.cards)} cartes, {len(collection.decks)} paquets, "
+          f"{len(collection.media)} médias, latence {args.latency * 1000:.1f} ms")
+    deck = collection.decks[0]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        cards_db.get_cards_db_path = lambda: tmp_dir / "cards.db"
+        routes.get_images_dir = lambda: tmp_dir / "images"
+        routes.get_data_dir = lambda: tmp_dir
+        scheduling_refresh.get_data_dir = lambda: tmp_dir
+        routes._cached_crt = collection.crt
+
+        _report(fake, "get_all_decks", get_all_decks)
+        card_ids = _report(fake, "get_cards_ids", lambda: get_cards_ids(deck))
+        invalidate_anki_cache()
+        _report(fake, "Card.load_many", lambda: Card.load_many(card_ids))
+        _report(fake, "Card.load_many + images",
+                lambda: Card.load_many(card_ids, True, str(tmp_dir / "load_many_images")))
+        _report(fake, "Card.find_difficult_cards", lambda: Card.find_difficult_cards(deck))
+        _report(fake, "Card.get_deck_statistics", lambda: Card.get_deck_statistics(deck))
+
+        def import_deck(delta: bool):
+            invalidate_anki_cache()
+            return asyncio.run(routes.import_deck(deck_name=deck, delta=delta, source="ankiconnect"))
+
+        _report(fake, "import_deck (complet)", lambda: import_deck(False))
+        _report(fake, "import_deck (complet, 2e)", lambda: import_deck(False))
+        _report(fake, "import_deck (delta, 0 modif)", lambda: import_deck(True))
+        collection.touch(card_ids[:len(card_ids) // 20])
+        _report(fake, "import_deck (delta, 5 %)", lambda: import_deck(True))
+        _report(fake, "import_decks (dessin::*)", lambda: asyncio.run(
+            routes.import_decks(deck_pattern="dessin::*", delta=True)))
+
+        refresher = SchedulingRefresher()
+        collection.touch(card_ids[:len(card_ids) // 20])
+        report = _report(fake, "refresh (5 % révisées)",
+                         lambda: asyncio.run(refresher.refresh(collection.crt)))
+        print(f"  {report}")
+        _report(fake, "refresh (0 modif)", lambda: asyncio.run(refresher.refresh(collection.crt)))
+
+        # Requête interactive pendant un premier import (cartes écrites, images téléchargées)
+        def reimport():
+            for path in (tmp_dir / "images").glob("*"):
+                path.unlink()
+            with cards_db.cards_db_conn() as conn:
+                conn.execute("DELETE FROM cards")
+            import_deck(False)
+
+        _interactive_latency_during("version pendant import", reimport,
+                                    lambda: anki_request('version'))
+        print(f"Scheduler : {get_anki_client().scheduler.stats()}")
+
+    fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark de l'extraction texte/images des champs HTML Anki.
+
+Compare l'ancienne extraction (deux regex non compilées par champ) avec
+extract_fields sur des champs typiques : texte brut, mise en forme, images
+avec attributs supplémentaires, entités. Ne nécessite pas Anki.
+Usage: uv run python -m benchmarks.bench_html_fields [nombre_de_notes]
+"""
+import re
+import sys
+import time
+
+from src.anki_interface.html_fields import extract_fields
+
+# Champs représentatifs d'une collection de dessin
+_SAMPLE_FIELDS = [
+    {
+        'Front': {'value': 'Proportions du visage'},
+        'Back': {'value': 'Les yeux sont à mi-hauteur de la tête'},
+    },
+    {
+        'Front': {'value': '<div><b>Perspective</b> à 2 points&nbsp;: lignes d&#39;horizon</div>'},
+        'Back': {'value': '<div>Deux points de fuite<br>sur l&#39;horizon</div><img src="persp_2pts.jpg">'},
+    },
+    {
+        'Front': {'value': '<img src="main_face.png" style="width: 320px;" alt="main">'},
+        'Back': {'value': '<ul><li>Paume&nbsp;≈ carré</li><li>Doigts : 3 phalanges</li></ul>'},
+    },
+    {
+        'Front': {'value': 'Ombre portée vs ombre propre'},
+        'Back': {'value': ('<div><img class="big" src="ombre_1.jpg"></div>'
+                           '<div><img src=\'ombre_2.jpg\' width="200"></div>'
+                           '<span style="color: rgb(0, 0, 0);">Lumière &amp; volume</span>')},
+    },
+]
+
+
+def _legacy_extract(fields):
+    """Extraction d'origine (Card._load avant factorisation)."""
+    texts = {}
+    image_filenames = []
+    img_regex = r'<img src="([^"]+)">'
+    for field_name, content in fields.items():
+        html_content = content.get('value', '')
+        text_content = re.sub(r'<[^>]+>', '', html_content).strip()
+        if text_content:
+            texts[field_name] = text_content
+        for filename in re.findall(img_regex, html_content):
+            if filename not in image_filenames:
+                image_filenames.append(filename)
+    return texts, image_filenames
+
+
+def _run(label, extract, notes, repeat=5):
+    # Meilleur de plusieurs passes, pour lisser le bruit
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        images = 0
+        for fields in notes:
+            images += len(extract(fields)[1])
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<16} {best * 1000:>8.1f} ms  {len(notes) / best:>10.0f} notes/s  {images:>6} images trouvées")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    notes = [_SAMPLE_FIELDS[i % len(_SAMPLE_FIELDS)] for i in range(count)]
+    print(f"{count} notes")
+    _run("regex d'origine", _legacy_extract, notes)
+    _run("extract_fields", extract_fields, notes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Compare la sérialisation JSON de /due_cards et /load_positions avec json
+(bibliothèque standard) et orjson (extra `fast-json`).
+
+Les routes sont appelées directement au-dessus d'une cards.db et d'un
+card_positions.json temporaires remplis de cartes synthétiques : data/ n'est
+pas touché. fast_json est basculé d'un backend à l'autre entre les mesures ;
+« rendu seul » isole l'encodage du corps de la réponse, les autres lignes
+mesurent la route entière (décodage des colonnes JSON à cache vide compris).
+
+Usage: uv run python -m benchmarks.bench_json [--cards 10000] [--requests 30]
+"""
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+from pathlib import Path
+
+from benchmarks.bench_cards_db import _fill, _measure
+
+
+def _positions(card_ids: list[str], seed: int = 0) -> dict:
+    """Document card_positions.json d'un canevas contenant toutes les cartes."""
+    rng = random.Random(seed)
+    groups = {
+        f"group_{i}": {"name": f"Groupe {i}", "cards": rng.sample(card_ids, 5)}
+        for i in range(len(card_ids) // 50)
+    }
+    return {
+        "deck": "bench",
+        "decks": ["bench"],
+        "canvas": {"x": 565.17, "y": -436.91, "zoom": 0.49},
+        "cards": {
+            card_id: {"left": rng.randint(-5000, 5000), "top": rng.randint(-5000, 5000),
+                      "zIndex": i, "width": 330, "height": 220}
+            for i, card_id in enumerate(card_ids)
+        },
+        "groups": groups,
+        "arrows": [
+            {"from": rng.choice(card_ids), "to": rng.choice(card_ids),
+             "fromAnchor": "bottom", "toAnchor": "top"}
+            for _ in range(len(card_ids) // 5)
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cards', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=30)
+    args = parser.parse_args()
+
+    from fastapi.responses import JSONResponse
+
+    from src.anki_sketching.api import routes
+    from src.anki_sketching.api.card_payloads import get_card_payload_cache
+    from src.anki_sketching.api.responses import FastJSONResponse
+    from src.graph import cards_db
+    from src.utilities import fast_json
+
+    orjson = fast_json.orjson
+    if orjson is None:
+        print("orjson n'est pas installé : seul le backend json est mesuré")
+    backends = [("json", None)] + ([("orjson", orjson)] if orjson is not None else [])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        cards_db.get_cards_db_path = lambda: tmp_dir / "cards.db"
+        routes.get_images_dir = lambda: tmp_dir / "images"
+        routes.get_positions_file = lambda: tmp_dir / "card_positions.json"
+
+        conn = cards_db.get_cards_db_conn()
+        cards_db.migrate_cards_db(conn)
+        card_ids = _fill(conn, args.cards)
+        conn.close()
+        (tmp_dir / "card_positions.json").write_text(json.dumps(_positions(card_ids), indent=2))
+
+        loop = asyncio.new_event_loop()
+        payload_cache = get_card_payload_cache()
+        due = loop.run_until_complete(routes.get_due_cards())
+        due_content = json.loads(due.body)
+        positions_content = json.loads(routes.get_positions_file().read_text())
+        n = args.requests
+        print(f"{args.cards} cartes ({due_content['total']} dans la file du jour), {n} requêtes par mesure")
+
+        def cold_due_cards():
+            payload_cache.clear()
+            return loop.run_until_complete(routes.get_due_cards())
+
+        for name, backend in backends:
+            fast_json.orjson = backend
+            response_class = JSONResponse if backend is None else FastJSONResponse
+            print(f"[{name}]")
+            _measure("/due_cards rendu seul", lambda: response_class(due_content), n)
+            _measure("/due_cards (cache vide)", cold_due_cards, n)
+            _measure("/due_cards", lambda: loop.run_until_complete(routes.get_due_cards()), n)
+            _measure("/load_positions rendu seul", lambda: response_class(positions_content), n)
+            _measure("/load_positions", lambda: loop.run_until_complete(routes.load_positions()), n)
+        fast_json.orjson = orjson
+        loop.close()
+
+
+if __name__ == "__main__":
+    main()
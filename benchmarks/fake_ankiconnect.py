@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Faux serveur AnkiConnect servant une collection synthétique.
+
+Permet de mesurer import, synchronisation et médias sans Anki Desktop :
+mêmes formats de réponse que AnkiConnect v6 pour les actions utilisées par
+anki_interface, latence et taux d'échec injectables, compteur d'appels par
+action (pour repérer une régression du nombre d'allers-retours).
+
+Comme le vrai AnkiConnect (qui tourne sur le thread GUI d'Anki), les requêtes
+sont traitées une par une, sauf avec --concurrent.
+
+Usage: uv run python -m benchmarks.fake_ankiconnect [--cards 5000] [--port 8765] [--latency 0.005]
+Puis lancer l'application avec ANKI_CONNECT_URL=http://127.0.0.1:<port>.
+"""
+import argparse
+import base64
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+_DECK_QUERY_RE = re.compile(r'deck:"([^"]+)"|deck:(\S+)')
+
+
+class SyntheticCollection:
+    """
+    Collection Anki générée : paquets, cartes au format cardsInfo et médias.
+
+    Les cartes sont réparties en round-robin entre les paquets ; une carte sur
+    deux référence une image, tirée dans un ensemble de fichiers partagés
+    (plusieurs cartes pointent vers la même image, comme dans une vraie collection).
+    """
+
+    def __init__(self, n_cards: int = 1000, n_decks: int = 4, n_media: int = 100,
+                 media_size: int = 20_000, seed: int = 0):
+        rng = random.Random(seed)
+        self.crt = 1_600_000_000
+        self.decks = ["dessin"] + [f"dessin::paquet_{i}" for i in range(1, n_decks)]
+        self.media: Dict[str, bytes] = {
+            f"synth_{i:05d}.jpg": rng.randbytes(media_size) for i in range(n_media)
+        }
+        media_names = list(self.media)
+
+        self.cards: Dict[int, Dict[str, Any]] = {}
+        self.deck_cards: Dict[str, List[int]] = {deck: [] for deck in self.decks}
+        now = int(time.time())
+        for i in range(n_cards):
+            card_id = 1_700_000_000_000 + i
+            deck = self.decks[i % len(self.decks)]
+            card_type = rng.choice((0, 1, 2, 2, 2, 2))
+            back = f'<div>Réponse {i}&nbsp;: proportions</div>'
+            if media_names and i % 2 == 0:
+                back += f'<img src="{rng.choice(media_names)}" style="width: 300px;">'
+            self.cards[card_id] = {
+                'cardId': card_id,
+                'note': 1_600_000_000_000 + i,
+                'deckName': deck,
+                'modelName': 'Basic',
+                'fields': {
+                    'Front': {'value': f'<b>Question {i}</b>', 'order': 0},
+                    'Back': {'value': back, 'order': 1},
+                },
+                'type': card_type,
+                'queue': card_type if card_type != 3 else 1,
+                'due': rng.randint(1000, 1400) if card_type == 2 else i,
+                'interval': rng.randint(1, 400) if card_type == 2 else 0,
+                'factor': rng.choice((1800, 2100, 2300, 2500, 2700)) if card_type == 2 else 0,
+                'reps': rng.randint(0, 40),
+                'lapses': rng.randint(0, 6),
+                'nextReviews': ['<1m', '<10m', '1d', '4d'],
+                'mod': now - rng.randint(0, 86400 * 30),
+            }
+            self.deck_cards[deck].append(card_id)
+
+    def touch(self, card_ids: List[int]) -> None:
+        """Simule une modification dans Anki (pour mesurer l'import incrémental)."""
+        now = int(time.time())
+        for card_id in card_ids:
+            card = self.cards[card_id]
+            # Strictement croissant, même pour deux touch dans la même seconde
+            card['mod'] = max(now, card['mod'] + 1)
+            card['interval'] += 1
+            card['reps'] += 1
+
+    def find_cards(self, query: str) -> List[int]:
+        match = _DECK_QUERY_RE.search(query)
+        if not match or query.strip() in ('*', 'deck:*'):
+            return list(self.cards)
+        name = match.group(1) or match.group(2)
+        if name == '*':
+            return list(self.cards)
+        # Comme Anki, deck:"X" inclut les sous-paquets X::...
+        return [cid for deck in self.decks if deck == name or deck.startswith(name + '::')
+                for cid in self.deck_cards[deck]]
+
+
+class FakeAnkiConnect:
+    """
+    Serveur HTTP répondant comme AnkiConnect à partir d'une SyntheticCollection.
+
+    Args:
+        collection: Collection servie
+        latency: Temps de traitement simulé de chaque requête HTTP (secondes),
+            passé sur le « thread GUI » : les requêtes concurrentes l'attendent
+        failure_rate: Probabilité qu'une requête échoue au niveau HTTP (503)
+        error_rate: Probabilité qu'une action renvoie une erreur AnkiConnect
+        concurrent: Si False (défaut), une seule requête traitée à la fois
+        host, port: Adresse d'écoute (port 0 = port libre choisi par l'OS)
+    """
+
+    def __init__(self, collection: Optional[SyntheticCollection] = None, latency: float = 0.0,
+                 failure_rate: float = 0.0, error_rate: float = 0.0, concurrent: bool = False,
+                 host: str = '127.0.0.1', port: int = 0, seed: int = 0):
+        self.collection = collection or SyntheticCollection()
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.error_rate = error_rate
+        self.counts: Counter = Counter()
+        self.http_requests = 0
+        self._rng = random.Random(seed)
+        self._gui_lock = None if concurrent else threading.Lock()
+        self._counts_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+        self._actions: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+            'version': lambda p: 6,
+            'deckNames': lambda p: list(self.collection.decks),
+            'deckNamesAndIds': lambda p: {d: i + 1 for i, d in enumerate(self.collection.decks)},
+            'findCards': lambda p: self.collection.find_cards(p.get('query', '')),
+            'cardsInfo': lambda p: [self.collection.cards.get(cid, {}) for cid in p['cards']],
+            'cardsModTime': lambda p: [
+                {'cardId': cid, 'mod': self.collection.cards[cid]['mod']}
+                for cid in p['cards'] if cid in self.collection.cards
+            ],
+            'notesModTime': self._notes_mod_time,
+            'getEaseFactors': lambda p: [self.collection.cards.get(cid, {}).get('factor', 0)
+                                         for cid in p['cards']],
+            'retrieveMediaFile': self._retrieve_media,
+            'multi': self._multi,
+        }
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        """Démarre le serveur dans un thread et retourne son URL."""
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-ankiconnect",
+                                        daemon=True)
+        self._thread.start()
+        return self.url
+
+    def serve_forever(self) -> None:
+        """Sert les requêtes dans le thread courant (jusqu'à Ctrl+C)."""
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'FakeAnkiConnect':
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def reset_counts(self) -> None:
+        with self._counts_lock:
+            self.counts.clear()
+            self.http_requests = 0
+
+    def snapshot(self) -> Dict[str, int]:
+        """Appels par action depuis le dernier reset_counts (actions d'un multi comprises)."""
+        with self._counts_lock:
+            return dict(self.counts, http=self.http_requests)
+
+    # ---- actions ----
+
+    def _notes_mod_time(self, params: Dict[str, Any]) -> List[Dict[str, int]]:
+        wanted = set(params['notes'])
+        return [{'noteId': info['note'], 'mod': info['mod']}
+                for info in self.collection.cards.values() if info['note'] in wanted]
+
+    def _retrieve_media(self, params: Dict[str, Any]) -> Any:
+        data = self.collection.media.get(params['filename'])
+        # AnkiConnect renvoie false pour un fichier absent
+        return base64.b64encode(data).decode('ascii') if data is not None else False
+
+    def _multi(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [self._dispatch(sub['action'], sub.get('params', {})) for sub in params['actions']]
+
+    def _dispatch(self, action: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        with self._counts_lock:
+            self.counts[action] += 1
+        handler = self._actions.get(action)
+        if handler is None:
+            return {'result': None, 'error': 'unsupported action'}
+        if self.error_rate and self._rng.random() < self.error_rate:
+            return {'result': None, 'error': f'injected error ({action})'}
+        try:
+            return {'result': handler(params), 'error': None}
+        except (KeyError, TypeError) as e:
+            return {'result': None, 'error': str(e)}
+
+    def _handle(self, body: bytes) -> Optional[bytes]:
+        with self._counts_lock:
+            self.http_requests += 1
+        if self.failure_rate and self._rng.random() < self.failure_rate:
+            return None
+        request = json.loads(body)
+        if self._gui_lock is None:
+            response = self._process(request)
+        else:
+            with self._gui_lock:
+                response = self._process(request)
+        return json.dumps(response).encode('utf-8')
+
+    def _process(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._dispatch(request['action'], request.get('params', {}))
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # En-têtes et corps partent en deux écritures : sans TCP_NODELAY,
+            # l'ACK retardé ajouterait ~40 ms à chaque réponse
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                payload = fake._handle(body)
+                if payload is None:
+                    self.send_response(503)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Faux serveur AnkiConnect (collection synthétique)")
+    parser.add_argument('--cards', type=int, default=5000)
+    parser.add_argument('--decks', type=int, default=4)
+    parser.add_argument('--media', type=int, default=200)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--concurrent', action='store_true')
+    args = parser.parse_args()
+
+    collection = SyntheticCollection(args.cards, args.decks, args.media)
+    fake = FakeAnkiConnect(collection, latency=args.latency, failure_rate=args.failure_rate,
+                           error_rate=args.error_rate, concurrent=args.concurrent, port=args.port)
+    print(f"Faux AnkiConnect sur {fake.url} : {len(collection.cards)} cartes, "
+          f"{len(collection.decks)} paquets, {len(collection.media)} médias")
+    fake.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
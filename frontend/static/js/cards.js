@@ -25,92 +25,117 @@ function importDeck(deckName) {
     // canvas.innerHTML = '';
     // cards = [];
     
-    fetch('/import_deck', {
+    // Import en tâche de fond : la progression arrive en Server-Sent Events
+    fetch('/import_jobs', {
         method: 'POST',
         headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
-        body: `deck_name=${encodeURIComponent(deckName)}`
+        body: `deck_name=${encodeURIComponent(deckName)}&delta=true`
     })
     .then(response => response.json())
-    .then(data => {
-        if (data.error) {
-            alert(`Erreur: ${data.error}`);
-            return;
-        }
-        if (data.length === 0) {
-            alert('Aucune carte trouvée.');
+    .then(job => {
+        if (!job.job_id) {
+            alert(`Erreur: ${job.detail || job.error}`);
             return;
         }
+        const events = new EventSource(`/import_jobs/${job.job_id}/events`);
+        events.onmessage = (event) => {
+            const state = JSON.parse(event.data);
+            console.log(`Import ${deckName}: ${state.status} ${state.done}/${state.to_fetch ?? '?'} cartes, ` +
+                        `${Math.round(state.media_bytes / 1024)} Ko de médias` +
+                        (state.eta_seconds !== null ? `, ETA ${state.eta_seconds} s` : ''));
+            if (state.status === 'done') {
+                events.close();
+                fetch(`/import_jobs/${job.job_id}/cards`)
+                    .then(response => response.json())
+                    .then(renderImportedCards)
+                    .catch(error => console.error('Erreur:', error));
+            } else if (state.status === 'failed' || state.status === 'cancelled') {
+                events.close();
+                alert(`Import ${state.status}: ${state.error || ''}`);
+            }
+        };
+    })
+    .catch(error => {
+        alert('Erreur de communication.');
+        console.error('Erreur:', error);
+    });
+}
 
-        // Calcule la position de départ pour les nouvelles cartes
-        const bounds = getExistingCardsBounds();
-        const startX = bounds.minX;
-        const startY = bounds.maxY + 20; // 20px d'espacement
+function renderImportedCards(data) {
+    if (data.error) {
+        alert(`Erreur: ${data.error}`);
+        return;
+    }
+    if (data.length === 0) {
+        alert('Aucune carte trouvée.');
+        return;
+    }
 
-        data.forEach((card, index) => {
-            const cardBox = document.createElement('div');
-            cardBox.className = 'card-box';
-            cardBox.setAttribute('data-card-id', card.card_id);
-            
-            // Position en grille (4 par rangée) à partir de la position calculée
-            const cardsPerRow = 4;
-            const cardWidth = 320;
-            const cardHeight = 220;
-            const col = index % cardsPerRow;
-            const row = Math.floor(index / cardsPerRow);
-            
-            cardBox.style.left = (startX + col * cardWidth) + 'px';
-            cardBox.style.top = (startY + row * cardHeight) + 'px';
-            cardBox.style.zIndex = ++cardCounter;
-            
-            // Construire le contenu avec les infos de carte
-            let content = '';
-            
-            // Ajouter les informations de planification en haut
-            if (card.type !== undefined && card.type_label) {
-                const typeClass = card.type_label.toLowerCase().replace(' ', '-');
-                content += '<div class="card-info">';
-                content += `<span class="card-type ${typeClass}">${card.type_label}</span>`;
-                
-                if (card.due_display) {
-                    content += `<span class="card-due">${card.due_display}</span>`;
-                }
-                
-                content += '</div>';
-            }
+    // Calcule la position de départ pour les nouvelles cartes
+    const bounds = getExistingCardsBounds();
+    const startX = bounds.minX;
+    const startY = bounds.maxY + 20; // 20px d'espacement
+
+    data.forEach((card, index) => {
+        const cardBox = document.createElement('div');
+        cardBox.className = 'card-box';
+        cardBox.setAttribute('data-card-id', card.card_id);
+        
+        // Position en grille (4 par rangée) à partir de la position calculée
+        const cardsPerRow = 4;
+        const cardWidth = 320;
+        const cardHeight = 220;
+        const col = index % cardsPerRow;
+        const row = Math.floor(index / cardsPerRow);
+        
+        cardBox.style.left = (startX + col * cardWidth) + 'px';
+        cardBox.style.top = (startY + row * cardHeight) + 'px';
+        cardBox.style.zIndex = ++cardCounter;
+        
+        // Construire le contenu avec les infos de carte
+        let content = '';
+        
+        // Ajouter les informations de planification en haut
+        if (card.type !== undefined && card.type_label) {
+            const typeClass = card.type_label.toLowerCase().replace(' ', '-');
+            content += '<div class="card-info">';
+            content += `<span class="card-type ${typeClass}">${card.type_label}</span>`;
             
-            // Ajouter les champs de la carte
-            for (const [field, text] of Object.entries(card.texts)) {
-                content += `<strong>${field}:</strong><p>${text}</p>`;
+            if (card.due_display) {
+                content += `<span class="card-due">${card.due_display}</span>`;
             }
             
-            // Ajouter les images
-            card.images.forEach(imgPath => {
-                content += `<img src="${imgPath}" alt="Image de la carte">`;
-            });
-
-            content += buildTagsHTML(card.tags);
-
-            cardBox.innerHTML = `<div class="card-content">${content}</div>`;
-            canvas.appendChild(cardBox);
-            cards.push(cardBox); // Ajoute la carte au tableau
-            makeDraggable(cardBox);
-        });
+            content += '</div>';
+        }
         
-        // Charge les positions sauvegardées après avoir créé toutes les cartes
-        // Seulement si c'est le premier import (canvas vide au départ)
-        setTimeout(() => {
-            if (bounds.maxY === 0) { // Si c'était le premier import
-                loadCardPositions();
-            }
-        }, 200);
+        // Ajouter les champs de la carte
+        for (const [field, text] of Object.entries(card.texts)) {
+            content += `<strong>${field}:</strong><p>${text}</p>`;
+        }
         
-        // Applique la répulsion après avoir chargé toutes les cartes (si pas de positions sauvées)
-        setTimeout(() => physicsRepulsion(), 300);
-    })
-    .catch(error => {
-        alert('Erreur de communication.');
-        console.error('Erreur:', error);
+        // Ajouter les images
+        card.images.forEach(imgPath => {
+            content += `<img src="${imgPath}" alt="Image de la carte">`;
+        });
+
+        content += buildTagsHTML(card.tags);
+
+        cardBox.innerHTML = `<div class="card-content">${content}</div>`;
+        canvas.appendChild(cardBox);
+        cards.push(cardBox); // Ajoute la carte au tableau
+        makeDraggable(cardBox);
     });
+    
+    // Charge les positions sauvegardées après avoir créé toutes les cartes
+    // Seulement si c'est le premier import (canvas vide au départ)
+    setTimeout(() => {
+        if (bounds.maxY === 0) { // Si c'était le premier import
+            loadCardPositions();
+        }
+    }, 200);
+    
+    // Applique la répulsion après avoir chargé toutes les cartes (si pas de positions sauvées)
+    setTimeout(() => physicsRepulsion(), 300);
 }
 
 function makeDraggable(element) {
@@ -10,15 +10,58 @@ Fonctions utilitaires (compatibilité):
     get_cards_ids: Récupère les IDs de cartes d'un deck
     get_all_decks: Récupère tous les decks disponibles
     get_collection_crt: Récupère le timestamp de création de la collection
+
+Transport:
+    AnkiConnectClient: Client keep-alive partagé, avec lots d'actions via `multi`
+    get_anki_client: Retourne le client partagé
+    AsyncAnkiClient: Client asyncio (concurrence bornée, timeouts) pour les routes async
+    async_anki_request: Équivalent awaitable de anki_request
+
+Priorités:
+    anki_priority: Classe (INTERACTIVE / BULK) des appels AnkiConnect d'un bloc
+    AnkiRequestScheduler: File par priorité devant les appels (client.scheduler)
+
+Disponibilité:
+    AnkiHealthMonitor / get_health_monitor: Sonde AnkiConnect en arrière-plan (statut en cache)
+
+Cache:
+    cached_anki_request: anki_request avec cache TTL pour les actions en lecture seule
+    invalidate_anki_cache: Vide le cache (après un import)
+
+Lecture directe (sans AnkiConnect):
+    read_deck_cards_info: Lit les cartes d'un paquet dans collection.anki2
+
+Statistiques:
+    DeckColumns: Champs de planification en colonnes (cardsInfo ou lignes cards.db)
+    compute_deck_statistics: Agrégats vectorisés (NumPy si disponible)
 """
 
 from .card import Card
 from .get_card_information import get_card_information
 from .get_card_scheduling import get_card_scheduling_info, get_card_scheduling_info_with_absolute_date
-from .get_cards_ids import get_cards_ids
-from .get_all_decks import get_all_decks
+from .get_cards_ids import get_cards_ids, get_cards_ids_async
+from .get_all_decks import get_all_decks, get_all_decks_async
 from .get_collection_crt import get_collection_crt, find_all_profiles
-from .utils import anki_request
+from .collection_db import read_deck_cards_info, get_collection_media_dir, validate_against_ankiconnect
+from .utils import (
+    anki_request,
+    AnkiConnectClient,
+    AnkiBatch,
+    AnkiConnectError,
+    AnkiUnavailableError,
+    CircuitBreaker,
+    get_anki_client,
+)
+from .deck_stats import DeckColumns, compute_deck_statistics
+from .scheduler import AnkiRequestScheduler, anki_priority, current_priority, INTERACTIVE, BULK
+from .health import AnkiHealthMonitor, get_health_monitor
+from .async_client import AsyncAnkiClient, get_async_anki_client, async_anki_request
+from .cache import (
+    cached_anki_request,
+    async_cached_anki_request,
+    invalidate_anki_cache,
+    get_anki_cache_stats,
+)
 
 __all__ = [
     'Card',
@@ -26,8 +69,35 @@ __all__ = [
     'get_card_scheduling_info',
     'get_card_scheduling_info_with_absolute_date',
     'get_cards_ids',
+    'get_cards_ids_async',
     'get_all_decks',
+    'get_all_decks_async',
     'get_collection_crt',
     'find_all_profiles',
+    'read_deck_cards_info',
+    'get_collection_media_dir',
+    'validate_against_ankiconnect',
     'anki_request',
+    'AnkiConnectClient',
+    'AnkiBatch',
+    'AnkiConnectError',
+    'AnkiUnavailableError',
+    'CircuitBreaker',
+    'get_anki_client',
+    'AnkiRequestScheduler',
+    'anki_priority',
+    'current_priority',
+    'INTERACTIVE',
+    'BULK',
+    'AnkiHealthMonitor',
+    'get_health_monitor',
+    'AsyncAnkiClient',
+    'get_async_anki_client',
+    'async_anki_request',
+    'cached_anki_request',
+    'async_cached_anki_request',
+    'invalidate_anki_cache',
+    'get_anki_cache_stats',
+    'DeckColumns',
+    'compute_deck_statistics',
 ]
@@ -0,0 +1,115 @@
+"""
+Client asyncio pour AnkiConnect.
+
+Les routes FastAPI sont `async def` : un appel bloquant à anki_request gèle
+toute la boucle d'événements (sauvegarde du canvas, révisions...) tant
+qu'Anki n'a pas répondu. Ce client exécute les requêtes du transport
+keep-alive (AnkiConnectClient) dans le pool de threads, avec un nombre
+d'appels simultanés borné (par classe de priorité, pour qu'un import ne
+bloque pas les requêtes interactives) et un timeout par appel.
+"""
+import asyncio
+import contextvars
+import functools
+from typing import Any, Dict, List, Optional
+
+from .utils import AnkiConnectClient, get_anki_client, CARDS_INFO_CHUNK_SIZE
+from .scheduler import current_priority
+
+# AnkiConnect traite les requêtes sur le thread GUI d'Anki : inutile d'en
+# envoyer beaucoup en parallèle
+_MAX_CONCURRENCY = 4
+_TIMEOUT = 30.0
+
+
+class AsyncAnkiClient:
+    """
+    Version awaitable de AnkiConnectClient.
+
+    Attributes:
+        client: Transport synchrone sous-jacent (partagé par défaut)
+        timeout: Délai max (secondes) d'un appel avant abandon
+    """
+
+    def __init__(self, client: Optional[AnkiConnectClient] = None,
+                 max_concurrency: int = _MAX_CONCURRENCY, timeout: float = _TIMEOUT):
+        self.client = client or get_anki_client()
+        self.timeout = timeout
+        self._max_concurrency = max_concurrency
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Un sémaphore par priorité, créé paresseusement pour être lié à la boucle qui l'utilise
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Nouvelle boucle (scripts, asyncio.run successifs) : ceux de l'ancienne y sont inutilisables
+            self._loop = loop
+            self._semaphores = {}
+        priority = current_priority()
+        if priority not in self._semaphores:
+            self._semaphores[priority] = asyncio.Semaphore(self._max_concurrency)
+        return self._semaphores[priority]
+
+    async def _run(self, func, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        async with self._get_semaphore():
+            # Le thread du pool hérite du contexte (priorité de l'appelant)
+            context = contextvars.copy_context()
+            return await asyncio.wait_for(
+                loop.run_in_executor(None, context.run, functools.partial(func, *args, **kwargs)),
+                timeout=self.timeout,
+            )
+
+    async def request(self, action: str, **params) -> Any:
+        """Envoie une action. Retourne None en cas d'erreur ou de timeout."""
+        try:
+            return await self._run(self.client.request, action, **params)
+        except asyncio.TimeoutError:
+            print(f"AnkiConnect n'a pas répondu à {action!r} en {self.timeout:.0f} s")
+            return None
+
+    async def multi(self, actions: List[Dict[str, Any]]) -> Optional[List[Any]]:
+        """Envoie plusieurs actions en une requête `multi` (voir AnkiConnectClient.multi)."""
+        try:
+            return await self._run(self.client.multi, actions)
+        except asyncio.TimeoutError:
+            print(f"AnkiConnect n'a pas répondu au lot de {len(actions)} actions en {self.timeout:.0f} s")
+            return None
+
+    async def cards_info(self, card_ids: List[int],
+                         chunk_size: int = CARDS_INFO_CHUNK_SIZE) -> List[Dict[str, Any]]:
+        """
+        Récupère cardsInfo pour tous les IDs, par paquets envoyés en parallèle.
+
+        Returns:
+            Une entrée par ID, dans l'ordre de card_ids ({} si la carte est
+            introuvable ou si la requête de son paquet a échoué).
+        """
+        card_ids = list(card_ids)
+        chunks = [card_ids[i:i + chunk_size] for i in range(0, len(card_ids), chunk_size)]
+        responses = await asyncio.gather(
+            *(self.request('cardsInfo', cards=chunk) for chunk in chunks)
+        )
+        infos: List[Dict[str, Any]] = []
+        for chunk, response in zip(chunks, responses):
+            if not response or len(response) != len(chunk):
+                response = [{}] * len(chunk)
+            infos.extend(response)
+        return infos
+
+
+_async_client: Optional[AsyncAnkiClient] = None
+
+
+def get_async_anki_client() -> AsyncAnkiClient:
+    """Retourne le client asynchrone partagé par le processus."""
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncAnkiClient()
+    return _async_client
+
+
+async def async_anki_request(action: str, **params) -> Any:
+    """Équivalent awaitable de anki_request."""
+    return await get_async_anki_client().request(action, **params)
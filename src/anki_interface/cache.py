@@ -0,0 +1,217 @@
+"""
+Cache TTL pour les actions AnkiConnect en lecture seule (deckNames, findCards...).
+
+Chaque action cachable a sa propre durée de vie. Le cache est borné (éviction
+LRU) et compte ses hits/misses. Une entrée expirée depuis peu est encore servie
+pendant qu'un rafraîchissement tourne en arrière-plan : le chargement d'une
+page ne dépend donc pas de la latence d'Anki, sauf au tout premier appel.
+
+Les écritures côté Anki (ou un import) doivent appeler invalidate_anki_cache.
+Un appelant qui ne doit jamais lire une valeur en cache (liste des cartes
+d'un import) passe _fresh=True : la requête part toujours vers Anki et son
+résultat remplace l'entrée du cache.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from .async_client import async_anki_request
+from .utils import anki_request
+
+# Durée de vie (secondes) par action ; les actions absentes ne sont pas cachées
+ACTION_TTLS: Dict[str, float] = {
+    'deckNames': 60.0,
+    'deckNamesAndIds': 60.0,
+    'findCards': 30.0,
+    'modelNames': 300.0,
+    'getProfiles': 300.0,
+    'getActiveProfile': 300.0,
+    'version': 300.0,
+}
+
+# Durée pendant laquelle une entrée expirée reste servie pendant son rafraîchissement.
+# Pas de délai de grâce pour findCards : un import doit voir les cartes ajoutées.
+STALE_GRACES: Dict[str, float] = {
+    'deckNames': 600.0,
+    'deckNamesAndIds': 600.0,
+    'modelNames': 600.0,
+    'getProfiles': 600.0,
+    'getActiveProfile': 600.0,
+    'version': 600.0,
+}
+_MAX_ENTRIES = 256
+
+
+class TTLCache:
+    """Cache LRU borné dont les entrées expirent après un TTL propre à chacune."""
+
+    def __init__(self, max_entries: int = _MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, grace: float = 0.0) -> Tuple[bool, bool, Any]:
+        """
+        Cherche une entrée.
+
+        Returns:
+            (trouvée, expirée, valeur). Une entrée expirée depuis plus de grace
+            secondes est supprimée et compte comme absente.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, False, None
+            expires_at, value = entry
+            if now >= expires_at + grace:
+                del self._entries[key]
+                self.misses += 1
+                return False, False, None
+            self._entries.move_to_end(key)
+            if now >= expires_at:
+                self.stale_hits += 1
+                return True, True, value
+            self.hits += 1
+            return True, False, value
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, predicate=None) -> int:
+        """Supprime les entrées dont la clé vérifie predicate (toutes si None)."""
+        with self._lock:
+            keys = [k for k in self._entries if predicate is None or predicate(k)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            }
+
+
+_cache = TTLCache()
+_refreshing: set = set()
+_refreshing_lock = threading.Lock()
+_background_tasks: set = set()
+
+
+def _make_key(action: str, params: Dict[str, Any]) -> Tuple[str, str]:
+    return action, json.dumps(params, sort_keys=True)
+
+
+def _claim_refresh(key: Hashable) -> bool:
+    """Retourne True si l'appelant doit lancer le rafraîchissement de key."""
+    with _refreshing_lock:
+        if key in _refreshing:
+            return False
+        _refreshing.add(key)
+        return True
+
+
+def _store(key: Hashable, action: str, result: Any) -> None:
+    # Un échec (None) n'est jamais mis en cache
+    if result is not None:
+        _cache.set(key, result, ACTION_TTLS[action])
+
+
+def cached_anki_request(action: str, _fresh: bool = False, **params) -> Any:
+    """anki_request avec cache TTL pour les actions listées dans ACTION_TTLS.
+
+    Avec _fresh=True, le cache n'est pas lu (mais reçoit le résultat).
+    """
+    if action not in ACTION_TTLS:
+        return anki_request(action, **params)
+
+    key = _make_key(action, params)
+    if _fresh:
+        result = anki_request(action, **params)
+        _store(key, action, result)
+        return result
+    found, stale, value = _cache.get(key, grace=STALE_GRACES.get(action, 0.0))
+    if found and not stale:
+        return value
+    if found:
+        if _claim_refresh(key):
+            def refresh():
+                try:
+                    _store(key, action, anki_request(action, **params))
+                finally:
+                    with _refreshing_lock:
+                        _refreshing.discard(key)
+            threading.Thread(target=refresh, daemon=True).start()
+        return value
+
+    result = anki_request(action, **params)
+    _store(key, action, result)
+    return result
+
+
+async def async_cached_anki_request(action: str, _fresh: bool = False, **params) -> Any:
+    """Équivalent awaitable de cached_anki_request."""
+    if action not in ACTION_TTLS:
+        return await async_anki_request(action, **params)
+
+    key = _make_key(action, params)
+    if _fresh:
+        result = await async_anki_request(action, **params)
+        _store(key, action, result)
+        return result
+    found, stale, value = _cache.get(key, grace=STALE_GRACES.get(action, 0.0))
+    if found and not stale:
+        return value
+    if found:
+        if _claim_refresh(key):
+            async def refresh():
+                try:
+                    _store(key, action, await async_anki_request(action, **params))
+                finally:
+                    with _refreshing_lock:
+                        _refreshing.discard(key)
+            task = asyncio.get_running_loop().create_task(refresh())
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+        return value
+
+    result = await async_anki_request(action, **params)
+    _store(key, action, result)
+    return result
+
+
+def invalidate_anki_cache(action: Optional[str] = None) -> int:
+    """
+    Vide le cache (ou seulement les entrées d'une action).
+
+    À appeler après un import ou toute modification faite dans Anki.
+
+    Returns:
+        Nombre d'entrées supprimées
+    """
+    if action is None:
+        return _cache.invalidate()
+    return _cache.invalidate(lambda key: key[0] == action)
+
+
+def get_anki_cache_stats() -> Dict[str, Any]:
+    """Compteurs du cache (entrées, hits, hits périmés, misses, taux de hit)."""
+    return _cache.stats()
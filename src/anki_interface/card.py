@@ -1,12 +1,28 @@
 """
 Classe Card pour représenter une carte Anki avec toutes ses informations.
+
+Les champs de planification sont des attributs simples (__slots__, pas de
+__dict__ par instance). Le contenu est chargé paresseusement : le HTML des
+champs n'est analysé qu'au premier accès à texts / image_filenames, et les
+images ne sont téléchargées qu'au premier accès à images. Les parcours qui ne
+lisent que la planification (statistiques) n'analysent donc jamais de HTML.
+
+Une carte chargée sans contenu (load_scheduling) redemande ses champs à Anki
+au premier accès à texts / front / back : une requête cardsInfo par carte.
+Pour lire le contenu de nombreuses cartes, passer par load_many.
 """
 import os
-import re
-import base64
+import asyncio
+import contextvars
+import functools
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
-from .utils import anki_request
+from .utils import anki_request, CARDS_INFO_CHUNK_SIZE
+from .async_client import get_async_anki_client, async_anki_request
+from .media import fetch_media
+from .html_fields import extract_fields
+from .deck_stats import DeckColumns, compute_deck_statistics
+from .collection_db import read_deck_cards_info
 
 
 class Card:
@@ -16,8 +32,9 @@ class Card:
     Attributes:
         card_id (int): Identifiant unique de la carte
         
-        # Contenu
+        # Contenu (chargé au premier accès)
         texts (dict): Dictionnaire des champs texte {field_name: text_content}
+        image_filenames (list): Noms des fichiers images référencés par les champs
         images (list): Liste des chemins vers les images de la carte
         
         # Planification SRS
@@ -39,27 +56,46 @@ class Card:
         deck_name (str): Nom du deck contenant la carte
         note_id (int): ID de la note associée
         model_name (str): Nom du modèle de note
+        mod (int): Timestamp de dernière modification de la carte dans Anki
         
         # État de chargement
         _loaded (bool): Indique si les données ont été chargées
         _exists (bool): Indique si la carte existe dans Anki
+        _fields (dict): Champs HTML bruts en attente d'analyse (None une fois analysés
+            ou si la carte a été chargée sans contenu)
     """
     
-    def __init__(self, card_id: int, load_images: bool = False, image_output_dir: Optional[str] = None):
+    __slots__ = (
+        'card_id',
+        'interval', 'factor', 'due', 'type', 'queue',
+        'reps', 'lapses', 'next_reviews',
+        'deck_name', 'note_id', 'model_name', 'mod',
+        '_fields', '_texts', '_image_filenames', '_images', '_image_output_dir',
+        '_loaded', '_exists',
+    )
+    
+    def __init__(self, card_id: int, load_images: bool = False, image_output_dir: Optional[str] = None,
+                 card_info: Optional[Dict[str, Any]] = None, with_content: bool = True):
         """
         Initialise une carte et charge ses informations depuis Anki.
         
         Args:
             card_id: L'ID de la carte à charger
-            load_images: Si True, télécharge les images de la carte
+            load_images: Si True, télécharge les images de la carte au premier accès à images
             image_output_dir: Dossier où sauvegarder les images (requis si load_images=True)
+            card_info: Réponse cardsInfo déjà récupérée pour cette carte (évite la requête
+                AnkiConnect, utilisé par load_many). Un dict vide = carte introuvable.
+            with_content: Si False, seuls les champs de planification sont conservés ;
+                le contenu sera redemandé à Anki au premier accès à texts.
         """
         self.card_id = card_id
         
-        # Contenu
-        self.texts: Dict[str, str] = {}
-        self.images: List[str] = []
-        self.image_filenames: List[str] = []  # Basenames, always populated (no download)
+        # Contenu (None = pas encore chargé)
+        self._fields: Optional[Dict[str, Any]] = None
+        self._texts: Optional[Dict[str, str]] = None
+        self._image_filenames: Optional[List[str]] = None
+        self._images: Optional[List[str]] = None
+        self._image_output_dir: Optional[str] = image_output_dir if load_images else None
         
         # Planification SRS
         self.interval: int = 0
@@ -77,67 +113,52 @@ class Card:
         self.deck_name: str = ""
         self.note_id: int = 0
         self.model_name: str = ""
+        self.mod: int = 0
         
         # État
         self._loaded: bool = False
         self._exists: bool = False
         
         # Charger les données
-        self._load(load_images, image_output_dir)
+        if card_info is None:
+            self._load(with_content)
+        else:
+            self._load_from_info(card_info, with_content)
     
-    def _load(self, load_images: bool = False, image_output_dir: Optional[str] = None):
+    def _load(self, with_content: bool = True):
         """
         Charge toutes les informations de la carte depuis AnkiConnect.
         
         Args:
-            load_images: Si True, télécharge les images
-            image_output_dir: Dossier pour sauvegarder les images
+            with_content: Si False, ne conserve que la planification
         """
         card_info_list = anki_request('cardsInfo', cards=[self.card_id])
         if not card_info_list:
             self._exists = False
             return
         
-        self._exists = True
-        card_info = card_info_list[0]
+        self._load_from_info(card_info_list[0], with_content)
+    
+    def _load_from_info(self, card_info: Dict[str, Any], with_content: bool = True):
+        """
+        Remplit la carte depuis une entrée de la réponse cardsInfo.
         
-        # Extraire le contenu des champs
-        fields = card_info.get('fields', {})
-        img_regex = r'<img src="([^"]+)">'
+        Le HTML des champs est seulement mis de côté : il est analysé au premier
+        accès à texts ou image_filenames.
         
-        if load_images and image_output_dir:
-            os.makedirs(image_output_dir, exist_ok=True)
+        Args:
+            card_info: Dictionnaire renvoyé par AnkiConnect pour cette carte
+            with_content: Si False, les champs ne sont pas conservés
+        """
+        if not card_info:
+            # AnkiConnect renvoie {} pour un ID inconnu
+            self._exists = False
+            return
         
-        for field_name, content in fields.items():
-            html_content = content.get('value', '')
-            
-            # Extraire le texte (sans HTML)
-            text_content = re.sub(r'<[^>]+>', '', html_content).strip()
-            if text_content:
-                self.texts[field_name] = text_content
-
-            # Toujours extraire les noms de fichiers images (sans télécharger)
-            for filename in re.findall(img_regex, html_content):
-                if filename not in self.image_filenames:
-                    self.image_filenames.append(filename)
-
-            # Télécharger les images si demandé
-            if load_images and image_output_dir:
-                image_filenames = re.findall(img_regex, html_content)
-                for filename in image_filenames:
-                    output_path = os.path.join(image_output_dir, filename)
-                    if os.path.exists(output_path):
-                        self.images.append(output_path)
-                        continue
-                    image_data_b64 = anki_request('retrieveMediaFile', filename=filename)
-                    if image_data_b64:
-                        try:
-                            image_data = base64.b64decode(image_data_b64)
-                            with open(output_path, 'wb') as f:
-                                f.write(image_data)
-                            self.images.append(output_path)
-                        except (ValueError, TypeError):
-                            pass
+        self._exists = True
+        
+        if with_content:
+            self._fields = card_info.get('fields', {})
         
         # Extraire les informations de planification SRS
         self.interval = card_info.get('interval', 0)
@@ -155,9 +176,72 @@ class Card:
         self.deck_name = card_info.get('deckName', '')
         self.note_id = card_info.get('note', 0)
         self.model_name = card_info.get('modelName', '')
+        self.mod = card_info.get('mod', 0)
         
         self._loaded = True
     
+    def _ensure_content(self):
+        """Analyse les champs HTML (en les redemandant à Anki s'ils n'ont pas été gardés)."""
+        if self._texts is not None:
+            return
+        
+        fields = self._fields
+        if fields is None and self._exists:
+            card_info_list = anki_request('cardsInfo', cards=[self.card_id])
+            fields = card_info_list[0].get('fields', {}) if card_info_list else {}
+        
+        self._texts, self._image_filenames = extract_fields(fields or {})
+        # Le HTML brut n'est plus utile une fois analysé
+        self._fields = None
+    
+    def _attach_images(self, image_output_dir: str, available: set):
+        """Renseigne self.images avec les fichiers de la carte présents dans image_output_dir."""
+        self._images = [
+            os.path.join(image_output_dir, filename)
+            for filename in self.image_filenames
+            if filename in available
+        ]
+    
+    # ==================== CONTENU (CHARGEMENT PARESSEUX) ====================
+    
+    @property
+    def texts(self) -> Dict[str, str]:
+        """Champs texte sans HTML, analysés au premier accès."""
+        self._ensure_content()
+        return self._texts
+    
+    @texts.setter
+    def texts(self, value: Dict[str, str]):
+        self._ensure_content()
+        self._texts = value
+    
+    @property
+    def image_filenames(self) -> List[str]:
+        """Noms des fichiers images (basenames, sans téléchargement)."""
+        self._ensure_content()
+        return self._image_filenames
+    
+    @property
+    def images(self) -> List[str]:
+        """
+        Chemins des images de la carte.
+        
+        Si la carte a été créée avec load_images=True, les images sont téléchargées
+        au premier accès ; sinon la liste reste vide tant que download_images n'a
+        pas été appelé.
+        """
+        if self._images is None:
+            if self._image_output_dir and self._exists:
+                stats = fetch_media(self.image_filenames, self._image_output_dir)
+                self._attach_images(self._image_output_dir, stats['available'])
+            else:
+                return []
+        return self._images
+    
+    @images.setter
+    def images(self, value: List[str]):
+        self._images = value
+    
     # ==================== PROPRIÉTÉS CALCULÉES ====================
     
     @property
@@ -346,11 +430,15 @@ class Card:
         }
     
     def __repr__(self) -> str:
-        """Représentation textuelle de la carte."""
+        """Représentation textuelle de la carte (sans requête AnkiConnect)."""
         if not self.exists:
             return f"Card({self.card_id}) [NOT FOUND]"
         
-        front_preview = self.front[:30] + '...' if len(self.front) > 30 else self.front
+        if self._texts is None and self._fields is None:
+            # Chargée sans contenu : l'aperçu coûterait un aller-retour à Anki
+            front_preview = '…'
+        else:
+            front_preview = self.front[:30] + '...' if len(self.front) > 30 else self.front
         return (f"Card({self.card_id}) [{self.type_label}] "
                 f"interval={self.interval}d factor={self.factor_percent:.0f}% "
                 f"lapses={self.lapses} | {front_preview}")
@@ -379,7 +467,139 @@ class Card:
         if not card_ids:
             return []
         
-        return [cls(card_id, load_images, image_output_dir) for card_id in card_ids]
+        return cls.load_many(card_ids, load_images, image_output_dir)
+    
+    @classmethod
+    def load_many(cls, card_ids: List[int], load_images: bool = False,
+                  image_output_dir: Optional[str] = None,
+                  chunk_size: int = CARDS_INFO_CHUNK_SIZE,
+                  with_content: bool = True) -> List['Card']:
+        """
+        Charge plusieurs cartes avec une seule requête cardsInfo par paquet d'IDs.
+        
+        Une carte introuvable (ou un paquet dont la requête a échoué) donne un
+        objet Card avec exists == False, comme le constructeur.
+        
+        Args:
+            card_ids: IDs des cartes à charger
+            load_images: Si True, télécharge les images
+            image_output_dir: Dossier pour sauvegarder les images
+            chunk_size: Nombre d'IDs envoyés par requête cardsInfo
+            with_content: Si False, ne garde que la planification (voir load_scheduling)
+        
+        Returns:
+            Liste d'objets Card, dans l'ordre de card_ids
+        """
+        card_ids = list(card_ids)
+        cards = []
+        for start in range(0, len(card_ids), chunk_size):
+            chunk = card_ids[start:start + chunk_size]
+            infos = anki_request('cardsInfo', cards=chunk) or []
+            # cardsInfo renvoie une entrée par ID, dans l'ordre demandé ({} si absente)
+            if len(infos) != len(chunk):
+                infos = [{}] * len(chunk)
+            for card_id, card_info in zip(chunk, infos):
+                cards.append(cls(card_id, card_info=card_info, with_content=with_content))
+        
+        if load_images and image_output_dir:
+            cls.download_images(cards, image_output_dir)
+        return cards
+    
+    @classmethod
+    def load_scheduling(cls, card_ids: List[int],
+                        chunk_size: int = CARDS_INFO_CHUNK_SIZE) -> List['Card']:
+        """
+        Charge uniquement la planification de plusieurs cartes.
+        
+        Les champs HTML de la réponse cardsInfo sont ignorés sans être analysés :
+        chaque carte ne garde que ses entiers de planification, ce qui permet de
+        parcourir de très gros paquets. Le contenu reste accessible, mais il
+        est redemandé à Anki carte par carte (une requête cardsInfo au premier
+        accès à texts de chaque carte) : pour lire le contenu d'une liste,
+        utiliser load_many. repr() ne déclenche pas cette requête.
+        """
+        return cls.load_many(card_ids, chunk_size=chunk_size, with_content=False)
+    
+    @classmethod
+    def from_collection(cls, deck_name: str,
+                        collection_path: Optional[str] = None) -> Optional[List['Card']]:
+        """
+        Charge toutes les cartes d'un paquet en lisant directement collection.anki2.
+        
+        Ne passe pas par AnkiConnect (fonctionne Anki fermé). Les images ne sont pas
+        téléchargées : utiliser download_images avec media_dir=get_collection_media_dir().
+        
+        Args:
+            deck_name: Nom du paquet
+            collection_path: Chemin vers collection.anki2 (recherche auto si None)
+        
+        Returns:
+            Liste d'objets Card, ou None si la collection est illisible
+        """
+        infos = read_deck_cards_info(deck_name, collection_path)
+        if infos is None:
+            return None
+        return [cls(info['cardId'], card_info=info) for info in infos]
+    
+    @classmethod
+    def download_images(cls, cards: List['Card'], image_output_dir: str,
+                        max_workers: Optional[int] = None,
+                        media_dir: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Télécharge en une passe les images de plusieurs cartes et remplit leur attribut images.
+        
+        Les fichiers partagés entre cartes ne sont récupérés qu'une fois et ceux
+        déjà présents sur le disque ne sont pas retéléchargés.
+        
+        Args:
+            cards: Cartes déjà chargées (image_filenames renseigné)
+            image_output_dir: Dossier pour sauvegarder les images
+            max_workers: Nombre de téléchargements simultanés (défaut de fetch_media sinon)
+            media_dir: Dossier collection.media à copier au lieu de passer par AnkiConnect
+        
+        Returns:
+            Rapport de fetch_media (fichiers, octets, débits)
+        """
+        filenames = (fn for card in cards if card.exists for fn in card.image_filenames)
+        kwargs = {'max_workers': max_workers} if max_workers else {}
+        stats = fetch_media(filenames, image_output_dir, source_dir=media_dir, **kwargs)
+        for card in cards:
+            if card.exists:
+                card._attach_images(image_output_dir, stats['available'])
+        return stats
+    
+    @classmethod
+    async def aload_many(cls, card_ids: List[int], load_images: bool = False,
+                         image_output_dir: Optional[str] = None,
+                         chunk_size: int = CARDS_INFO_CHUNK_SIZE) -> List['Card']:
+        """
+        Version asynchrone de load_many : n'immobilise pas la boucle d'événements.
+        
+        Les paquets cardsInfo sont envoyés via le client asynchrone ; le téléchargement
+        des images tourne dans le pool de threads.
+        """
+        card_ids = list(card_ids)
+        infos = await get_async_anki_client().cards_info(card_ids, chunk_size)
+        
+        cards = [cls(card_id, card_info=card_info) for card_id, card_info in zip(card_ids, infos)]
+        
+        if load_images and image_output_dir:
+            # Le thread du pool hérite du contexte (priorité de l'appelant)
+            await asyncio.get_running_loop().run_in_executor(
+                None, contextvars.copy_context().run,
+                functools.partial(cls.download_images, cards, image_output_dir)
+            )
+        return cards
+    
+    @classmethod
+    async def afrom_deck(cls, deck_name: str, load_images: bool = False,
+                         image_output_dir: Optional[str] = None) -> List['Card']:
+        """Version asynchrone de from_deck."""
+        card_ids = await async_anki_request('findCards', query=f'deck:"{deck_name}"')
+        if not card_ids:
+            return []
+        
+        return await cls.aload_many(card_ids, load_images, image_output_dir)
     
     @classmethod
     def find_difficult_cards(cls, deck_name: Optional[str] = None, 
@@ -392,18 +612,24 @@ class Card:
             max_factor: Facteur maximum pour considérer une carte comme difficile
         
         Returns:
-            Liste de cartes difficiles triées par facteur croissant
+            Liste de cartes difficiles triées par facteur croissant, contenu
+            compris (chargé par paquets, pas de requête par carte à l'affichage)
         """
         query = f'deck:"{deck_name}"' if deck_name else '*'
         card_ids = anki_request('findCards', query=query)
         if not card_ids:
             return []
         
-        difficult_cards = []
-        for card_id in card_ids:
-            card = cls(card_id)
-            if card.exists and 0 < card.factor < max_factor:
-                difficult_cards.append(card)
+        # getEaseFactors ne renvoie que les facteurs : on ne charge ensuite (contenu
+        # compris, une requête cardsInfo par paquet) que les cartes difficiles
+        factors = anki_request('getEaseFactors', cards=card_ids)
+        if factors and len(factors) == len(card_ids):
+            card_ids = [cid for cid, factor in zip(card_ids, factors) if 0 < factor < max_factor]
+        
+        difficult_cards = [
+            card for card in cls.load_many(card_ids)
+            if card.exists and 0 < card.factor < max_factor
+        ]
         
         # Trier par facteur croissant
         difficult_cards.sort(key=lambda c: c.factor)
@@ -414,41 +640,20 @@ class Card:
         """
         Calcule des statistiques sur un deck.
         
+        Seuls les champs de planification sont lus (une requête cardsInfo par
+        paquet d'IDs, sans créer d'objets Card) et versés dans les colonnes
+        paquet par paquet : la réponse d'un seul paquet est en mémoire à la
+        fois. Les agrégats sont calculés par compute_deck_statistics.
+        
         Args:
             deck_name: Nom du deck
         
         Returns:
             Dictionnaire de statistiques
         """
-        cards = cls.from_deck(deck_name)
-        if not cards:
-            return {
-                'total_cards': 0,
-                'error': 'No cards found'
-            }
-        
-        review_cards = [c for c in cards if c.is_review]
-        
-        stats = {
-            'total_cards': len(cards),
-            'new_cards': sum(1 for c in cards if c.is_new),
-            'learning_cards': sum(1 for c in cards if c.is_learning),
-            'review_cards': len(review_cards),
-            'suspended_cards': sum(1 for c in cards if c.is_suspended),
-        }
-        
-        if review_cards:
-            total_interval = sum(c.interval for c in review_cards)
-            total_factor = sum(c.factor for c in review_cards)
-            total_lapses = sum(c.lapses for c in review_cards)
-            
-            stats.update({
-                'avg_interval': total_interval / len(review_cards),
-                'avg_factor': total_factor / len(review_cards),
-                'avg_factor_percent': (total_factor / len(review_cards)) / 10,
-                'avg_lapses': total_lapses / len(review_cards),
-                'difficult_cards': sum(1 for c in review_cards if c.is_difficult),
-                'easy_cards': sum(1 for c in review_cards if c.is_easy),
-            })
-        
-        return stats
+        card_ids = anki_request('findCards', query=f'deck:"{deck_name}"') or []
+        chunks = (
+            anki_request('cardsInfo', cards=card_ids[start:start + CARDS_INFO_CHUNK_SIZE]) or []
+            for start in range(0, len(card_ids), CARDS_INFO_CHUNK_SIZE)
+        )
+        return compute_deck_statistics(DeckColumns.from_card_info_chunks(chunks))
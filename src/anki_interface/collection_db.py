@@ -0,0 +1,197 @@
+"""
+Lecture directe (lecture seule) des cartes dans collection.anki2, sans AnkiConnect.
+
+Même principe que get_collection_crt : on ouvre la base SQLite de la collection
+en mode lecture seule, avec un repli immutable=1 si Anki garde le verrou. Un
+paquet entier (planification + champs des notes) est lu en quelques requêtes
+ensemblistes, au lieu d'une requête HTTP par paquet de cartes.
+
+Les entrées produites ont le format de la réponse cardsInfo d'AnkiConnect et
+peuvent donc être passées telles quelles à Card(card_id, card_info=...).
+"""
+import json
+import os
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+from .get_collection_crt import _find_collection_path
+
+# Attente du verrou Anki avant de passer en lecture immutable
+_DB_TIMEOUT = 2
+
+# Séparateur des champs dans notes.flds et des niveaux de paquet dans decks.name
+_FIELD_SEP = '\x1f'
+
+
+def get_collection_media_dir(collection_path: Optional[str] = None) -> Optional[str]:
+    """Retourne le dossier collection.media à côté de collection.anki2, ou None."""
+    if collection_path is None:
+        collection_path = _find_collection_path()
+    if collection_path is None:
+        return None
+    media_dir = os.path.join(os.path.dirname(collection_path), 'collection.media')
+    return media_dir if os.path.isdir(media_dir) else None
+
+
+def read_deck_cards_info(deck_name: str,
+                         collection_path: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+    """
+    Lit toutes les cartes d'un paquet (sous-paquets compris) dans collection.anki2.
+
+    Args:
+        deck_name: Nom du paquet (ex: "dessin::encre")
+        collection_path: Chemin vers collection.anki2 (recherche auto si None)
+
+    Returns:
+        Liste d'entrées au format cardsInfo (plus 'noteMod', date de modification
+        de la note), triées par card_id, ou None si la collection est illisible.
+    """
+    if collection_path is None:
+        collection_path = _find_collection_path()
+    if collection_path is None or not os.path.exists(collection_path):
+        return None
+
+    conn = _connect_readonly(collection_path)
+    if conn is None:
+        return None
+    try:
+        decks, models = _load_decks_and_models(conn)
+        deck_ids = [
+            did for did, name in decks.items()
+            if name == deck_name or name.startswith(f"{deck_name}::")
+        ]
+        if not deck_ids:
+            return []
+
+        placeholders = ",".join("?" for _ in deck_ids)
+        rows = conn.execute(f"""
+            SELECT c.id, c.nid, c.did, c.odid, c.mod, c.type, c.queue, c.due,
+                   c.ivl, c.factor, c.reps, c.lapses, n.mid, n.mod, n.flds
+            FROM cards c JOIN notes n ON n.id = c.nid
+            WHERE c.did IN ({placeholders}) OR c.odid IN ({placeholders})
+            ORDER BY c.id
+        """, deck_ids + deck_ids).fetchall()
+    except sqlite3.DatabaseError:
+        return None
+    finally:
+        conn.close()
+
+    infos = []
+    for (card_id, note_id, did, odid, mod, card_type, queue, due,
+         ivl, factor, reps, lapses, mid, note_mod, flds) in rows:
+        model_name, field_names = models.get(mid, ('', []))
+        values = flds.split(_FIELD_SEP)
+        fields = {}
+        for order, value in enumerate(values):
+            name = field_names[order] if order < len(field_names) else f"Field{order + 1}"
+            fields[name] = {'value': value, 'order': order}
+        infos.append({
+            'cardId': card_id,
+            'note': note_id,
+            'deckName': decks.get(odid or did, ''),
+            'modelName': model_name,
+            'fields': fields,
+            'interval': ivl,
+            'factor': factor,
+            'due': due,
+            'type': card_type,
+            'queue': queue,
+            'reps': reps,
+            'lapses': lapses,
+            'mod': mod,
+            'noteMod': note_mod,
+        })
+    return infos
+
+
+def _connect_readonly(collection_path: str) -> Optional[sqlite3.Connection]:
+    """Ouvre la collection en lecture seule, avec repli immutable si verrouillée."""
+    for uri, timeout in (
+        (f'file:{collection_path}?mode=ro', _DB_TIMEOUT),
+        # Repli : lecture sans verrou (peut manquer les écritures en cours d'Anki)
+        (f'file:{collection_path}?mode=ro&immutable=1', 0),
+    ):
+        try:
+            conn = sqlite3.connect(uri, uri=True, timeout=timeout)
+            conn.execute('SELECT 1 FROM cards LIMIT 1').fetchall()
+            return conn
+        except (sqlite3.OperationalError, sqlite3.DatabaseError):
+            continue
+    return None
+
+
+def _load_decks_and_models(conn: sqlite3.Connection) -> tuple:
+    """
+    Retourne ({deck_id: nom}, {notetype_id: (nom, [noms des champs])}).
+
+    Gère les deux schémas : tables decks/notetypes/fields (Anki ≥ 2.1.28)
+    ou JSON dans col.decks / col.models (anciennes collections).
+    """
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+    if {'decks', 'notetypes', 'fields'} <= tables:
+        decks = {
+            did: name.replace(_FIELD_SEP, '::')
+            for did, name in conn.execute('SELECT id, name FROM decks')
+        }
+        models: Dict[int, tuple] = {
+            ntid: (name, []) for ntid, name in conn.execute('SELECT id, name FROM notetypes')
+        }
+        for ntid, name in conn.execute('SELECT ntid, name FROM fields ORDER BY ntid, ord'):
+            if ntid in models:
+                models[ntid][1].append(name)
+        return decks, models
+
+    decks_json, models_json = conn.execute('SELECT decks, models FROM col').fetchone()
+    decks = {int(did): d['name'] for did, d in json.loads(decks_json or '{}').items()}
+    models = {
+        int(mid): (m['name'], [f['name'] for f in sorted(m.get('flds', []), key=lambda f: f['ord'])])
+        for mid, m in json.loads(models_json or '{}').items()
+    }
+    return decks, models
+
+
+# Champs comparés par validate_against_ankiconnect
+_VALIDATED_KEYS = ('note', 'deckName', 'modelName', 'interval', 'factor', 'due',
+                   'type', 'queue', 'reps', 'lapses')
+
+
+def validate_against_ankiconnect(deck_name: str, collection_path: Optional[str] = None,
+                                 chunk_size: int = 500) -> Dict[str, Any]:
+    """
+    Compare la lecture directe avec cardsInfo d'AnkiConnect pour un paquet.
+
+    Nécessite Anki + AnkiConnect lancés.
+
+    Returns:
+        dict {checked, missing_in_collection, missing_in_ankiconnect, mismatches}
+        où mismatches est une liste de (card_id, clé, valeur collection, valeur AnkiConnect).
+    """
+    from .utils import anki_request
+
+    direct = {info['cardId']: info for info in (read_deck_cards_info(deck_name, collection_path) or [])}
+    card_ids = anki_request('findCards', query=f'deck:"{deck_name}"') or []
+
+    remote = {}
+    for start in range(0, len(card_ids), chunk_size):
+        for info in anki_request('cardsInfo', cards=card_ids[start:start + chunk_size]) or []:
+            if info:
+                remote[info['cardId']] = info
+
+    mismatches = []
+    for card_id in sorted(direct.keys() & remote.keys()):
+        local, other = direct[card_id], remote[card_id]
+        for key in _VALIDATED_KEYS:
+            if local.get(key) != other.get(key):
+                mismatches.append((card_id, key, local.get(key), other.get(key)))
+        local_fields = {k: v['value'] for k, v in local['fields'].items()}
+        other_fields = {k: v['value'] for k, v in other.get('fields', {}).items()}
+        if local_fields != other_fields:
+            mismatches.append((card_id, 'fields', local_fields, other_fields))
+
+    return {
+        'checked': len(direct.keys() & remote.keys()),
+        'missing_in_collection': sorted(remote.keys() - direct.keys()),
+        'missing_in_ankiconnect': sorted(direct.keys() - remote.keys()),
+        'mismatches': mismatches,
+    }
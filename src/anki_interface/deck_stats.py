@@ -0,0 +1,248 @@
+"""
+Statistiques de paquet calculées sur des colonnes de planification.
+
+Les champs de planification (type, queue, interval, factor, lapses) sont
+chargés une seule fois sous forme de colonnes, puis tous les agrégats sont
+calculés par passes vectorisées NumPy : comptes par type et par file,
+distributions des intervalles et des facteurs, histogramme des oublis.
+
+NumPy est optionnel (extra `stats`) : sans lui, les mêmes agrégats sont
+calculés par un seul parcours Python des colonnes.
+"""
+from array import array
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - dépend de l'environnement
+    np = None
+
+# Bornes des tranches d'intervalle (jours) : <1, 1-6, 7-29, 30-89, 90-179, 180-364, 365+
+INTERVAL_EDGES = (1, 7, 30, 90, 180, 365)
+INTERVAL_LABELS = ('<1', '1-6', '7-29', '30-89', '90-179', '180-364', '365+')
+# Mêmes seuils que Card.difficulty_level
+EASE_EDGES = (2000, 2300, 2500, 2700)
+EASE_LABELS = ('very_hard', 'hard', 'medium', 'easy', 'very_easy')
+# Oublis regroupés au-delà de ce nombre
+MAX_LAPSE_BUCKET = 5
+QUEUES = (-3, -2, -1, 0, 1, 2, 3)
+
+_COLUMNS = ('type', 'queue', 'interval', 'factor', 'lapses')
+
+
+class DeckColumns:
+    """Champs de planification d'un ensemble de cartes, une colonne d'entiers par champ."""
+
+    __slots__ = _COLUMNS
+
+    def __init__(self, type: Sequence[int], queue: Sequence[int], interval: Sequence[int],
+                 factor: Sequence[int], lapses: Sequence[int]):
+        if np is not None:
+            type, queue, interval, factor, lapses = (
+                np.asarray(col, dtype=np.int64) for col in (type, queue, interval, factor, lapses)
+            )
+        self.type = type
+        self.queue = queue
+        self.interval = interval
+        self.factor = factor
+        self.lapses = lapses
+
+    def __len__(self) -> int:
+        return len(self.type)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[int, int, int, int, int]]) -> 'DeckColumns':
+        """Construit les colonnes depuis des tuples (type, queue, interval, factor, lapses)."""
+        rows = list(rows)
+        if np is not None:
+            matrix = np.array(rows, dtype=np.int64).reshape(-1, len(_COLUMNS))
+            return cls(*matrix.T)
+        if not rows:
+            return cls(*(array('q') for _ in _COLUMNS))
+        return cls(*(array('q', col) for col in zip(*rows)))
+
+    @classmethod
+    def from_card_infos(cls, infos: Iterable[Dict[str, Any]]) -> 'DeckColumns':
+        """Construit les colonnes depuis des entrées cardsInfo (les {} sont ignorées)."""
+        return cls.from_rows(
+            (info.get('type', 0), info.get('queue', 0), info.get('interval', 0),
+             info.get('factor', 0), info.get('lapses', 0))
+            for info in infos if info
+        )
+
+    @classmethod
+    def from_card_info_chunks(cls, chunks: Iterable[List[Dict[str, Any]]]) -> 'DeckColumns':
+        """Construit les colonnes paquet cardsInfo par paquet.
+
+        Les entiers de planification de chaque paquet sont ajoutés aux colonnes
+        avant de lire le suivant : les dicts cardsInfo (HTML des champs compris)
+        d'un seul paquet sont en mémoire à la fois. chunks doit donc être un
+        itérable paresseux (générateur qui fait la requête à chaque pas).
+        """
+        columns = tuple(array('q') for _ in _COLUMNS)
+        for infos in chunks:
+            for info in infos:
+                if info:
+                    for col, key in zip(columns, _COLUMNS):
+                        col.append(info.get(key, 0))
+            # Libère le paquet (et sa dernière entrée) avant de demander le suivant
+            infos = info = None
+        return cls(*columns)
+
+
+def compute_deck_statistics(columns: DeckColumns) -> Dict[str, Any]:
+    """
+    Calcule les statistiques d'un paquet.
+
+    Les clés de Card.get_deck_statistics sont conservées ; s'y ajoutent
+    per_queue, interval_distribution, ease_distribution et lapse_histogram
+    (ces trois dernières sur les cartes en révision).
+
+    Args:
+        columns: Colonnes de planification des cartes du paquet
+
+    Returns:
+        Dictionnaire de statistiques
+    """
+    if len(columns) == 0:
+        return {
+            'total_cards': 0,
+            'error': 'No cards found'
+        }
+    if np is not None:
+        return _compute_numpy(columns)
+    return _compute_python(columns)
+
+
+def _compute_numpy(c: DeckColumns) -> Dict[str, Any]:
+    known_queue = (c.queue >= QUEUES[0]) & (c.queue <= QUEUES[-1])
+    queue_counts = np.bincount(c.queue[known_queue] - QUEUES[0], minlength=len(QUEUES))
+    review = c.type == 2
+    stats = {
+        'total_cards': int(len(c)),
+        'new_cards': int(np.count_nonzero(c.type == 0)),
+        'learning_cards': int(np.count_nonzero((c.type == 1) | (c.type == 3))),
+        'review_cards': int(np.count_nonzero(review)),
+        'suspended_cards': int(queue_counts[QUEUES.index(-1)]),
+        'per_queue': {str(q): int(n) for q, n in zip(QUEUES, queue_counts)},
+    }
+
+    intervals = c.interval[review]
+    factors = c.factor[review]
+    lapses = c.lapses[review]
+    if len(intervals):
+        rated = factors[factors > 0]
+        stats.update({
+            'avg_interval': float(intervals.mean()),
+            'avg_factor': float(factors.mean()),
+            'avg_factor_percent': float(factors.mean()) / 10,
+            'avg_lapses': float(lapses.mean()),
+            'difficult_cards': int(np.count_nonzero((factors > 0) & (factors < 2300))),
+            'easy_cards': int(np.count_nonzero(factors >= 2500)),
+            'interval_distribution': _distribution(
+                INTERVAL_LABELS,
+                np.bincount(np.searchsorted(INTERVAL_EDGES, intervals, side='right'),
+                            minlength=len(INTERVAL_LABELS)),
+                np.percentile(intervals, (50, 90)),
+                intervals.max(),
+            ),
+            'ease_distribution': _distribution(
+                EASE_LABELS,
+                np.bincount(np.searchsorted(EASE_EDGES, rated, side='right'),
+                            minlength=len(EASE_LABELS)),
+                np.percentile(rated, (50, 90)) if len(rated) else (0, 0),
+                rated.max() if len(rated) else 0,
+            ),
+            'lapse_histogram': _lapse_histogram(
+                np.bincount(np.minimum(lapses, MAX_LAPSE_BUCKET), minlength=MAX_LAPSE_BUCKET + 1)
+            ),
+        })
+    return stats
+
+
+def _compute_python(c: DeckColumns) -> Dict[str, Any]:
+    # Un seul parcours des colonnes, mêmes agrégats que la version NumPy
+    type_counts = [0, 0, 0, 0]
+    queue_counts = dict.fromkeys(QUEUES, 0)
+    interval_counts = [0] * len(INTERVAL_LABELS)
+    ease_counts = [0] * len(EASE_LABELS)
+    lapse_counts = [0] * (MAX_LAPSE_BUCKET + 1)
+    intervals: List[int] = []
+    rated: List[int] = []
+    total_factor = total_lapses = difficult = easy = 0
+
+    for card_type, queue, interval, factor, lapses in zip(c.type, c.queue, c.interval, c.factor, c.lapses):
+        if 0 <= card_type < 4:
+            type_counts[card_type] += 1
+        if queue in queue_counts:
+            queue_counts[queue] += 1
+        if card_type != 2:
+            continue
+        intervals.append(interval)
+        interval_counts[bisect_right(INTERVAL_EDGES, interval)] += 1
+        total_factor += factor
+        total_lapses += lapses
+        lapse_counts[min(lapses, MAX_LAPSE_BUCKET)] += 1
+        if factor > 0:
+            rated.append(factor)
+            ease_counts[bisect_right(EASE_EDGES, factor)] += 1
+            if factor < 2300:
+                difficult += 1
+        if factor >= 2500:
+            easy += 1
+
+    stats = {
+        'total_cards': len(c),
+        'new_cards': type_counts[0],
+        'learning_cards': type_counts[1] + type_counts[3],
+        'review_cards': type_counts[2],
+        'suspended_cards': queue_counts[-1],
+        'per_queue': {str(q): n for q, n in queue_counts.items()},
+    }
+    if intervals:
+        reviewed = len(intervals)
+        intervals.sort()
+        rated.sort()
+        stats.update({
+            'avg_interval': sum(intervals) / reviewed,
+            'avg_factor': total_factor / reviewed,
+            'avg_factor_percent': (total_factor / reviewed) / 10,
+            'avg_lapses': total_lapses / reviewed,
+            'difficult_cards': difficult,
+            'easy_cards': easy,
+            'interval_distribution': _distribution(
+                INTERVAL_LABELS, interval_counts,
+                [_percentile(intervals, 50), _percentile(intervals, 90)], intervals[-1],
+            ),
+            'ease_distribution': _distribution(
+                EASE_LABELS, ease_counts,
+                [_percentile(rated, 50), _percentile(rated, 90)] if rated else (0, 0),
+                rated[-1] if rated else 0,
+            ),
+            'lapse_histogram': _lapse_histogram(lapse_counts),
+        })
+    return stats
+
+
+def _percentile(sorted_values: List[int], q: float) -> float:
+    """Percentile par interpolation linéaire (méthode par défaut de numpy.percentile)."""
+    position = (len(sorted_values) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+def _distribution(labels: Sequence[str], counts, percentiles, maximum) -> Dict[str, Any]:
+    median, p90 = percentiles
+    return {
+        'buckets': {label: int(n) for label, n in zip(labels, counts)},
+        'median': float(median),
+        'p90': float(p90),
+        'max': int(maximum),
+    }
+
+
+def _lapse_histogram(counts) -> Dict[str, int]:
+    labels = [str(n) for n in range(MAX_LAPSE_BUCKET)] + [f'{MAX_LAPSE_BUCKET}+']
+    return {label: int(n) for label, n in zip(labels, counts)}
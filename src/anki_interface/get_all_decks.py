@@ -1,8 +1,16 @@
-from .utils import anki_request
+from .cache import cached_anki_request, async_cached_anki_request
 
 def get_all_decks():
     """
     Récupère les noms de tous les paquets Anki.
     """
-    deck_names = anki_request('deckNames')
+    deck_names = cached_anki_request('deckNames')
+    return deck_names
+
+
+async def get_all_decks_async():
+    """
+    Version asynchrone de get_all_decks (ne bloque pas la boucle d'événements).
+    """
+    deck_names = await async_cached_anki_request('deckNames')
     return deck_names
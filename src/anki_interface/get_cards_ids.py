@@ -1,9 +1,21 @@
-from .utils import anki_request
+from .cache import cached_anki_request, async_cached_anki_request
 
-def get_cards_ids(deck_name):
+def get_cards_ids(deck_name, fresh=False):
     """
     Récupère les IDs de toutes les cartes d'un paquet (deck) spécifié.
+
+    Avec fresh=True (imports), la liste est toujours redemandée à Anki au lieu
+    d'être lue dans le cache findCards.
+    """
+    query = f'deck:"{deck_name}"'
+    card_ids = cached_anki_request('findCards', _fresh=fresh, query=query)
+    return card_ids
+
+
+async def get_cards_ids_async(deck_name, fresh=False):
+    """
+    Version asynchrone de get_cards_ids (ne bloque pas la boucle d'événements).
     """
     query = f'deck:"{deck_name}"'
-    card_ids = anki_request('findCards', query=query)
+    card_ids = await async_cached_anki_request('findCards', _fresh=fresh, query=query)
     return card_ids
@@ -0,0 +1,101 @@
+"""
+Sonde de santé AnkiConnect en arrière-plan.
+
+Un thread interroge périodiquement AnkiConnect (action `version`, timeouts
+courts) et garde le dernier résultat en mémoire : /anki_status le renvoie
+sans attendre Anki. La sonde alimente aussi le disjoncteur du client partagé,
+ce qui le referme dès qu'Anki répond de nouveau.
+"""
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+
+from .utils import ANKI_CONNECT_VERSION, AnkiConnectClient, AnkiConnectError, get_anki_client
+
+_PROBE_INTERVAL = 5.0
+_PROBE_TIMEOUT = (1.0, 3.0)
+
+
+class AnkiHealthMonitor:
+    """Sonde périodique de la disponibilité d'AnkiConnect."""
+
+    def __init__(self, client: Optional[AnkiConnectClient] = None,
+                 interval: float = _PROBE_INTERVAL):
+        self.client = client or get_anki_client()
+        self.interval = interval
+        self._status: Optional[Dict[str, Any]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def check_now(self) -> Dict[str, Any]:
+        """Sonde AnkiConnect immédiatement et met à jour le statut."""
+        start = time.perf_counter()
+        error = None
+        try:
+            # Passe outre le disjoncteur : la sonde sert justement à le refermer
+            connected = self._probe()
+        except (requests.exceptions.RequestException, AnkiConnectError, ValueError) as e:
+            connected = False
+            error = str(e)
+        status = {
+            "connected": connected,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+            "checked_at": time.time(),
+            "breaker": self.client.breaker.state,
+            "error": error,
+        }
+        with self._lock:
+            self._status = status
+        return status
+
+    def _probe(self) -> bool:
+        try:
+            response = self.client.session.post(
+                self.client.url,
+                json={"action": "version", "version": ANKI_CONNECT_VERSION},
+                timeout=_PROBE_TIMEOUT,
+            )
+            response.raise_for_status()
+        except requests.exceptions.RequestException:
+            self.client.breaker.record_failure()
+            raise
+        self.client.breaker.record_success()
+        return response.json().get("result") is not None
+
+    def status(self) -> Optional[Dict[str, Any]]:
+        """Dernier statut connu, ou None si aucune sonde n'a encore tourné."""
+        with self._lock:
+            return self._status
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.check_now()
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        """Démarre le thread de sonde (sans effet s'il tourne déjà)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="anki-health", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+            self._thread = None
+
+
+_monitor: Optional[AnkiHealthMonitor] = None
+
+
+def get_health_monitor() -> AnkiHealthMonitor:
+    """Retourne la sonde partagée par le processus."""
+    global _monitor
+    if _monitor is None:
+        _monitor = AnkiHealthMonitor()
+    return _monitor
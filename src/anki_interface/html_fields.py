@@ -0,0 +1,103 @@
+"""
+Extraction du texte et des images des champs HTML d'une note Anki.
+
+Regex compilées une fois pour toutes : une passe retire les balises, et les
+<img> (seulement si le champ en contient) donnent leur attribut src quel que
+soit l'ordre des attributs ou le type de guillemets.
+
+Les entités HTML sont décodées dans les noms de fichiers. Dans le texte, celles
+qui ne touchent pas au balisage (&nbsp;, &#39;, &eacute;...) sont décodées,
+mais <, > et & restent échappés (&lt;, &gt;, &amp;) : le frontend insère les
+textes par innerHTML, un « &lt;img ...&gt; » affiché dans Anki ne doit pas y
+devenir une balise.
+"""
+import re
+from html import unescape
+from typing import Any, Dict, List, Tuple
+
+_TAG_RE = re.compile(r'<[^>]*>')
+# src d'une <img>, quel que soit l'ordre des attributs et le type de guillemets
+_IMG_SRC_RE = re.compile(
+    r'''<img\b[^>]*?\bsrc\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))''',
+    re.IGNORECASE,
+)
+# Entités produites par l'éditeur d'Anki, remplacées sans passer par html.unescape
+_COMMON_ENTITIES = (('&nbsp;', '\xa0'), ('&#39;', "'"), ('&quot;', '"'))
+# Entités de balisage, laissées sous forme canonique dans le texte
+_MARKUP_ENTITIES = (('&lt;', '<'), ('&gt;', '>'), ('&amp;', '&'))
+_ENTITY_RE = re.compile(r'&(?:#[0-9]+|#[xX][0-9a-fA-F]+|[A-Za-z][A-Za-z0-9]*);?')
+
+
+def _unescape_entity(match: re.Match) -> str:
+    entity = match.group(0)
+    char = unescape(entity)
+    if char == entity:
+        # Entité inconnue : laissée telle quelle
+        return entity
+    # &lt;, &#60;, &amp; ... (et &ampx décodé en "&x") : <, > et & restent échappés
+    return char.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def _unescape_text(text: str) -> str:
+    """Décode les entités d'un texte, sauf celles de <, > et & (voir l'en-tête du module)."""
+    for entity, char in _COMMON_ENTITIES:
+        if entity in text:
+            text = text.replace(entity, char)
+    if '&' not in text:
+        return text
+    # Rien d'autre que &lt; / &gt; / &amp; : déjà sous forme canonique
+    if text.count('&') == sum(text.count(entity) for entity, _ in _MARKUP_ENTITIES):
+        return text
+    # Une seule passe : "&amp;lt;" reste "&amp;lt;"
+    return _ENTITY_RE.sub(_unescape_entity, text)
+
+
+def extract_field(html_content: str) -> Tuple[str, List[str]]:
+    """
+    Sépare le texte et les images d'un champ HTML.
+
+    Args:
+        html_content: Valeur brute du champ (cardsInfo['fields'][nom]['value'])
+
+    Returns:
+        (texte sans balises ni entités, noms des fichiers images dans l'ordre du champ)
+    """
+    if '<' not in html_content:
+        # Cas le plus courant : texte brut
+        text = _unescape_text(html_content) if '&' in html_content else html_content
+        return text.strip(), []
+
+    images = []
+    # Le test de sous-chaîne évite la seconde regex pour les champs sans image
+    # (insensible à la casse comme la regex : <Img ...> compte aussi)
+    if '<img' in html_content.lower():
+        for double, single, bare in _IMG_SRC_RE.findall(html_content):
+            filename = double or single or bare
+            if filename:
+                images.append(unescape(filename) if '&' in filename else filename)
+
+    text = _TAG_RE.sub('', html_content)
+    if '&' in text:
+        text = _unescape_text(text)
+    return text.strip(), images
+
+
+def extract_fields(fields: Dict[str, Any]) -> Tuple[Dict[str, str], List[str]]:
+    """
+    Applique extract_field à tous les champs d'une note.
+
+    Args:
+        fields: Dictionnaire 'fields' d'une entrée cardsInfo ({nom: {'value': html, ...}})
+
+    Returns:
+        (textes non vides par champ, noms des fichiers images dédoublonnés)
+    """
+    texts: Dict[str, str] = {}
+    seen: Dict[str, None] = {}
+    for field_name, content in fields.items():
+        text, images = extract_field(content.get('value', ''))
+        if text:
+            texts[field_name] = text
+        for filename in images:
+            seen.setdefault(filename, None)
+    return texts, list(seen)
@@ -0,0 +1,163 @@
+"""
+Téléchargement groupé des médias (images) des cartes Anki.
+
+Collecte les noms de fichiers de tout un import, les dédoublonne, ignore
+ceux déjà présents sur le disque et récupère les autres en parallèle : chaque
+thread du pool envoie un lot de retrieveMediaFile en une requête `multi`
+(client.batch()). Le décodage base64 est écrit par morceaux dans un fichier
+temporaire, renommé atomiquement une fois complet : un import interrompu ne
+laisse jamais d'image tronquée à la place de la vraie.
+"""
+import base64
+import binascii
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+from .utils import AnkiConnectClient, get_anki_client
+from .scheduler import anki_priority, current_priority
+
+_MAX_WORKERS = 4
+# Nombre max de retrieveMediaFile envoyés par requête multi
+_MEDIA_BATCH_SIZE = 16
+# Taille des morceaux base64 décodés à la fois (multiple de 4)
+_DECODE_CHUNK = 64 * 1024
+
+
+def fetch_media(filenames: Iterable[str], output_dir: str, max_workers: int = _MAX_WORKERS,
+                client: Optional[AnkiConnectClient] = None,
+                source_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Télécharge les médias manquants dans output_dir.
+
+    Args:
+        filenames: Noms de fichiers référencés par les cartes (doublons acceptés)
+        output_dir: Dossier de destination
+        max_workers: Nombre de lots téléchargés simultanément
+        client: Transport AnkiConnect (client partagé par défaut)
+        source_dir: Si fourni (dossier collection.media), copie les fichiers depuis
+            ce dossier au lieu de passer par retrieveMediaFile
+
+    Returns:
+        dict avec :
+            - available: set des noms de fichiers présents dans output_dir à la fin
+            - requested / unique: nombre de références reçues / de fichiers distincts
+            - already_present / downloaded / failed: répartition des fichiers distincts
+            - bytes: octets écrits
+            - elapsed: durée en secondes
+            - files_per_sec / bytes_per_sec: débit des téléchargements
+    """
+    client = client or get_anki_client()
+    os.makedirs(output_dir, exist_ok=True)
+
+    requested = 0
+    unique = []
+    seen = set()
+    for filename in filenames:
+        requested += 1
+        if filename not in seen:
+            seen.add(filename)
+            unique.append(filename)
+
+    available = {fn for fn in unique if os.path.exists(os.path.join(output_dir, fn))}
+    missing = [fn for fn in unique if fn not in available]
+
+    start = time.perf_counter()
+    total_bytes = 0
+    failed = 0
+    if missing:
+        # Les threads du pool gardent la priorité de l'appelant
+        priority = current_priority()
+
+        def download(chunk: List[str]) -> List[int]:
+            if source_dir is not None:
+                return [_copy_atomic(os.path.join(source_dir, fn), os.path.join(output_dir, fn))
+                        for fn in chunk]
+            with anki_priority(priority):
+                batch = client.batch()
+                for filename in chunk:
+                    batch.add('retrieveMediaFile', filename=filename)
+                results = batch.flush()
+            # AnkiConnect renvoie false pour un fichier absent, None pour une action en erreur
+            return [_write_b64_atomic(data_b64, os.path.join(output_dir, fn)) if data_b64 else -1
+                    for fn, data_b64 in zip(chunk, results)]
+
+        workers = max(1, max_workers)
+        # Des lots assez petits pour occuper tous les threads sur un petit import
+        size = max(1, min(_MEDIA_BATCH_SIZE, -(-len(missing) // workers)))
+        chunks = [missing[i:i + size] for i in range(0, len(missing), size)]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            sizes = (size for chunk_sizes in executor.map(download, chunks) for size in chunk_sizes)
+            for filename, size in zip(missing, sizes):
+                if size < 0:
+                    failed += 1
+                else:
+                    available.add(filename)
+                    total_bytes += size
+    elapsed = time.perf_counter() - start
+
+    downloaded = len(missing) - failed
+    return {
+        'available': available,
+        'requested': requested,
+        'unique': len(unique),
+        'already_present': len(unique) - len(missing),
+        'downloaded': downloaded,
+        'failed': failed,
+        'bytes': total_bytes,
+        'elapsed': elapsed,
+        'files_per_sec': downloaded / elapsed if elapsed > 0 else 0.0,
+        'bytes_per_sec': total_bytes / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def format_media_stats(stats: Dict[str, Any]) -> str:
+    """Résumé lisible d'un rapport fetch_media."""
+    return (f"Media: {stats['unique']} fichiers ({stats['already_present']} déjà présents, "
+            f"{stats['downloaded']} téléchargés, {stats['failed']} échecs), "
+            f"{stats['bytes'] / 1024:.0f} Ko en {stats['elapsed']:.2f} s "
+            f"({stats['files_per_sec']:.1f} fichiers/s, {stats['bytes_per_sec'] / 1024:.0f} Ko/s)")
+
+
+def _write_b64_atomic(data_b64: str, output_path: str) -> int:
+    """
+    Décode data_b64 par morceaux vers un fichier temporaire puis le renomme en output_path.
+
+    Returns:
+        Nombre d'octets écrits, ou -1 si les données sont invalides.
+    """
+    directory, filename = os.path.split(output_path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f'.{filename}.', suffix='.part')
+    written = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for start in range(0, len(data_b64), _DECODE_CHUNK):
+                chunk = base64.b64decode(data_b64[start:start + _DECODE_CHUNK])
+                f.write(chunk)
+                written += len(chunk)
+        os.replace(tmp_path, output_path)
+        return written
+    except (ValueError, TypeError, binascii.Error, OSError):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return -1
+
+
+def _copy_atomic(source_path: str, output_path: str) -> int:
+    """Copie source_path vers output_path via un fichier temporaire. Retourne la taille ou -1."""
+    if not os.path.isfile(source_path):
+        return -1
+    directory, filename = os.path.split(output_path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f'.{filename}.', suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f, open(source_path, 'rb') as src:
+            shutil.copyfileobj(src, f)
+        os.replace(tmp_path, output_path)
+        return os.path.getsize(output_path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return -1
@@ -0,0 +1,131 @@
+"""
+Ordonnancement des requêtes AnkiConnect par priorité.
+
+AnkiConnect exécute tout sur le thread GUI d'Anki : quand un import envoie
+des centaines de requêtes, une requête interactive (une carte, la liste des
+paquets) attendrait derrière toutes. Chaque appel HTTP du client passe donc
+par un AnkiRequestScheduler qui :
+- borne le nombre de requêtes en vol vers Anki ;
+- sert en priorité la classe interactive, sans affamer la classe bulk
+  (après `interactive_burst` requêtes interactives consécutives servies
+  pendant qu'une requête bulk attend, la bulk passe) ;
+- sert chaque classe dans l'ordre d'arrivée ;
+- mesure profondeur de file et temps d'attente par classe.
+
+La classe d'un appel vient du contexte (contextvars) : les imports et
+rafraîchissements de fond entourent leur travail de `with anki_priority(BULK)`.
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PRIORITIES = (INTERACTIVE, BULK)
+
+# Requêtes simultanées vers Anki : une en cours de traitement, une prête derrière
+_MAX_IN_FLIGHT = 2
+_INTERACTIVE_BURST = 4
+
+_current_priority: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "anki_priority", default=INTERACTIVE
+)
+
+
+def current_priority() -> str:
+    """Classe de priorité des appels AnkiConnect faits dans le contexte courant."""
+    return _current_priority.get()
+
+
+@contextmanager
+def anki_priority(priority: str) -> Iterator[None]:
+    """Fixe la classe de priorité des appels AnkiConnect du bloc (thread ou tâche asyncio courante)."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Priorité inconnue : {priority!r}")
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class AnkiRequestScheduler:
+    """File à deux classes de priorité devant les appels HTTP vers AnkiConnect."""
+
+    def __init__(self, max_in_flight: int = _MAX_IN_FLIGHT,
+                 interactive_burst: int = _INTERACTIVE_BURST):
+        self.max_in_flight = max_in_flight
+        self.interactive_burst = interactive_burst
+        self._cond = threading.Condition()
+        self._queues: Dict[str, deque] = {p: deque() for p in PRIORITIES}
+        self._in_flight = 0
+        self._interactive_streak = 0
+        self._stats = {
+            p: {"granted": 0, "max_depth": 0, "wait_total": 0.0, "wait_max": 0.0}
+            for p in PRIORITIES
+        }
+
+    def _next_priority(self) -> str:
+        interactive, bulk = self._queues[INTERACTIVE], self._queues[BULK]
+        if interactive and (not bulk or self._interactive_streak < self.interactive_burst):
+            return INTERACTIVE
+        return BULK if bulk else INTERACTIVE
+
+    def acquire(self, priority: str) -> None:
+        """Bloque jusqu'à ce que l'appel puisse partir vers Anki."""
+        ticket = object()
+        start = time.perf_counter()
+        with self._cond:
+            queue = self._queues[priority]
+            queue.append(ticket)
+            stats = self._stats[priority]
+            stats["max_depth"] = max(stats["max_depth"], len(queue))
+            while not (self._in_flight < self.max_in_flight
+                       and queue[0] is ticket
+                       and self._next_priority() == priority):
+                self._cond.wait()
+            queue.popleft()
+            self._in_flight += 1
+            if priority == BULK:
+                self._interactive_streak = 0
+            elif self._queues[BULK]:
+                self._interactive_streak += 1
+            waited = time.perf_counter() - start
+            stats["granted"] += 1
+            stats["wait_total"] += waited
+            stats["wait_max"] = max(stats["wait_max"], waited)
+            # Un autre appel peut être éligible (place libre restante)
+            self._cond.notify_all()
+
+    def release(self) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority: str) -> Iterator[None]:
+        """Réserve une place pour un appel HTTP de la classe donnée."""
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Profondeur actuelle et maximale des files, nombre d'appels servis, attentes."""
+        with self._cond:
+            result: Dict[str, Any] = {"in_flight": self._in_flight, "max_in_flight": self.max_in_flight}
+            for priority in PRIORITIES:
+                stats = self._stats[priority]
+                granted = stats["granted"]
+                result[priority] = {
+                    "queued": len(self._queues[priority]),
+                    "max_depth": stats["max_depth"],
+                    "granted": granted,
+                    "avg_wait_ms": round(stats["wait_total"] / granted * 1000, 2) if granted else 0.0,
+                    "max_wait_ms": round(stats["wait_max"] * 1000, 2),
+                }
+            return result
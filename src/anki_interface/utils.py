@@ -1,27 +1,298 @@
+import os
 import requests
 import json
+import threading
+import time
+from typing import Any, Dict, List, Optional
 
-def anki_request(action, **params):
+from requests.adapters import HTTPAdapter
+
+from .scheduler import AnkiRequestScheduler, current_priority
+
+# Surchargeable (ex: faux serveur de benchmarks/fake_ankiconnect.py)
+ANKI_CONNECT_URL = os.environ.get("ANKI_CONNECT_URL", "http://localhost:8765")
+ANKI_CONNECT_VERSION = 6
+
+# Nombre d'IDs envoyés par requête cardsInfo lors des chargements groupés
+CARDS_INFO_CHUNK_SIZE = 500
+
+# Nombre max de connexions keep-alive gardées ouvertes vers AnkiConnect
+_POOL_SIZE = 10
+
+# Timeouts (secondes) : connexion courte (Anki est local), lecture plus longue
+# pour les gros cardsInfo / retrieveMediaFile
+CONNECT_TIMEOUT = 2.0
+READ_TIMEOUT = 30.0
+
+# Disjoncteur : nombre d'échecs consécutifs avant ouverture, durée d'ouverture
+_BREAKER_THRESHOLD = 3
+_BREAKER_RESET_AFTER = 15.0
+
+
+class AnkiConnectError(Exception):
+    """Erreur renvoyée par l'API AnkiConnect (champ "error" de la réponse)."""
+
+
+class AnkiUnavailableError(requests.exceptions.ConnectionError):
+    """Levée sans appel réseau quand le disjoncteur est ouvert (Anki injoignable)."""
+
+
+class CircuitBreaker:
     """
-    Fonction générique pour envoyer une requête à l'API AnkiConnect.
+    Disjoncteur pour les appels AnkiConnect.
+
+    Après `threshold` échecs réseau consécutifs (refus, timeout), le
+    disjoncteur s'ouvre : les appels échouent immédiatement pendant
+    `reset_after` secondes. Ensuite un seul appel d'essai passe (semi-ouvert) ;
+    son succès referme le disjoncteur, son échec le rouvre.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold: int = _BREAKER_THRESHOLD, reset_after: float = _BREAKER_RESET_AFTER):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        """Retourne True si un appel peut partir."""
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def release(self) -> None:
+        """Libère l'appel d'essai sans résultat (aucune requête n'est partie)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class AnkiConnectClient:
+    """
+    Transport persistant vers AnkiConnect.
+
+    Réutilise une requests.Session (connexions keep-alive poolées) au lieu
+    d'ouvrir une connexion TCP par appel, et expose l'action `multi` pour
+    envoyer plusieurs actions hétérogènes en une seule requête HTTP.
+    Chaque appel passe par le scheduler (priorité interactive / bulk).
     """
-    payload = {"action": action, "params": params, "version": 6}
-    payload_json = json.dumps(payload)
-    
-    try:
-        response = requests.post("http://localhost:8765", data=payload_json)
-        response.raise_for_status()
-        response_json = response.json()
-        
+
+    def __init__(self, url: str = ANKI_CONNECT_URL, pool_size: int = _POOL_SIZE,
+                 connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT,
+                 breaker: Optional[CircuitBreaker] = None,
+                 scheduler: Optional[AnkiRequestScheduler] = None):
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker or CircuitBreaker()
+        self.scheduler = scheduler or AnkiRequestScheduler()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+
+    def invoke(self, action: str, _timeout: Optional[tuple] = None, **params) -> Any:
+        """
+        Envoie une action et retourne son résultat.
+
+        Args:
+            _timeout: (connexion, lecture) pour cet appel, sinon self.timeout
+
+        Raises:
+            AnkiUnavailableError: disjoncteur ouvert (aucun appel réseau)
+            requests.exceptions.RequestException: Anki injoignable ou trop lent
+            AnkiConnectError: AnkiConnect a renvoyé une erreur
+        """
+        if not self.breaker.allow():
+            raise AnkiUnavailableError("AnkiConnect injoignable (disjoncteur ouvert)")
+
+        payload = {"action": action, "params": params, "version": ANKI_CONNECT_VERSION}
+        # Chaque chemin doit conclure l'appel auprès du disjoncteur : sinon un
+        # appel d'essai (semi-ouvert) resterait en cours indéfiniment
+        recorded = False
+        try:
+            data = json.dumps(payload)
+            try:
+                with self.scheduler.slot(current_priority()):
+                    response = self.session.post(self.url, data=data, timeout=_timeout or self.timeout)
+                response.raise_for_status()
+                response_json = response.json()
+            except (requests.exceptions.RequestException, ValueError):
+                # Anki injoignable, trop lent, ou réponse illisible
+                self.breaker.record_failure()
+                recorded = True
+                raise
+            self.breaker.record_success()
+            recorded = True
+        finally:
+            if not recorded:
+                # Rien n'est parti (paramètre non sérialisable, interruption...)
+                self.breaker.release()
+
         if response_json.get("error"):
-            raise Exception(f"Erreur de l'API Anki : {response_json['error']}")
-            
+            raise AnkiConnectError(f"Erreur de l'API Anki : {response_json['error']}")
+
         return response_json.get("result")
 
-    except requests.exceptions.RequestException as e:
-        print("Erreur de connexion à Anki. Anki est-il bien lancé avec AnkiConnect ?")
-        print(f"Détail de l'erreur : {e}")
-        return None
-    except Exception as e:
-        print(e)
-        return None
+    def request(self, action: str, **params) -> Any:
+        """Comme invoke, mais affiche l'erreur et retourne None en cas d'échec."""
+        try:
+            return self.invoke(action, **params)
+        except AnkiUnavailableError:
+            # Déjà signalé à l'ouverture du disjoncteur : échec silencieux et immédiat
+            return None
+        except requests.exceptions.RequestException as e:
+            print("Erreur de connexion à Anki. Anki est-il bien lancé avec AnkiConnect ?")
+            print(f"Détail de l'erreur : {e}")
+            return None
+        except Exception as e:
+            print(e)
+            return None
+
+    def multi(self, actions: List[Dict[str, Any]]) -> Optional[List[Any]]:
+        """
+        Envoie plusieurs actions en une seule requête via l'action `multi`.
+
+        Args:
+            actions: Liste de {"action": str, "params": dict}
+
+        Returns:
+            Liste des résultats dans l'ordre des actions (None pour une action
+            en erreur), ou None si la requête elle-même a échoué ou si la
+            réponse n'a pas une entrée par action.
+        """
+        if not actions:
+            return []
+        payload_actions = [
+            {"action": a["action"], "params": a.get("params", {}), "version": ANKI_CONNECT_VERSION}
+            for a in actions
+        ]
+        responses = self.request("multi", actions=payload_actions)
+        if responses is None:
+            return None
+        if not isinstance(responses, list) or len(responses) != len(actions):
+            print(f"Réponse multi inattendue : {len(actions)} actions envoyées")
+            return None
+
+        results = []
+        for action, resp in zip(actions, responses):
+            # En version 6, chaque réponse est {"result": ..., "error": ...}
+            if isinstance(resp, dict) and "error" in resp:
+                if resp["error"]:
+                    print(f"Erreur de l'API Anki ({action['action']}) : {resp['error']}")
+                results.append(resp.get("result"))
+            else:
+                results.append(resp)
+        return results
+
+    def batch(self, max_actions: Optional[int] = None) -> "AnkiBatch":
+        """Crée un lot d'actions à envoyer via `multi`."""
+        return AnkiBatch(self, max_actions)
+
+    def close(self) -> None:
+        """Ferme les connexions poolées."""
+        self.session.close()
+
+
+class AnkiBatch:
+    """
+    File d'actions AnkiConnect envoyées ensemble via `multi`.
+
+    Usage:
+        batch = client.batch()
+        i = batch.add('cardsInfo', cards=[1, 2])
+        j = batch.add('retrieveMediaFile', filename='a.png')
+        results = batch.flush()   # results[i], results[j]
+
+    Utilisé comme context manager, le lot est envoyé à la sortie du bloc
+    et les résultats sont disponibles dans batch.results.
+    """
+
+    def __init__(self, client: AnkiConnectClient, max_actions: Optional[int] = None):
+        self.client = client
+        self.max_actions = max_actions
+        self.actions: List[Dict[str, Any]] = []
+        self.results: List[Any] = []
+
+    def add(self, action: str, **params) -> int:
+        """Ajoute une action au lot et retourne son index dans les résultats."""
+        self.actions.append({"action": action, "params": params})
+        return len(self.actions) - 1
+
+    def flush(self) -> List[Any]:
+        """
+        Envoie les actions en attente et vide la file.
+
+        Si max_actions est défini, le lot est découpé en plusieurs requêtes
+        `multi`. Les actions d'une requête échouée ont None comme résultat.
+        """
+        actions, self.actions = self.actions, []
+        size = self.max_actions or len(actions) or 1
+        results: List[Any] = []
+        for start in range(0, len(actions), size):
+            chunk = actions[start:start + size]
+            chunk_results = self.client.multi(chunk)
+            results.extend(chunk_results if chunk_results is not None else [None] * len(chunk))
+        self.results = results
+        return results
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+    def __enter__(self) -> "AnkiBatch":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.flush()
+
+
+_client: Optional[AnkiConnectClient] = None
+
+
+def get_anki_client() -> AnkiConnectClient:
+    """Retourne le client AnkiConnect partagé par le processus (créé au premier appel)."""
+    global _client
+    if _client is None:
+        _client = AnkiConnectClient()
+    return _client
+
+
+def anki_request(action, **params):
+    """
+    Fonction générique pour envoyer une requête à l'API AnkiConnect.
+    Passe par le client partagé (connexions keep-alive).
+    """
+    return get_anki_client().request(action, **params)
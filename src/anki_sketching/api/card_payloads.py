@@ -0,0 +1,209 @@
+"""
+Payloads JSON des cartes (/due_cards, /get_cards_by_ids, contexte /learn).
+
+Construire le dict d'une carte coûte trois décodages JSON (textes, images, tags),
+les libellés et l'analyse de sa date d'échéance. Ces entrées analysées sont
+gardées dans un cache LRU borné, indexé par card_id et row_version : la
+colonne row_version de cards est incrémentée par triggers (migration 5) dès
+qu'un champ du payload ou un tag change, quel que soit le chemin d'écriture
+(import, rafraîchissement de la planification, révisions, replanifications,
+cartes locales, tags). Une lecture ne relit donc que (card_id, row_version),
+puis les lignes complètes des seules cartes absentes du cache ou périmées.
+
+Ce qui dépend du jour ou du disque n'est pas mis en cache : due_display est
+recalculé à la lecture depuis la date déjà analysée, la présence des images
+vient du manifeste des médias (une requête par réponse).
+
+Taille du cache : ANKI_CARD_CACHE_SIZE entrées (0 désactive le cache).
+"""
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Dict, NamedTuple, Optional
+
+from src.graph.cards_db import get_card_rows, TAGS_JSON_SQL
+from src.graph.media_manifest import get_present_media
+from src.utilities import fast_json
+
+CACHE_SIZE = int(os.environ.get("ANKI_CARD_CACHE_SIZE", "20000"))
+
+TYPE_LABELS = {0: "New", 1: "Learning", 2: "Review", 3: "Relearning"}
+
+# Colonnes d'une entrée, row_version en deuxième
+_ENTRY_COLS = ("card_id, row_version, card_type, due_date, raw_due, interval, ease_factor,"
+               f" texts_json, image_filenames_json, reps, lapses, {TAGS_JSON_SQL}")
+
+
+def format_due_relative(due_date: datetime | date, today: date | None = None) -> str:
+    """Formate une date d'échéance en temps relatif (ex: '3j', '2sem', 'overdue')."""
+    today = today or date.today()
+    d = due_date.date() if isinstance(due_date, datetime) else due_date
+    delta_days = (d - today).days
+
+    if delta_days < 0:
+        return f"{delta_days}j"
+    if delta_days == 0:
+        return "aujourd'hui"
+    if delta_days <= 6:
+        return f"{delta_days}j"
+    if delta_days <= 27:
+        weeks = delta_days // 7
+        return f"{weeks}sem"
+    months = delta_days // 30
+    return f"{max(1, months)}mois"
+
+
+class _Entry(NamedTuple):
+    payload: Dict[str, Any]    # payload complet ; images et due_display complétés à la lecture
+    image_filenames: list
+    due_date: Optional[str]    # valeur brute de la colonne due_date
+    due: Optional[date]        # échéance analysée si due_display est relatif au jour
+
+
+def _entry_from_row(row: tuple) -> _Entry:
+    (card_id, _row_version, card_type, due_date, raw_due, interval, ease_factor,
+     texts_json, image_filenames_json, reps, lapses, tags_json) = row
+
+    due = None
+    if card_type == 0:
+        due_display = "New"
+    elif due_date is None:
+        due_display = "À réviser"
+    else:
+        try:
+            due = date.fromisoformat(due_date[:10])
+            due_display = None
+        except (ValueError, TypeError):
+            due_display = TYPE_LABELS.get(card_type, "?")
+
+    payload = {
+        "card_id": card_id,
+        "texts": fast_json.loads(texts_json) if texts_json else {},
+        "images": [],
+        "tags": fast_json.loads(tags_json) if tags_json else [],
+        "type": card_type,
+        "type_label": TYPE_LABELS.get(card_type, f"Unknown ({card_type})"),
+        "due": raw_due,
+        "due_display": due_display,
+        "interval": interval or 0,
+        "factor_percent": (ease_factor or 2.5) * 100,
+        "reps": reps or 0,
+        "lapses": lapses or 0,
+    }
+    image_filenames = fast_json.loads(image_filenames_json) if image_filenames_json else []
+    return _Entry(payload, image_filenames, due_date, due)
+
+
+class CardPayloadCache:
+    """Cache LRU borné des entrées de cartes : une entrée (et sa row_version) par card_id."""
+
+    def __init__(self, max_entries: int = CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[int, _Entry]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.outdated = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, card_id: str, row_version: int) -> Optional[_Entry]:
+        """Entrée de card_id si elle a été construite pour row_version, sinon None."""
+        with self._lock:
+            cached = self._entries.get(card_id)
+            if cached is None:
+                self.misses += 1
+                return None
+            if cached[0] != row_version:
+                del self._entries[card_id]
+                self.outdated += 1
+                return None
+            self._entries.move_to_end(card_id)
+            self.hits += 1
+            return cached[1]
+
+    def put(self, card_id: str, row_version: int, entry: _Entry) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[card_id] = (row_version, entry)
+            self._entries.move_to_end(card_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, card_id: str) -> None:
+        """Oublie une carte (supprimée : un ID réutilisé repartirait de row_version 0)."""
+        with self._lock:
+            self._entries.pop(card_id, None)
+
+    def clear(self) -> int:
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            return count
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.outdated + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'outdated': self.outdated,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+_cache = CardPayloadCache()
+
+
+def get_card_payload_cache() -> CardPayloadCache:
+    """Retourne le cache partagé par l'application."""
+    return _cache
+
+
+def card_payloads(conn: sqlite3.Connection, versions: list[tuple],
+                  with_due_date: bool = False) -> list[dict]:
+    """Payloads des cartes versions [(card_id, row_version), ...], dans cet ordre.
+
+    Les entrées absentes du cache ou périmées sont relues en une lecture
+    groupée. with_due_date ajoute la valeur brute de due_date (/due_cards).
+    """
+    entries: dict[str, _Entry] = {}
+    to_read = []
+    for card_id, row_version in versions:
+        if card_id in entries:
+            continue
+        entry = _cache.get(card_id, row_version)
+        if entry is None:
+            to_read.append(card_id)
+        else:
+            entries[card_id] = entry
+    for row in get_card_rows(conn, to_read, _ENTRY_COLS):
+        entry = entries[row[0]] = _entry_from_row(row)
+        _cache.put(row[0], row[1], entry)
+
+    present = get_present_media(conn, (fn for e in entries.values() for fn in e.image_filenames))
+    today = date.today()
+    cards = []
+    for card_id, _row_version in versions:
+        entry = entries.get(card_id)
+        if entry is None:
+            continue
+        card = entry.payload.copy()
+        card["images"] = [f'/static/images/{fn}' for fn in entry.image_filenames if fn in present]
+        if entry.due is not None:
+            card["due_display"] = format_due_relative(entry.due, today)
+        if with_due_date:
+            card["due_date"] = entry.due_date
+        cards.append(card)
+    return cards
+
+
+def load_card_payloads(conn: sqlite3.Connection, card_ids: list[str]) -> list[dict]:
+    """Payloads des cartes card_ids, dans l'ordre demandé (IDs inconnus omis)."""
+    return card_payloads(conn, get_card_rows(conn, card_ids, "card_id, row_version"))
@@ -0,0 +1,336 @@
+"""
+Import d'un paquet Anki dans cards.db.
+
+Deux modes :
+- complet : recharge toutes les cartes du paquet ;
+- incrémental (delta) : compare les dates de modification Anki (cardsModTime,
+  notesModTime) avec celles mémorisées dans cards.db et ne recharge que les
+  cartes qui ont bougé.
+
+Les deux modes donnent le même résultat : une carte replanifiée localement
+(locally_managed = 1) est toujours rechargée, et reprend la planification
+d'Anki, même si Anki ne l'a pas modifiée.
+
+Une carte rechargée dont l'empreinte de contenu (content_hash : champs
+normalisés + noms des médias) n'a pas changé ne voit pas ses colonnes de
+contenu réécrites et ses médias ne sont pas revérifiés ; si sa planification
+non plus n'a pas changé, sa ligne n'est pas touchée du tout.
+
+Deux sources : AnkiConnect, ou lecture directe de collection.anki2
+(card_infos déjà lues par read_deck_cards_info, médias copiés depuis
+collection.media).
+"""
+import asyncio
+import contextvars
+import fnmatch
+import functools
+import time
+from collections import Counter
+
+from src.anki_interface import Card, async_anki_request, get_async_anki_client
+from src.anki_interface.media import format_media_stats
+from src.graph.cards_db import (
+    cards_db_conn,
+    get_anki_sync_state,
+    get_anki_import_state,
+    upsert_anki_cards,
+    content_fingerprint,
+)
+from src.graph.media_manifest import record_media
+from src.utilities import fast_json
+
+
+async def _card_mod_times(card_ids: list[int]) -> dict[int, int] | None:
+    """Retourne {card_id: mod} via cardsModTime, ou None si l'action a échoué."""
+    result = await async_anki_request('cardsModTime', cards=card_ids)
+    if result is None:
+        return None
+    return {entry['cardId']: entry['mod'] for entry in result}
+
+
+async def _note_mod_times(note_ids: list[int]) -> dict[int, int] | None:
+    """Retourne {note_id: mod} via notesModTime, ou None si indisponible."""
+    if not note_ids:
+        return {}
+    result = await async_anki_request('notesModTime', notes=note_ids)
+    if result is None:
+        return None
+    return {entry['noteId']: entry['mod'] for entry in result}
+
+
+def _card_row(card: Card, crt: int | None, note_mod: int | None) -> tuple:
+    """Construit la row ANKI_CARD_COLS d'une carte chargée depuis Anki."""
+    due_date_obj = card.get_due_date(crt)
+    return (
+        str(card.card_id), card.type, card.queue,
+        due_date_obj.isoformat() if due_date_obj else None, card.due,
+        card.interval, card.factor / 1000.0 if card.factor else 2.5,
+        fast_json.dumps(card.texts), fast_json.dumps(card.image_filenames),
+        card.reps, card.lapses,
+        card.note_id or None, card.mod or None, note_mod,
+        content_fingerprint(card.texts, card.image_filenames),
+    )
+
+
+def _meta_values(row: tuple) -> tuple:
+    """Valeurs ANKI_META_COLS[1:] d'une row ANKI_CARD_COLS."""
+    return row[1:7] + row[9:14]
+
+
+def _plan_writes(cards: list[Card], rows: list[tuple], stored: dict[str, tuple]) -> dict:
+    """Répartit les cartes rechargées selon ce qui a changé depuis le dernier import.
+
+    Returns:
+        dict {inserted, updated, meta, untouched} : listes de (card, row) —
+        inserted (carte absente de cards.db) et updated (contenu modifié) sont
+        écrites en entier, meta (contenu identique, planification ou dates de
+        modification changées) sans les colonnes de contenu, untouched pas du tout
+    """
+    plan = {"inserted": [], "updated": [], "meta": [], "untouched": []}
+    for card, row in zip(cards, rows):
+        state = stored.get(row[0])
+        if state is None:
+            plan["inserted"].append((card, row))
+            continue
+        content_hash, locally_managed, meta = state
+        if content_hash != row[-1]:
+            plan["updated"].append((card, row))
+        elif locally_managed or meta != _meta_values(row):
+            plan["meta"].append((card, row))
+        else:
+            plan["untouched"].append((card, row))
+    return plan
+
+
+async def _changed_card_ids(card_ids: list[int], stored: dict[str, tuple]) -> list[int]:
+    """Filtre les cartes nouvelles, modifiées dans Anki depuis le dernier import ou gérées localement."""
+    card_mods = await _card_mod_times(card_ids)
+    if card_mods is None:
+        # AnkiConnect trop ancien ou erreur : on recharge tout
+        return card_ids
+
+    known_notes = sorted({state[0] for state in stored.values() if state[0]})
+    note_mods = await _note_mod_times(known_notes) or {}
+
+    changed = []
+    for card_id in card_ids:
+        state = stored.get(str(card_id))
+        if state is None:
+            changed.append(card_id)
+            continue
+        note_id, mod, note_mod, locally_managed = state
+        if locally_managed or mod != card_mods.get(card_id):
+            changed.append(card_id)
+        elif note_id in note_mods and note_mods[note_id] != note_mod:
+            changed.append(card_id)
+    return changed
+
+
+def _changed_from_infos(card_infos: list[dict], stored: dict[str, tuple]) -> list[int]:
+    """Comme _changed_card_ids, avec les dates de modification lues dans la collection."""
+    changed = []
+    for info in card_infos:
+        state = stored.get(str(info['cardId']))
+        if state is None or state[3] or state[1] != info['mod'] or state[2] != info['noteMod']:
+            changed.append(info['cardId'])
+    return changed
+
+
+async def cards_to_fetch(card_ids: list[int], delta: bool,
+                         card_infos: list[dict] | None = None) -> list[int]:
+    """Cartes à recharger : toutes, ou seulement celles modifiées dans Anki si delta."""
+    if not delta:
+        return card_ids
+    with cards_db_conn() as cards_conn:
+        stored = get_anki_sync_state(cards_conn, [str(cid) for cid in card_ids])
+    if card_infos is not None:
+        return _changed_from_infos(card_infos, stored)
+    return await _changed_card_ids(card_ids, stored)
+
+
+async def sync_deck(deck_name: str, card_ids: list[int], crt: int | None,
+                    images_dir: str, delta: bool = False,
+                    card_infos: list[dict] | None = None,
+                    media_dir: str | None = None) -> dict:
+    """Importe les cartes card_ids d'un paquet dans cards.db.
+
+    Args:
+        deck_name: Nom du paquet (pour les logs)
+        card_ids: IDs renvoyés par findCards
+        crt: Timestamp de création de la collection (dates des cartes Review)
+        images_dir: Dossier des images
+        delta: Si True, ne recharge que les cartes modifiées depuis le dernier import
+        card_infos: Entrées cardsInfo déjà lues dans collection.anki2 (pas d'appel AnkiConnect)
+        media_dir: Dossier collection.media d'où copier les images (sinon retrieveMediaFile)
+
+    Returns:
+        dict {fetched, unchanged, inserted, updated, untouched, media, timings} —
+        fetched / unchanged comptent les cartes rechargées ou écartées par delta ;
+        parmi les rechargées, inserted sont nouvelles, updated ont une ligne
+        réécrite (contenu ou planification) et untouched sont identiques à
+        cards.db. media est le rapport fetch_media (None si aucun média à
+        vérifier), timings la durée en secondes de chaque étape
+        (check, cards, media, write)
+    """
+    timings = {}
+    start = time.perf_counter()
+    to_fetch = await cards_to_fetch(card_ids, delta, card_infos)
+    timings["check"] = time.perf_counter() - start
+    media_stats = None
+    counts = {"inserted": 0, "updated": 0, "untouched": 0}
+    if to_fetch:
+        start = time.perf_counter()
+        if card_infos is not None:
+            infos_by_id = {info['cardId']: info for info in card_infos}
+            cards = [Card(cid, card_info=infos_by_id[cid]) for cid in to_fetch]
+            note_mods = {info['note']: info['noteMod'] for info in card_infos}
+        else:
+            cards = [c for c in await Card.aload_many(to_fetch) if c.exists]
+            note_mods = await _note_mod_times(sorted({c.note_id for c in cards if c.note_id})) or {}
+        rows = [_card_row(card, crt, note_mods.get(card.note_id)) for card in cards]
+        with cards_db_conn() as cards_conn:
+            stored = get_anki_import_state(cards_conn, [row[0] for row in rows])
+        plan = _plan_writes(cards, rows, stored)
+        timings["cards"] = time.perf_counter() - start
+
+        # Médias : seulement pour les cartes dont le contenu est nouveau ou a changé
+        content_changed = plan["inserted"] + plan["updated"]
+        if content_changed:
+            start = time.perf_counter()
+            media_stats = await asyncio.get_running_loop().run_in_executor(
+                None, contextvars.copy_context().run,
+                functools.partial(Card.download_images, [card for card, _ in content_changed],
+                                  images_dir, media_dir=media_dir)
+            )
+            timings["media"] = time.perf_counter() - start
+            print(f"Import {deck_name}: {format_media_stats(media_stats)}")
+
+        # Cartes et manifeste des médias dans la même transaction (commit en sortie du bloc)
+        start = time.perf_counter()
+        with cards_db_conn() as cards_conn:
+            upsert_anki_cards(cards_conn, [row for _, row in content_changed],
+                              [row[:1] + _meta_values(row) for _, row in plan["meta"]])
+            if content_changed:
+                # Manifeste des médias : fichiers écrits, déjà présents ou en échec
+                record_media(cards_conn, images_dir,
+                             (fn for card, _ in content_changed for fn in card.image_filenames))
+        timings["write"] = time.perf_counter() - start
+        counts = {
+            "inserted": len(plan["inserted"]),
+            "updated": len(plan["updated"]) + len(plan["meta"]),
+            "untouched": len(plan["untouched"]),
+        }
+
+    return {
+        "fetched": len(to_fetch),
+        "unchanged": len(card_ids) - len(to_fetch),
+        **counts,
+        "media": media_stats,
+        "timings": timings,
+    }
+
+
+def match_deck_names(deck_names: list[str], pattern: str) -> list[str]:
+    """Paquets correspondant à pattern.
+
+    Un motif glob (dessin::*) est appliqué tel quel ; un nom simple désigne le
+    paquet et tous ses sous-paquets (dessin → dessin, dessin::visages, ...).
+    """
+    if any(ch in pattern for ch in "*?["):
+        return [name for name in deck_names if fnmatch.fnmatchcase(name, pattern)]
+    return [name for name in deck_names if name == pattern or name.startswith(pattern + "::")]
+
+
+# Étapes de la passe dont le coût suit le nombre de cartes rechargées (les
+# autres, find et check, suivent le nombre de cartes des paquets)
+_FETCHED_STEPS = ("cards", "media", "write")
+
+
+def _deck_timings(found: list[list[int]], fetched: set[int], timings: dict) -> list[dict]:
+    """Part de chaque paquet dans la durée de chaque étape d'une passe commune.
+
+    Les étapes sont communes à tous les paquets (une requête multi, un seul
+    sync_deck) : leur durée est répartie au prorata des cartes de chaque
+    paquet, rechargées pour cards / media / write. Une carte présente dans
+    plusieurs paquets compte pour une fraction dans chacun : la somme des
+    parts redonne la durée de l'étape.
+    """
+    owners = Counter(cid for card_ids in found for cid in set(card_ids))
+    total = {"all": len(owners), "fetched": len(fetched)}
+    result = []
+    for card_ids in found:
+        weight = {"all": 0.0, "fetched": 0.0}
+        for cid in set(card_ids):
+            weight["all"] += 1 / owners[cid]
+            if cid in fetched:
+                weight["fetched"] += 1 / owners[cid]
+        shares = {kind: weight[kind] / total[kind] if total[kind] else 0.0 for kind in weight}
+        result.append({
+            step: elapsed * shares["fetched" if step in _FETCHED_STEPS else "all"]
+            for step, elapsed in timings.items()
+        })
+    return result
+
+
+async def sync_decks(deck_names: list[str], crt: int | None, images_dir: str,
+                     delta: bool = False) -> dict:
+    """Importe plusieurs paquets en une passe.
+
+    Les findCards des paquets partent en une seule requête multi ; les IDs sont réunis et
+    dédoublonnés (une carte n'est chargée qu'une fois, un média partagé n'est
+    téléchargé qu'une fois), puis importés par un seul sync_deck : cardsInfo
+    par lots parallèles et une seule transaction d'écriture.
+
+    Returns:
+        dict {decks, total_cards, unique_cards, card_ids, fetched, unchanged,
+        inserted, updated, untouched, media, timings} — timings donne la durée
+        de chaque étape de la passe (find, check, cards, media, write) ; decks
+        donne pour chaque paquet {cards, fetched, timings}, ses cartes, ses
+        cartes rechargées et sa part de chaque étape (voir _deck_timings)
+    """
+    start = time.perf_counter()
+    found = await get_async_anki_client().multi([
+        {"action": "findCards", "params": {"query": f'deck:"{name}"'}} for name in deck_names
+    ])
+    find_elapsed = time.perf_counter() - start
+    if found is None:
+        raise RuntimeError("findCards a échoué (requête multi sans réponse)")
+
+    missing = [name for name, card_ids in zip(deck_names, found) if card_ids is None]
+    if missing:
+        raise RuntimeError(f"findCards a échoué pour : {', '.join(missing)}")
+
+    # Union ordonnée : un paquet parent et ses sous-paquets se recouvrent
+    union = list(dict.fromkeys(cid for card_ids in found for cid in card_ids))
+
+    start = time.perf_counter()
+    to_fetch = await cards_to_fetch(union, delta)
+    check_elapsed = time.perf_counter() - start
+
+    label = deck_names[0] if len(deck_names) == 1 else f"{len(deck_names)} paquets"
+    result = await sync_deck(label, to_fetch, crt, images_dir)
+    result["timings"].update(find=find_elapsed, check=check_elapsed)
+
+    fetched = set(to_fetch)
+    deck_timings = _deck_timings(found, fetched, result["timings"])
+    decks = {
+        name: {
+            "cards": len(card_ids),
+            "fetched": sum(1 for cid in card_ids if cid in fetched),
+            "timings": timings,
+        }
+        for name, card_ids, timings in zip(deck_names, found, deck_timings)
+    }
+    return {
+        "decks": decks,
+        "total_cards": sum(len(card_ids) for card_ids in found),
+        "unique_cards": len(union),
+        "card_ids": union,
+        "fetched": len(to_fetch),
+        "unchanged": len(union) - len(to_fetch),
+        "inserted": result["inserted"],
+        "updated": result["updated"],
+        "untouched": result["untouched"],
+        "media": result["media"],
+        "timings": result["timings"],
+    }
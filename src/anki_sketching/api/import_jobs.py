@@ -0,0 +1,230 @@
+"""
+Imports de paquets en tâche de fond.
+
+Un import soumis devient un ImportJob placé dans une file ; un worker unique
+(une tâche asyncio de l'application) les traite l'un après l'autre. Les cartes
+sont importées par lots via sync_deck, chaque lot étant commité dans cards.db
+avant le suivant : la progression (cartes, octets de médias, ETA) avance lot
+par lot et un job annulé ou en échec reprend au premier lot non commité.
+
+Les jobs ne vivent qu'en mémoire : après un redémarrage, un import delta
+joue le rôle de reprise (les cartes déjà importées sont inchangées).
+"""
+import asyncio
+import time
+import uuid
+
+from src.anki_interface import anki_priority, BULK
+from src.anki_sketching.api.deck_import import cards_to_fetch, sync_deck
+
+# Nombre de cartes importées (et commitées) par lot
+IMPORT_BATCH_SIZE = 200
+
+
+class ImportJob:
+    """État et progression d'un import en tâche de fond."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, deck_name: str, card_ids: list[int], crt: int | None, images_dir: str,
+                 delta: bool = False, card_infos: list[dict] | None = None,
+                 media_dir: str | None = None, batch_size: int = IMPORT_BATCH_SIZE):
+        self.id = uuid.uuid4().hex[:12]
+        self.deck_name = deck_name
+        self.card_ids = card_ids
+        self.crt = crt
+        self.images_dir = images_dir
+        self.delta = delta
+        self.infos_by_id = {info["cardId"]: info for info in card_infos} if card_infos is not None else None
+        self.media_dir = media_dir
+        self.batch_size = batch_size
+
+        self.status = self.QUEUED
+        self.error: str | None = None
+        self.to_fetch: list[int] | None = None  # Résolu au premier démarrage
+        self.next_index = 0  # Position dans to_fetch du premier lot non commité
+        self.media_files = 0
+        self.media_bytes = 0
+        # Lignes de cards.db : insérées, mises à jour, laissées intactes (contenu et planification identiques)
+        self.rows = {"inserted": 0, "updated": 0, "untouched": 0}
+        self.created_at = time.time()
+        self.finished_at: float | None = None
+        self.cancel_requested = False
+
+        # Vitesse de l'exécution en cours (pour l'ETA)
+        self._run_started: float | None = None
+        self._run_start_index = 0
+
+        self.version = 0
+        self._changed = asyncio.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (self.DONE, self.FAILED, self.CANCELLED)
+
+    def snapshot(self) -> dict:
+        """État sérialisable du job (réponse des routes et des événements SSE)."""
+        to_fetch = len(self.to_fetch) if self.to_fetch is not None else None
+        eta = None
+        if self.status == self.RUNNING and self._run_started and to_fetch:
+            done_this_run = self.next_index - self._run_start_index
+            elapsed = time.perf_counter() - self._run_started
+            if done_this_run > 0:
+                eta = round(elapsed / done_this_run * (to_fetch - self.next_index), 1)
+        return {
+            "job_id": self.id,
+            "deck_name": self.deck_name,
+            "status": self.status,
+            "error": self.error,
+            "total": len(self.card_ids),
+            "to_fetch": to_fetch,
+            "done": self.next_index,
+            "unchanged": len(self.card_ids) - to_fetch if to_fetch is not None else None,
+            "media_files": self.media_files,
+            "media_bytes": self.media_bytes,
+            **self.rows,
+            "eta_seconds": eta,
+        }
+
+    async def notify(self) -> None:
+        """Signale un changement d'état aux flux SSE en attente."""
+        self.version += 1
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def wait_for_change(self, version: int, timeout: float) -> bool:
+        """Attend que version change. Retourne False si timeout est écoulé sans changement."""
+        async with self._changed:
+            try:
+                await asyncio.wait_for(self._changed.wait_for(lambda: self.version != version), timeout)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+
+class ImportJobManager:
+    """File des imports et worker qui les exécute un par un."""
+
+    def __init__(self):
+        self.jobs: dict[str, ImportJob] = {}
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+
+    def submit(self, job: ImportJob) -> ImportJob:
+        """Enregistre le job et le place dans la file (démarre le worker si besoin)."""
+        self.jobs[job.id] = job
+        self._enqueue(job)
+        return job
+
+    def get(self, job_id: str) -> ImportJob | None:
+        return self.jobs.get(job_id)
+
+    async def cancel(self, job_id: str) -> ImportJob | None:
+        """Demande l'annulation : effective avant le prochain lot (le lot en cours est commité)."""
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+        job.cancel_requested = True
+        if job.status == ImportJob.QUEUED:
+            job.status = ImportJob.CANCELLED
+            job.finished_at = time.time()
+        await job.notify()
+        return job
+
+    async def resume(self, job_id: str) -> ImportJob | None:
+        """Relance un job annulé ou en échec à partir du premier lot non commité."""
+        job = self.jobs.get(job_id)
+        if job is None or job.status not in (ImportJob.CANCELLED, ImportJob.FAILED):
+            return job
+        job.status = ImportJob.QUEUED
+        job.error = None
+        job.cancel_requested = False
+        job.finished_at = None
+        self._enqueue(job)
+        await job.notify()
+        return job
+
+    async def stop(self) -> None:
+        """Arrête le worker (le lot en cours est abandonné, les lots commités restent)."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+            self._queue = None
+
+    def _enqueue(self, job: ImportJob) -> None:
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._work())
+        self._queue.put_nowait(job)
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            # Un job annulé pendant son attente reste dans la file : on l'ignore
+            if job.status == ImportJob.QUEUED:
+                await self._run(job)
+
+    async def _run(self, job: ImportJob) -> None:
+        # Les appels AnkiConnect du job passent après les requêtes interactives
+        with anki_priority(BULK):
+            await self._run_batches(job)
+
+    async def _run_batches(self, job: ImportJob) -> None:
+        job.status = ImportJob.RUNNING
+        job._run_started = time.perf_counter()
+        job._run_start_index = job.next_index
+        await job.notify()
+        try:
+            if job.to_fetch is None:
+                card_infos = list(job.infos_by_id.values()) if job.infos_by_id is not None else None
+                job.to_fetch = await cards_to_fetch(job.card_ids, job.delta, card_infos)
+                await job.notify()
+
+            while job.next_index < len(job.to_fetch):
+                if job.cancel_requested:
+                    job.status = ImportJob.CANCELLED
+                    return
+                batch = job.to_fetch[job.next_index:job.next_index + job.batch_size]
+                batch_infos = None
+                if job.infos_by_id is not None:
+                    batch_infos = [job.infos_by_id[cid] for cid in batch]
+                result = await sync_deck(job.deck_name, batch, job.crt, job.images_dir,
+                                         card_infos=batch_infos, media_dir=job.media_dir)
+                # sync_deck a commité le lot : il ne sera pas refait à la reprise
+                job.next_index += len(batch)
+                for key in job.rows:
+                    job.rows[key] += result[key]
+                if result["media"]:
+                    job.media_files += result["media"]["downloaded"]
+                    job.media_bytes += result["media"]["bytes"]
+                await job.notify()
+            job.status = ImportJob.DONE
+        except asyncio.CancelledError:
+            # Arrêt de l'application : reprenable comme une annulation
+            job.status = ImportJob.CANCELLED
+            raise
+        except Exception as e:
+            job.status = ImportJob.FAILED
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            await job.notify()
+
+
+_manager: ImportJobManager | None = None
+
+
+def get_import_job_manager() -> ImportJobManager:
+    """Retourne le gestionnaire d'imports partagé par l'application."""
+    global _manager
+    if _manager is None:
+        _manager = ImportJobManager()
+    return _manager
@@ -0,0 +1,90 @@
+"""
+Réconciliation périodique du manifeste des médias avec le dossier des images.
+
+Les routes lisent la présence des images dans la table media au lieu du
+disque. Les écritures de l'application (import, /upload_image, suppression
+d'une carte locale) tiennent le manifeste à jour ; cette tâche de fond
+rattrape le reste (fichiers ajoutés, supprimés ou remplacés à la main) en
+un seul parcours du dossier.
+
+Un premier passage a lieu au démarrage, avant de servir les requêtes.
+Intervalle : ANKI_MEDIA_RECONCILE_INTERVAL (secondes, 0 désactive les
+passages suivants).
+"""
+import asyncio
+import os
+import time
+from typing import Any
+
+from src.graph.cards_db import cards_db_conn
+from src.graph.media_manifest import reconcile_media
+from src.utilities.paths import get_images_dir
+
+RECONCILE_INTERVAL = float(os.environ.get("ANKI_MEDIA_RECONCILE_INTERVAL", "600"))
+
+
+def _reconcile() -> dict[str, Any]:
+    start = time.perf_counter()
+    with cards_db_conn() as cards_conn:
+        report = reconcile_media(cards_conn, get_images_dir())
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    report["finished_at"] = time.time()
+    return report
+
+
+class MediaReconciler:
+    """Tâche de fond qui aligne la table media sur le dossier des images."""
+
+    def __init__(self, interval: float = RECONCILE_INTERVAL):
+        self.interval = interval
+        self.last_report: dict[str, Any] | None = None
+        self._task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    async def reconcile(self) -> dict[str, Any]:
+        """Parcourt le dossier des images et corrige le manifeste (dans le pool de threads)."""
+        async with self._lock:
+            report = await asyncio.get_running_loop().run_in_executor(None, _reconcile)
+            self.last_report = report
+            return report
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                report = await self.reconcile()
+                if report["added"] or report["changed"] or report["removed"]:
+                    print(f"Manifeste des médias : {report['added']} ajoutés, "
+                          f"{report['changed']} modifiés, {report['removed']} disparus")
+            except Exception as e:
+                print(f"Réconciliation des médias en échec : {e}")
+
+    async def start(self) -> None:
+        """Fait un premier passage puis démarre la tâche périodique (si interval > 0)."""
+        try:
+            await self.reconcile()
+        except Exception as e:
+            print(f"Réconciliation des médias en échec : {e}")
+        if self.interval <= 0 or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_reconciler: MediaReconciler | None = None
+
+
+def get_media_reconciler() -> MediaReconciler:
+    """Retourne le réconciliateur partagé par l'application."""
+    global _reconciler
+    if _reconciler is None:
+        _reconciler = MediaReconciler()
+    return _reconciler
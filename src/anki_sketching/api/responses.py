@@ -0,0 +1,15 @@
+"""
+Classe de réponse JSON de l'API, rendue par fast_json (orjson si installé).
+"""
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from src.utilities.fast_json import dumps_bytes
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse dont le corps est encodé par fast_json.dumps_bytes (même JSON compact)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
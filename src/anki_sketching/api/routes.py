@@ -3,18 +3,40 @@ Routes API pour Anki Sketching.
 Gère toutes les routes API qui retournent du JSON.
 """
 from fastapi import APIRouter, Request, Form, HTTPException, UploadFile, File
-from fastapi.responses import JSONResponse
-import json
+from fastapi.responses import StreamingResponse
+import asyncio
 import os
 import sqlite3
 import uuid
 from datetime import date, datetime, timedelta
 
-from src.anki_interface import Card, get_collection_crt, find_all_profiles, anki_request
-from src.anki_interface.get_cards_ids import get_cards_ids
+from src.anki_interface import (
+    get_collection_crt,
+    find_all_profiles,
+    get_health_monitor,
+    read_deck_cards_info,
+    get_collection_media_dir,
+    invalidate_anki_cache,
+    get_anki_cache_stats,
+    get_async_anki_client,
+    get_anki_client,
+    anki_priority,
+    BULK,
+    DeckColumns,
+    compute_deck_statistics,
+)
+from src.anki_interface.get_cards_ids import get_cards_ids_async
+from src.anki_interface.get_all_decks import get_all_decks_async
+from src.anki_sketching.api.deck_import import sync_deck, sync_decks, match_deck_names
+from src.anki_sketching.api.import_jobs import ImportJob, get_import_job_manager
+from src.anki_sketching.api.scheduling_refresh import get_scheduling_refresher
+from src.anki_sketching.api.media_reconcile import get_media_reconciler
+from src.anki_sketching.api.card_payloads import card_payloads, load_card_payloads, get_card_payload_cache
+from src.anki_sketching.api.responses import FastJSONResponse
 from src.utilities.paths import get_positions_file, get_images_dir, get_data_dir, ensure_dir_exists
+from src.utilities import fast_json
 from src.graph.blocking import compute_blocking_states, compute_topo_depths
-from src.graph.cards_db import get_cards_db_conn
+from src.graph.cards_db import cards_db_conn, get_scheduling_rows, set_card_tags
 from src.graph.parse_graph import parse_json_to_db
 from src.graph.schema import get_config, set_config, migrate_db
 from src.graph.card_info import set_card_info, get_all_card_info
@@ -24,7 +46,8 @@ from src.graph.local_cards import (
     update_local_card,
     delete_local_card,
 )
-from src.graph.cards_db import get_all_tags, add_tag, remove_tag
+from src.graph.media_manifest import record_media
+from src.graph.cards_db import get_tag_counts, get_card_ids_with_tag, add_tag, remove_tag
 
 
 # Crée le router
@@ -34,25 +57,6 @@ router = APIRouter()
 _cached_crt = None
 
 
-def format_due_relative(due_date: datetime | date) -> str:
-    """Formate une date d'échéance en temps relatif (ex: '3j', '2sem', 'overdue')."""
-    today = date.today()
-    d = due_date.date() if isinstance(due_date, datetime) else due_date
-    delta_days = (d - today).days
-
-    if delta_days < 0:
-        return f"{delta_days}j"
-    if delta_days == 0:
-        return "aujourd'hui"
-    if delta_days <= 6:
-        return f"{delta_days}j"
-    if delta_days <= 27:
-        weeks = delta_days // 7
-        return f"{weeks}sem"
-    months = delta_days // 30
-    return f"{max(1, months)}mois"
-
-
 def get_crt():
     """Récupère le crt de la collection (avec cache).
 
@@ -111,13 +115,12 @@ def _rebuild_edges_and_blocking() -> bool:
         if not positions_file.exists():
             return False
         graph_conn = sqlite3.connect(str(db_path))
-        cards_conn = get_cards_db_conn()
         try:
-            parse_json_to_db(positions_file, graph_conn)
-            compute_blocking_states(cards_conn, graph_conn)
-            compute_topo_depths(cards_conn, graph_conn)
+            with cards_db_conn() as cards_conn:
+                parse_json_to_db(positions_file, graph_conn)
+                compute_blocking_states(cards_conn, graph_conn)
+                compute_topo_depths(cards_conn, graph_conn)
         finally:
-            cards_conn.close()
             graph_conn.close()
         return True
     except Exception:
@@ -126,10 +129,72 @@ def _rebuild_edges_and_blocking() -> bool:
 
 @router.get("/anki_status")
 async def anki_status():
-    """Vérifie si Anki est connecté via AnkiConnect."""
-    result = anki_request('deckNames')
-    connected = result is not None
-    return JSONResponse({"connected": connected})
+    """Vérifie si Anki est connecté via AnkiConnect.
+
+    Renvoie le dernier résultat de la sonde de santé (sans attendre Anki) ;
+    une seule sonde synchrone est faite si aucune n'a encore tourné.
+    """
+    monitor = get_health_monitor()
+    status = monitor.status()
+    if status is None:
+        status = await asyncio.get_running_loop().run_in_executor(None, monitor.check_now)
+    return FastJSONResponse({"connected": status["connected"], "breaker": status["breaker"]})
+
+
+@router.get("/anki_cache_stats")
+async def anki_cache_stats():
+    """Compteurs du cache des actions AnkiConnect en lecture seule."""
+    return FastJSONResponse(get_anki_cache_stats())
+
+
+@router.get("/card_cache_stats")
+async def card_cache_stats():
+    """Compteurs du cache des payloads de cartes (entrées, hits, versions périmées, misses)."""
+    return FastJSONResponse(get_card_payload_cache().stats())
+
+
+@router.get("/anki_scheduler_stats")
+async def anki_scheduler_stats():
+    """Files d'attente des requêtes AnkiConnect par priorité (interactive / bulk)."""
+    return FastJSONResponse(get_anki_client().scheduler.stats())
+
+
+@router.get("/scheduling_refresh")
+async def scheduling_refresh_status():
+    """Configuration et dernier rapport du rafraîchissement de la planification."""
+    refresher = get_scheduling_refresher()
+    return FastJSONResponse({
+        "interval": refresher.interval,
+        "batch_size": refresher.batch_size,
+        "last_report": refresher.last_report,
+    })
+
+
+@router.post("/scheduling_refresh")
+async def run_scheduling_refresh():
+    """Rafraîchit tout de suite la planification des cartes Anki de cards.db."""
+    try:
+        report = await get_scheduling_refresher().refresh(get_crt())
+    except Exception as e:
+        return FastJSONResponse({"success": False, "error": str(e)}, status_code=500)
+    return FastJSONResponse({"success": True, **report})
+
+
+@router.get("/media_reconcile")
+async def media_reconcile_status():
+    """Configuration et dernier rapport de la réconciliation du manifeste des médias."""
+    reconciler = get_media_reconciler()
+    return FastJSONResponse({"interval": reconciler.interval, "last_report": reconciler.last_report})
+
+
+@router.post("/media_reconcile")
+async def run_media_reconcile():
+    """Aligne tout de suite le manifeste des médias sur le dossier des images."""
+    try:
+        report = await get_media_reconciler().reconcile()
+    except Exception as e:
+        return FastJSONResponse({"success": False, "error": str(e)}, status_code=500)
+    return FastJSONResponse({"success": True, **report})
 
 
 @router.post("/save_positions")
@@ -138,12 +203,11 @@ async def save_positions(request: Request):
     try:
         positions_data = await request.json()
         positions_file = get_positions_file()
-        with open(positions_file, 'w') as f:
-            json.dump(positions_data, f, indent=2)
+        positions_file.write_bytes(fast_json.dumps_bytes(positions_data, indent=True))
         _rebuild_edges_and_blocking()
-        return JSONResponse({"success": True, "message": "Positions sauvegardées"})
+        return FastJSONResponse({"success": True, "message": "Positions sauvegardées"})
     except Exception as e:
-        return JSONResponse(
+        return FastJSONResponse(
             {"success": False, "error": str(e)},
             status_code=500
         )
@@ -155,13 +219,12 @@ async def load_positions():
     try:
         positions_file = get_positions_file()
         if positions_file.exists():
-            with open(positions_file, 'r') as f:
-                positions_data = json.load(f)
-            return JSONResponse({"success": True, "positions": positions_data})
+            positions_data = fast_json.loads(positions_file.read_bytes())
+            return FastJSONResponse({"success": True, "positions": positions_data})
         else:
-            return JSONResponse({"success": True, "positions": {}})
+            return FastJSONResponse({"success": True, "positions": {}})
     except Exception as e:
-        return JSONResponse(
+        return FastJSONResponse(
             {"success": False, "error": str(e)},
             status_code=500
         )
@@ -181,66 +244,14 @@ async def get_collection_info():
             "profiles": [{"name": name, "path": path} for name, path in profiles]
         }
 
-        return JSONResponse(info)
+        return FastJSONResponse(info)
     except Exception as e:
-        return JSONResponse(
+        return FastJSONResponse(
             {"success": False, "error": str(e)},
             status_code=500
         )
 
 
-def _due_display_from_db(card_type: int, due_date_str: str | None) -> str:
-    """Calcule le due_display depuis les données DB."""
-    type_labels = {0: "New", 1: "Learning", 2: "Review", 3: "Relearning"}
-    if card_type == 0:
-        return "New"
-    if due_date_str is None:
-        return "À réviser"
-    try:
-        return format_due_relative(date.fromisoformat(due_date_str[:10]))
-    except (ValueError, TypeError):
-        return type_labels.get(card_type, "?")
-
-
-def _card_from_db_row(row: tuple, images_dir) -> dict:
-    """Construit un dict carte depuis une row de la table cards.
-
-    Row: (card_id, card_type, queue, due_date, raw_due, interval, ease_factor,
-          texts_json, image_filenames_json, reps, lapses, tags_json)
-    """
-    (card_id, card_type, _queue, due_date, raw_due, interval, ease_factor,
-     texts_json, image_filenames_json, reps, lapses, tags_json) = row
-
-    texts = json.loads(texts_json) if texts_json else {}
-    image_filenames = json.loads(image_filenames_json) if image_filenames_json else []
-    images = [
-        f'/static/images/{fn}'
-        for fn in image_filenames
-        if (images_dir / fn).exists()
-    ]
-    tags = json.loads(tags_json) if tags_json else []
-
-    type_labels = {0: "New", 1: "Learning", 2: "Review", 3: "Relearning"}
-    return {
-        "card_id": card_id,
-        "texts": texts,
-        "images": images,
-        "tags": tags,
-        "type": card_type,
-        "type_label": type_labels.get(card_type, f"Unknown ({card_type})"),
-        "due": raw_due,
-        "due_display": _due_display_from_db(card_type, due_date),
-        "interval": interval or 0,
-        "factor_percent": (ease_factor or 2.5) * 100,
-        "reps": reps or 0,
-        "lapses": lapses or 0,
-    }
-
-
-_CARDS_COLS = ("card_id, card_type, queue, due_date, raw_due, interval, ease_factor,"
-               " texts_json, image_filenames_json, reps, lapses, tags_json")
-
-
 @router.post("/get_cards_by_ids")
 async def get_cards_by_ids(request: Request):
     """Récupère les informations de cartes par leurs IDs depuis cards.db."""
@@ -248,67 +259,59 @@ async def get_cards_by_ids(request: Request):
         data = await request.json()
         card_ids = data.get('card_ids', [])
         if not card_ids:
-            return JSONResponse({"success": True, "cards": []})
+            return FastJSONResponse({"success": True, "cards": []})
 
-        images_dir = get_images_dir()
-        cards_conn = get_cards_db_conn()
+        # Les cartes locales sont dans cards comme les autres : une seule lecture groupée
+        with cards_db_conn() as cards_conn:
+            cards_data = load_card_payloads(cards_conn, [str(cid) for cid in card_ids])
 
-        cards_data = []
-        try:
-            for card_id in card_ids:
-                card_id_str = str(card_id)
-                row = cards_conn.execute(
-                    f"SELECT {_CARDS_COLS} FROM cards WHERE card_id = ?",
-                    (card_id_str,),
-                ).fetchone()
-                if row:
-                    cards_data.append(_card_from_db_row(row, images_dir))
-                elif card_id_str.startswith("local_"):
-                    # Fallback pour cartes locales sans entrée cards.db
-                    local = get_local_card(card_id_str)
-                    if local is None:
-                        continue
-                    local_images = [
-                        f'/static/images/{fn}'
-                        for fn in local["images"]
-                        if (images_dir / fn).exists()
-                    ]
-                    cards_data.append({
-                        'card_id': card_id_str,
-                        'texts': local["texts"],
-                        'images': local_images,
-                        'tags': local.get("tags", []),
-                        'type': 0,
-                        'type_label': 'New',
-                        'due': None,
-                        'due_display': 'New',
-                        'interval': 0,
-                        'factor_percent': 250,
-                    })
-        finally:
-            cards_conn.close()
-
-        return JSONResponse({"success": True, "cards": cards_data})
+        return FastJSONResponse({"success": True, "cards": cards_data})
     except Exception as e:
-        return JSONResponse(
+        return FastJSONResponse(
             {"success": False, "error": str(e)},
             status_code=500
         )
 
 
-@router.post("/import_deck")
-async def import_deck(deck_name: str = Form(...)):
-    """Importe un paquet de cartes Anki et stocke dans cards.db."""
+async def _resolve_import(deck_name: str, delta: bool, source: str):
+    """Valide les paramètres d'import et liste les cartes du paquet.
+
+    Returns:
+        (card_ids, card_infos, media_dir) — card_infos et media_dir seulement
+        avec source=collection
+    """
     if not deck_name:
         raise HTTPException(status_code=400, detail="Nom du paquet manquant.")
+    if source not in ("ankiconnect", "collection"):
+        raise HTTPException(status_code=400, detail="source doit valoir ankiconnect ou collection.")
 
-    card_ids = get_cards_ids(deck_name)
+    if source == "collection":
+        card_infos = await asyncio.get_running_loop().run_in_executor(
+            None, read_deck_cards_info, deck_name
+        )
+        if card_infos is None:
+            raise HTTPException(
+                status_code=500,
+                detail="Impossible de lire collection.anki2. Vérifiez le chemin de la collection."
+            )
+        return [info["cardId"] for info in card_infos], card_infos, get_collection_media_dir()
+
+    # Tout import relit la liste des cartes : une carte ajoutée dans Anki
+    # depuis le dernier findCards ne doit pas être ignorée. fresh=True lit
+    # Anki même si un appel concurrent a remis une liste plus ancienne en
+    # cache juste après l'invalidation.
+    invalidate_anki_cache('findCards')
+    card_ids = await get_cards_ids_async(deck_name, fresh=True)
     if card_ids is None:
         raise HTTPException(
             status_code=500,
             detail="Impossible de récupérer les cartes. Vérifiez Anki et le nom du paquet."
         )
+    return card_ids, None, None
+
 
+def _prepare_import() -> tuple:
+    """Crée le dossier des images et mémorise le crt dans graph.db. Retourne (images_dir, crt)."""
     images_dir = get_images_dir()
     ensure_dir_exists(images_dir)
     crt = get_crt()
@@ -322,95 +325,233 @@ async def import_deck(deck_name: str = Form(...)):
             set_config(graph_conn, "crt", str(crt))
         finally:
             graph_conn.close()
+    return images_dir, crt
+
+
+def _imported_cards_payload(card_ids: list[int]) -> list[dict]:
+    """Relit les cartes importées dans cards.db, dans l'ordre de card_ids."""
+    with cards_db_conn() as cards_conn:
+        return load_card_payloads(cards_conn, [str(cid) for cid in card_ids])
+
+
+@router.post("/import_deck")
+async def import_deck(deck_name: str = Form(...), delta: bool = Form(False),
+                      source: str = Form("ankiconnect")):
+    """Importe un paquet de cartes Anki et stocke dans cards.db.
+
+    Avec delta=true, seules les cartes modifiées dans Anki depuis le dernier
+    import sont rechargées (voir deck_import.sync_deck), plus les cartes
+    replanifiées localement : comme un import complet, l'import remet ces
+    dernières sur la planification d'Anki.
+    Avec source=collection, les cartes sont lues directement dans
+    collection.anki2 au lieu de passer par AnkiConnect.
+    Pour les gros paquets, préférer /import_jobs (import en tâche de fond).
+    """
+    card_ids, card_infos, media_dir = await _resolve_import(deck_name, delta, source)
+    images_dir, crt = _prepare_import()
+
+    with anki_priority(BULK):
+        result = await sync_deck(deck_name, card_ids, crt, str(images_dir), delta=delta,
+                                 card_infos=card_infos, media_dir=media_dir)
+    print(f"Import {deck_name}: {result['fetched']} cartes rechargées, {result['unchanged']} inchangées "
+          f"({result['inserted']} insérées, {result['updated']} mises à jour, {result['untouched']} intactes)")
+
+    return FastJSONResponse(_imported_cards_payload(card_ids))
+
 
-    cards_conn = get_cards_db_conn()
+@router.post("/import_decks")
+async def import_decks(deck_pattern: str = Form(...), delta: bool = Form(False)):
+    """Importe d'un coup tous les paquets correspondant à deck_pattern.
+
+    deck_pattern est un nom de paquet (le paquet et ses sous-paquets, ex:
+    dessin) ou un motif glob (ex: dessin::*). Les cartes communes à plusieurs
+    paquets ne sont chargées qu'une fois et tout est écrit en une transaction.
+    Répond avec les IDs importés, les comptes par paquet et les durées par étape.
+    """
+    if not deck_pattern:
+        raise HTTPException(status_code=400, detail="Motif de paquet manquant.")
+    all_decks = await get_all_decks_async()
+    if all_decks is None:
+        raise HTTPException(status_code=500, detail="Impossible de lister les paquets. Vérifiez Anki.")
+    deck_names = match_deck_names(all_decks, deck_pattern)
+    if not deck_names:
+        raise HTTPException(status_code=404, detail=f"Aucun paquet ne correspond à {deck_pattern}.")
+    invalidate_anki_cache('findCards')
+
+    images_dir, crt = _prepare_import()
     try:
-        cards_data = []
-        for card_id in card_ids:
-            card = Card(card_id, load_images=True, image_output_dir=str(images_dir))
-            if not card.exists:
-                continue
-
-            due_date_obj = card.get_due_date(crt)
-            due_date_str = due_date_obj.isoformat() if due_date_obj else None
-            due_display = _due_display_from_db(card.type, due_date_str)
-
-            cards_conn.execute(
-                f"""INSERT OR REPLACE INTO cards
-                    ({_CARDS_COLS}, locally_managed, is_blocking, is_blocked)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0, 0, 0)""",
-                (
-                    str(card_id), card.type, card.queue, due_date_str, card.due,
-                    card.interval, card.factor / 1000.0 if card.factor else 2.5,
-                    json.dumps(card.texts), json.dumps(card.image_filenames),
-                    card.reps, card.lapses,
-                ),
-            )
+        with anki_priority(BULK):
+            result = await sync_decks(deck_names, crt, str(images_dir), delta=delta)
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    print(f"Import {deck_pattern}: {len(deck_names)} paquets, {result['unique_cards']} cartes distinctes, "
+          f"{result['fetched']} rechargées")
 
-            cards_data.append({
-                "card_id": card_id,
-                "texts": card.texts,
-                "images": [f'/static/images/{os.path.basename(img)}' for img in card.images],
-                "tags": [],
-                "type": card.type,
-                "type_label": card.type_label,
-                "due": card.due,
-                "due_display": due_display,
-                "interval": card.interval,
-                "factor_percent": card.factor_percent,
-            })
-        cards_conn.commit()
-    finally:
-        cards_conn.close()
+    media = result["media"]
+    if media is not None:
+        media = {k: v for k, v in media.items() if k != "available"}
+    return FastJSONResponse({**result, "media": media})
+
+
+def _get_job_or_404(job_id: str) -> ImportJob:
+    job = get_import_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import introuvable.")
+    return job
 
-    return JSONResponse(cards_data)
+
+@router.post("/import_jobs")
+async def create_import_job(deck_name: str = Form(...), delta: bool = Form(False),
+                            source: str = Form("ankiconnect")):
+    """Lance l'import d'un paquet en tâche de fond (mêmes paramètres que /import_deck).
+
+    Répond immédiatement avec l'état du job ; la progression se suit sur
+    /import_jobs/{job_id}/events.
+    """
+    card_ids, card_infos, media_dir = await _resolve_import(deck_name, delta, source)
+    images_dir, crt = _prepare_import()
+    job = get_import_job_manager().submit(ImportJob(
+        deck_name, card_ids, crt, str(images_dir), delta=delta,
+        card_infos=card_infos, media_dir=media_dir,
+    ))
+    return FastJSONResponse(job.snapshot(), status_code=202)
+
+
+@router.get("/import_jobs")
+async def list_import_jobs():
+    """État de tous les imports de la session."""
+    return FastJSONResponse([job.snapshot() for job in get_import_job_manager().jobs.values()])
+
+
+@router.get("/import_jobs/{job_id}")
+async def get_import_job(job_id: str):
+    return FastJSONResponse(_get_job_or_404(job_id).snapshot())
+
+
+@router.get("/import_jobs/{job_id}/events")
+async def import_job_events(job_id: str):
+    """Progression du job en Server-Sent Events, jusqu'à sa fin (done, failed ou cancelled)."""
+    job = _get_job_or_404(job_id)
+
+    async def events():
+        version = None
+        while True:
+            if job.version != version:
+                version = job.version
+                yield f"data: {fast_json.dumps(job.snapshot())}\n\n"
+                if job.finished:
+                    return
+            elif not await job.wait_for_change(version, timeout=15.0):
+                # Commentaire SSE : garde la connexion ouverte
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+
+@router.post("/import_jobs/{job_id}/cancel")
+async def cancel_import_job(job_id: str):
+    """Annule le job après le lot en cours (les lots déjà commités restent en base)."""
+    _get_job_or_404(job_id)
+    job = await get_import_job_manager().cancel(job_id)
+    return FastJSONResponse(job.snapshot())
+
+
+@router.post("/import_jobs/{job_id}/resume")
+async def resume_import_job(job_id: str):
+    """Relance un job annulé ou en échec à partir du premier lot non commité."""
+    job = _get_job_or_404(job_id)
+    if job.status not in (ImportJob.CANCELLED, ImportJob.FAILED):
+        raise HTTPException(status_code=409, detail=f"Import {job.status}, rien à reprendre.")
+    await get_import_job_manager().resume(job_id)
+    return FastJSONResponse(job.snapshot())
+
+
+@router.get("/import_jobs/{job_id}/cards")
+async def import_job_cards(job_id: str):
+    """Cartes du paquet importé (même format que la réponse de /import_deck)."""
+    job = _get_job_or_404(job_id)
+    return FastJSONResponse(_imported_cards_payload(job.card_ids))
+
+
+@router.get("/deck_stats")
+async def deck_stats(deck_name: str | None = None, source: str = "cards_db"):
+    """Statistiques de planification d'un paquet (voir compute_deck_statistics).
+
+    source=cards_db (défaut) : lit les cartes importées dans cards.db ; sans
+    deck_name, toutes les cartes de cards.db.
+    source=ankiconnect : lit la planification à jour via cardsInfo.
+    source=collection : lit directement collection.anki2.
+    """
+    if source not in ("cards_db", "ankiconnect", "collection"):
+        raise HTTPException(status_code=400, detail="source doit valoir cards_db, ankiconnect ou collection.")
+    if source != "cards_db" and not deck_name:
+        raise HTTPException(status_code=400, detail="Nom du paquet manquant.")
+
+    loop = asyncio.get_running_loop()
+    if source == "collection":
+        infos = await loop.run_in_executor(None, read_deck_cards_info, deck_name)
+        if infos is None:
+            raise HTTPException(status_code=500, detail="Impossible de lire collection.anki2.")
+        columns = DeckColumns.from_card_infos(infos)
+    else:
+        card_ids = None
+        if deck_name:
+            card_ids = await get_cards_ids_async(deck_name)
+            if card_ids is None:
+                raise HTTPException(
+                    status_code=500,
+                    detail="Impossible de récupérer les cartes. Vérifiez Anki et le nom du paquet."
+                )
+        if source == "ankiconnect":
+            columns = DeckColumns.from_card_infos(await get_async_anki_client().cards_info(card_ids))
+        else:
+            with cards_db_conn() as cards_conn:
+                ids = None if card_ids is None else [str(cid) for cid in card_ids]
+                columns = DeckColumns.from_rows(get_scheduling_rows(cards_conn, ids))
+
+    return FastJSONResponse(compute_deck_statistics(columns))
+
+
+# File du jour : plage due_day <= aujourd'hui de idx_cards_due_day (nouvelles
+# cartes et cartes en apprentissage sans date ont due_day = 0)
+_DUE_CARDS_SQL = """
+    SELECT card_id, row_version
+    FROM cards
+    WHERE due_day <= ?
+      AND queue >= 0
+      AND is_blocked = 0
+    ORDER BY
+      topo_depth ASC,
+      CASE
+        WHEN due_date IS NULL AND card_type IN (1, 3) THEN 0
+        WHEN due_date IS NOT NULL THEN 1
+        ELSE 2
+      END,
+      due_date ASC
+"""
+
+_DISTANT_CARDS_SQL = """
+    SELECT card_id FROM cards
+    WHERE due_day > ? AND card_type = 2 AND queue >= 0
+"""
+
+_BLOCKING_CARDS_SQL = """
+    SELECT card_id FROM cards
+    WHERE is_blocking = 1
+      AND is_blocked = 0
+      AND queue >= 0
+"""
 
 
 @router.get("/due_cards")
 async def get_due_cards():
     """Retourne les cartes non bloquées à réviser aujourd'hui et les nouvelles non bloquées."""
-    images_dir = get_images_dir()
+    with cards_db_conn() as cards_conn:
+        rows = cards_conn.execute(_DUE_CARDS_SQL, (date.today().toordinal(),)).fetchall()
+        cards_data = card_payloads(cards_conn, rows, with_due_date=True)
 
-    cards_conn = get_cards_db_conn()
-    try:
-        cursor = cards_conn.execute(f"""
-            SELECT {_CARDS_COLS}, ease_factor AS ease2
-            FROM cards
-            WHERE is_blocked = 0
-              AND queue >= 0
-              AND (
-                card_type = 0
-                OR (due_date IS NULL AND card_type IN (1, 3))
-                OR (due_date IS NOT NULL AND date(due_date) <= date('now', 'localtime'))
-              )
-            ORDER BY
-              topo_depth ASC,
-              CASE
-                WHEN due_date IS NULL AND card_type IN (1, 3) THEN 0
-                WHEN due_date IS NOT NULL THEN 1
-                ELSE 2
-              END,
-              due_date ASC
-        """)
-        rows = cursor.fetchall()
-    finally:
-        cards_conn.close()
-
-    if not rows:
-        return JSONResponse({"success": True, "cards": [], "total": 0})
-
-    cards_data = []
-    for row in rows:
-        # row has 13 cols: 12 from _CARDS_COLS + ease2 (duplicate)
-        base_row = row[:12]
-        due_date = base_row[3]
-
-        card_data = _card_from_db_row(base_row, images_dir)
-        card_data["due_date"] = due_date
-
-        cards_data.append(card_data)
-
-    return JSONResponse({"success": True, "cards": cards_data, "total": len(cards_data)})
+    return FastJSONResponse({"success": True, "cards": cards_data, "total": len(cards_data)})
 
 
 @router.post("/review_card")
@@ -421,19 +562,18 @@ async def review_card_endpoint(request: Request):
     action = data.get("action")  # "failed" | "maintain" | "change"
 
     if card_id is None or action not in ("failed", "maintain", "change"):
-        return JSONResponse(
+        return FastJSONResponse(
             {"success": False, "error": "card_id et action (failed|maintain|change) sont requis"},
             status_code=400,
         )
 
-    cards_conn = get_cards_db_conn()
-    try:
+    with cards_db_conn() as cards_conn:
         row = cards_conn.execute(
             "SELECT card_type, interval, ease_factor, min_interval FROM cards WHERE card_id = ?",
             (str(card_id),),
         ).fetchone()
         if not row:
-            return JSONResponse({"success": False, "error": "Carte introuvable"}, status_code=404)
+            return FastJSONResponse({"success": False, "error": "Carte introuvable"}, status_code=404)
 
         _card_type, current_interval, ease, min_ivl = row
         today = date.today()
@@ -465,10 +605,8 @@ async def review_card_endpoint(request: Request):
                 compute_blocking_states(cards_conn, graph_conn)
             finally:
                 graph_conn.close()
-    finally:
-        cards_conn.close()
 
-    return JSONResponse({"success": True})
+    return FastJSONResponse({"success": True})
 
 
 @router.post("/reschedule_card")
@@ -477,14 +615,13 @@ async def reschedule_card(request: Request):
     data = await request.json()
     card_id = data.get("card_id")
     if card_id is None:
-        return JSONResponse({"success": False, "error": "card_id requis"}, status_code=400)
+        return FastJSONResponse({"success": False, "error": "card_id requis"}, status_code=400)
 
     if str(card_id).startswith("local_"):
-        return JSONResponse({"success": False, "error": "Opération non supportée pour les cartes locales"}, status_code=400)
+        return FastJSONResponse({"success": False, "error": "Opération non supportée pour les cartes locales"}, status_code=400)
 
     today = date.today().isoformat()
-    cards_conn = get_cards_db_conn()
-    try:
+    with cards_db_conn() as cards_conn:
         cards_conn.execute(
             "UPDATE cards SET due_date = ?, locally_managed = 1 WHERE card_id = ?",
             (today, str(card_id)),
@@ -496,30 +633,23 @@ async def reschedule_card(request: Request):
                 compute_blocking_states(cards_conn, graph_conn)
             finally:
                 graph_conn.close()
-    finally:
-        cards_conn.close()
 
-    return JSONResponse({"success": True})
+    return FastJSONResponse({"success": True})
 
 
 @router.post("/reschedule_distant_cards")
 async def reschedule_distant_cards():
     """Ramène à aujourd'hui toutes les cartes du canvas dues dans > 5 jours."""
     try:
-        threshold = (date.today() + timedelta(days=5)).isoformat()
+        threshold = (date.today() + timedelta(days=5)).toordinal()
         today = date.today().isoformat()
 
-        cards_conn = get_cards_db_conn()
-        try:
-            cursor = cards_conn.execute("""
-                SELECT card_id FROM cards
-                WHERE card_type = 2 AND queue >= 0
-                  AND due_date IS NOT NULL AND date(due_date) > ?
-            """, (threshold,))
+        with cards_db_conn() as cards_conn:
+            cursor = cards_conn.execute(_DISTANT_CARDS_SQL, (threshold,))
             to_reschedule = [row[0] for row in cursor.fetchall()]
 
             if not to_reschedule:
-                return JSONResponse({"success": True, "rescheduled": 0})
+                return FastJSONResponse({"success": True, "rescheduled": 0})
 
             cards_conn.executemany(
                 "UPDATE cards SET due_date = ?, locally_managed = 1 WHERE card_id = ?",
@@ -533,12 +663,10 @@ async def reschedule_distant_cards():
                     compute_blocking_states(cards_conn, graph_conn)
                 finally:
                     graph_conn.close()
-        finally:
-            cards_conn.close()
 
-        return JSONResponse({"success": True, "rescheduled": len(to_reschedule)})
+        return FastJSONResponse({"success": True, "rescheduled": len(to_reschedule)})
     except Exception as e:
-        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+        return FastJSONResponse({"success": False, "error": str(e)}, status_code=500)
 
 
 @router.get("/card_info_all")
@@ -546,9 +674,9 @@ async def card_info_all():
     """Retourne toutes les infos par carte (min_interval, etc.)."""
     try:
         info = get_all_card_info()
-        return JSONResponse({"card_info": info})
+        return FastJSONResponse({"card_info": info})
     except Exception:
-        return JSONResponse({"card_info": {}})
+        return FastJSONResponse({"card_info": {}})
 
 
 @router.post("/set_card_info")
@@ -557,31 +685,23 @@ async def set_card_info_endpoint(request: Request):
     data = await request.json()
     card_id = data.get("card_id")
     if card_id is None:
-        return JSONResponse({"success": False, "error": "card_id requis"}, status_code=400)
+        return FastJSONResponse({"success": False, "error": "card_id requis"}, status_code=400)
     fields = {k: v for k, v in data.items() if k != "card_id"}
     try:
         set_card_info(str(card_id), **fields)
-        return JSONResponse({"success": True})
+        return FastJSONResponse({"success": True})
     except Exception as e:
-        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+        return FastJSONResponse({"success": False, "error": str(e)}, status_code=500)
 
 
 @router.get("/blocking_cards")
 async def get_blocking_cards():
     """Retourne les IDs des cartes qui bloquent d'autres cartes (is_blocking=1, is_blocked=0)."""
-    cards_conn = get_cards_db_conn()
-    try:
-        cursor = cards_conn.execute("""
-            SELECT card_id FROM cards
-            WHERE is_blocking = 1
-              AND is_blocked = 0
-              AND queue >= 0
-        """)
+    with cards_db_conn() as cards_conn:
+        cursor = cards_conn.execute(_BLOCKING_CARDS_SQL)
         card_ids = [row[0] for row in cursor.fetchall()]
-    finally:
-        cards_conn.close()
 
-    return JSONResponse({"success": True, "card_ids": card_ids})
+    return FastJSONResponse({"success": True, "card_ids": card_ids})
 
 
 # ── Local cards ───────────────────────────────────────────────────────────
@@ -599,9 +719,9 @@ async def create_local_card_endpoint(request: Request):
     card_id = create_local_card(front_text, back_text, image_filename, tags=tags)
     local = get_local_card(card_id)
     if not local:
-        return JSONResponse({"success": False, "error": "Erreur création carte"}, status_code=500)
+        return FastJSONResponse({"success": False, "error": "Erreur création carte"}, status_code=500)
     card_data = _format_local_card(card_id, local)
-    return JSONResponse({"success": True, "card": card_data})
+    return FastJSONResponse({"success": True, "card": card_data})
 
 
 @router.post("/update_local_card")
@@ -610,7 +730,7 @@ async def update_local_card_endpoint(request: Request):
     data = await request.json()
     card_id = data.get("card_id")
     if not card_id or not str(card_id).startswith("local_"):
-        return JSONResponse({"success": False, "error": "card_id local requis"}, status_code=400)
+        return FastJSONResponse({"success": False, "error": "card_id local requis"}, status_code=400)
 
     kwargs = {}
     if "front_text" in data:
@@ -622,26 +742,19 @@ async def update_local_card_endpoint(request: Request):
 
     ok = update_local_card(str(card_id), **kwargs)
     if not ok:
-        return JSONResponse({"success": False, "error": "Carte introuvable"}, status_code=404)
+        return FastJSONResponse({"success": False, "error": "Carte introuvable"}, status_code=404)
 
     # Update tags if provided
     if "tags" in data:
         tags = data["tags"] or []
-        cards_conn = get_cards_db_conn()
-        try:
-            cards_conn.execute(
-                "UPDATE cards SET tags_json = ? WHERE card_id = ?",
-                (json.dumps(tags), str(card_id)),
-            )
-            cards_conn.commit()
-        finally:
-            cards_conn.close()
+        with cards_db_conn() as cards_conn:
+            set_card_tags(cards_conn, str(card_id), tags)
 
     local = get_local_card(str(card_id))
     if not local:
-        return JSONResponse({"success": False, "error": "Carte introuvable après mise à jour"}, status_code=404)
+        return FastJSONResponse({"success": False, "error": "Carte introuvable après mise à jour"}, status_code=404)
     card_data = _format_local_card(str(card_id), local)
-    return JSONResponse({"success": True, "card": card_data})
+    return FastJSONResponse({"success": True, "card": card_data})
 
 
 @router.post("/upload_image")
@@ -657,8 +770,10 @@ async def upload_image(file: UploadFile = File(...)):
     content = await file.read()
     with open(filepath, "wb") as f:
         f.write(content)
+    with cards_db_conn() as cards_conn:
+        record_media(cards_conn, images_dir, [filename])
 
-    return JSONResponse({
+    return FastJSONResponse({
         "success": True,
         "filename": filename,
         "path": f"/static/images/{filename}",
@@ -671,13 +786,14 @@ async def delete_local_card_endpoint(request: Request):
     data = await request.json()
     card_id = data.get("card_id")
     if not card_id or not str(card_id).startswith("local_"):
-        return JSONResponse({"success": False, "error": "card_id local requis"}, status_code=400)
+        return FastJSONResponse({"success": False, "error": "card_id local requis"}, status_code=400)
 
     ok = delete_local_card(str(card_id))
     if not ok:
-        return JSONResponse({"success": False, "error": "Carte introuvable"}, status_code=404)
+        return FastJSONResponse({"success": False, "error": "Carte introuvable"}, status_code=404)
+    get_card_payload_cache().discard(str(card_id))
 
-    return JSONResponse({"success": True})
+    return FastJSONResponse({"success": True})
 
 
 def _format_local_card(card_id: str, local: dict) -> dict:
@@ -702,12 +818,21 @@ def _format_local_card(card_id: str, local: dict) -> dict:
 
 @router.get("/all_tags")
 async def all_tags_endpoint():
-    """Retourne tous les tags distincts."""
+    """Retourne tous les tags distincts et le nombre de cartes de chacun."""
+    try:
+        counts = get_tag_counts()
+        return FastJSONResponse({"success": True, "tags": list(counts), "counts": counts})
+    except Exception as e:
+        return FastJSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+
+@router.get("/tag_cards")
+async def tag_cards_endpoint(tag: str):
+    """Retourne les IDs des cartes portant un tag."""
     try:
-        tags = get_all_tags()
-        return JSONResponse({"success": True, "tags": tags})
+        return FastJSONResponse({"success": True, "card_ids": get_card_ids_with_tag(tag)})
     except Exception as e:
-        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+        return FastJSONResponse({"success": False, "error": str(e)}, status_code=500)
 
 
 @router.post("/add_tag")
@@ -717,12 +842,12 @@ async def add_tag_endpoint(request: Request):
     card_ids = data.get("card_ids", [])
     tag = data.get("tag", "").strip()
     if not card_ids or not tag:
-        return JSONResponse({"success": False, "error": "card_ids et tag requis"}, status_code=400)
+        return FastJSONResponse({"success": False, "error": "card_ids et tag requis"}, status_code=400)
     try:
-        add_tag([str(cid) for cid in card_ids], tag)
-        return JSONResponse({"success": True})
+        added = add_tag([str(cid) for cid in card_ids], tag)
+        return FastJSONResponse({"success": True, "changed": added})
     except Exception as e:
-        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+        return FastJSONResponse({"success": False, "error": str(e)}, status_code=500)
 
 
 @router.post("/remove_tag")
@@ -732,9 +857,9 @@ async def remove_tag_endpoint(request: Request):
     card_ids = data.get("card_ids", [])
     tag = data.get("tag", "").strip()
     if not card_ids or not tag:
-        return JSONResponse({"success": False, "error": "card_ids et tag requis"}, status_code=400)
+        return FastJSONResponse({"success": False, "error": "card_ids et tag requis"}, status_code=400)
     try:
-        remove_tag([str(cid) for cid in card_ids], tag)
-        return JSONResponse({"success": True})
+        removed = remove_tag([str(cid) for cid in card_ids], tag)
+        return FastJSONResponse({"success": True, "changed": removed})
     except Exception as e:
-        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+        return FastJSONResponse({"success": False, "error": str(e)}, status_code=500)
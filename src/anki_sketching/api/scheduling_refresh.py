@@ -0,0 +1,179 @@
+"""
+Rafraîchissement périodique de la planification des cartes Anki importées.
+
+Une fois importées, les cartes de cards.db ne suivent plus les révisions
+faites dans Anki : due_date, interval et le blocking dérivent jusqu'au
+prochain import. Une tâche de fond relit donc régulièrement les champs de
+planification (type, queue, due, interval, factor, reps, lapses) de toutes
+les cartes gérées par Anki (locally_managed = 0) :
+
+1. cardsModTime par gros lots : seules les cartes dont la date de
+   modification Anki a changé sont relues ;
+2. cardsInfo pour ces cartes seulement (appels BULK, derrière les requêtes
+   interactives) ;
+3. les lignes réellement modifiées sont écrites en une transaction
+   (executemany), sans toucher au contenu ni aux données locales ;
+4. le blocking est recalculé une fois, et seulement si une carte a changé.
+
+Intervalle et taille des lots : ANKI_REFRESH_INTERVAL (secondes, 0 désactive)
+et ANKI_REFRESH_BATCH_SIZE.
+"""
+import asyncio
+import os
+import sqlite3
+import time
+from typing import Any, Callable
+
+from src.anki_interface import BULK, Card, anki_priority, get_async_anki_client, get_health_monitor
+from src.graph.blocking import compute_blocking_states
+from src.graph.cards_db import cards_db_conn, get_anki_scheduling_state, update_anki_scheduling
+from src.utilities.paths import get_data_dir
+
+REFRESH_INTERVAL = float(os.environ.get("ANKI_REFRESH_INTERVAL", "300"))
+REFRESH_BATCH_SIZE = int(os.environ.get("ANKI_REFRESH_BATCH_SIZE", "2000"))
+
+
+def _scheduling_values(card: Card, crt: int | None) -> tuple:
+    """Valeurs ANKI_SCHEDULING_COLS d'une carte (mêmes conversions que l'import)."""
+    due_date_obj = card.get_due_date(crt)
+    return (
+        card.type, card.queue,
+        due_date_obj.isoformat() if due_date_obj else None, card.due,
+        card.interval, card.factor / 1000.0 if card.factor else 2.5,
+        card.reps, card.lapses, card.mod or None,
+    )
+
+
+def _write_changes(rows: list[tuple]) -> int:
+    """Écrit les planifications modifiées puis recalcule le blocking (une fois). Bloquant."""
+    with cards_db_conn() as cards_conn:
+        updated = update_anki_scheduling(cards_conn, rows)
+        graph_path = get_data_dir() / "graph.db"
+        if updated and graph_path.exists():
+            graph_conn = sqlite3.connect(str(graph_path))
+            try:
+                compute_blocking_states(cards_conn, graph_conn)
+            finally:
+                graph_conn.close()
+    return updated
+
+
+def _read_state() -> dict[str, tuple]:
+    with cards_db_conn() as cards_conn:
+        return get_anki_scheduling_state(cards_conn)
+
+
+class SchedulingRefresher:
+    """Tâche de fond qui resynchronise la planification de cards.db avec Anki."""
+
+    def __init__(self, interval: float = REFRESH_INTERVAL, batch_size: int = REFRESH_BATCH_SIZE):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.last_report: dict[str, Any] | None = None
+        self._crt_provider: Callable[[], int | None] | None = None
+        self._task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    async def refresh(self, crt: int | None) -> dict[str, Any]:
+        """Rafraîchit la planification de toutes les cartes Anki de cards.db.
+
+        Returns:
+            dict {checked, modified, updated, missing, blocking_recomputed,
+            seconds, finished_at} — modified compte les cartes dont la date de
+            modification Anki a changé, updated celles dont la planification
+            stockée a effectivement changé
+        """
+        async with self._lock:
+            start = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            stored = await loop.run_in_executor(None, _read_state)
+            with anki_priority(BULK):
+                modified = await self._modified_card_ids(stored)
+                infos = await get_async_anki_client().cards_info(modified, chunk_size=self.batch_size)
+
+            rows, missing = [], 0
+            for card_id, info in zip(modified, infos):
+                if not info:
+                    missing += 1
+                    continue
+                values = _scheduling_values(Card(card_id, card_info=info, with_content=False), crt)
+                if values != stored[str(card_id)]:
+                    rows.append(values + (str(card_id),))
+
+            updated = 0
+            if rows:
+                updated = await loop.run_in_executor(None, _write_changes, rows)
+            report = {
+                "checked": len(stored),
+                "modified": len(modified),
+                "updated": updated,
+                "missing": missing,
+                "blocking_recomputed": updated > 0,
+                "seconds": round(time.perf_counter() - start, 3),
+                "finished_at": time.time(),
+            }
+            self.last_report = report
+            return report
+
+    async def _modified_card_ids(self, stored: dict[str, tuple]) -> list[int]:
+        """Cartes dont la date de modification Anki diffère de anki_mod (cardsModTime par lots)."""
+        client = get_async_anki_client()
+        card_ids = [int(cid) for cid in stored]
+        batches = [card_ids[i:i + self.batch_size] for i in range(0, len(card_ids), self.batch_size)]
+        responses = await asyncio.gather(
+            *(client.request('cardsModTime', cards=batch) for batch in batches)
+        )
+        modified = []
+        for batch, response in zip(batches, responses):
+            if response is None:
+                # Action indisponible ou carte supprimée dans le lot : tout relire
+                modified.extend(batch)
+                continue
+            mods = {entry['cardId']: entry['mod'] for entry in response}
+            modified.extend(
+                cid for cid in batch
+                if cid not in mods or mods[cid] != stored[str(cid)][-1]
+            )
+        return modified
+
+    async def _run(self) -> None:
+        while True:
+            status = get_health_monitor().status()
+            # Anki fermé : inutile d'envoyer des lots qui échoueront tous
+            if status is None or status["connected"]:
+                try:
+                    crt = self._crt_provider() if self._crt_provider else None
+                    report = await self.refresh(crt)
+                    if report["updated"]:
+                        print(f"Planification rafraîchie : {report['updated']} cartes "
+                              f"modifiées dans Anki ({report['seconds']} s)")
+                except Exception as e:
+                    print(f"Rafraîchissement de la planification en échec : {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self, crt_provider: Callable[[], int | None] | None = None) -> None:
+        """Démarre la tâche périodique (sans effet si interval <= 0 ou si elle tourne déjà)."""
+        self._crt_provider = crt_provider
+        if self.interval <= 0 or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_refresher: SchedulingRefresher | None = None
+
+
+def get_scheduling_refresher() -> SchedulingRefresher:
+    """Retourne le rafraîchisseur partagé par l'application."""
+    global _refresher
+    if _refresher is None:
+        _refresher = SchedulingRefresher()
+    return _refresher
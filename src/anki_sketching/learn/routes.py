@@ -1,16 +1,16 @@
 """
 Routes pour le dashboard d'apprentissage (/learn).
 """
-import json
 import sqlite3
 from pathlib import Path
 
 from fastapi import APIRouter, Request
-from fastapi.responses import JSONResponse
 from fastapi.templating import Jinja2Templates
 
-from src.graph.cards_db import get_cards_db_conn
-from src.utilities.paths import get_data_dir, get_images_dir
+from src.anki_sketching.api.card_payloads import load_card_payloads
+from src.anki_sketching.api.responses import FastJSONResponse
+from src.graph.cards_db import cards_db_conn
+from src.utilities.paths import get_data_dir
 
 
 def get_project_root() -> Path:
@@ -22,31 +22,12 @@ templates = Jinja2Templates(directory=str(templates_dir))
 
 router = APIRouter()
 
-_COLS = ("card_id, card_type, queue, due_date, raw_due, interval, ease_factor,"
-         " texts_json, image_filenames_json, reps, lapses, tags_json")
-
-
-def _build_card(row: tuple, images_dir: Path) -> dict:
-    (card_id, card_type, _queue, _due_date, _raw_due, _interval, _ease_factor,
-     texts_json, image_filenames_json, _reps, _lapses, tags_json) = row
-
-    texts = json.loads(texts_json) if texts_json else {}
-    image_filenames = json.loads(image_filenames_json) if image_filenames_json else []
-    images = [
-        f'/static/images/{fn}'
-        for fn in image_filenames
-        if (images_dir / fn).exists()
-    ]
-    tags = json.loads(tags_json) if tags_json else []
-    type_labels = {0: "New", 1: "Learning", 2: "Review", 3: "Relearning"}
-    return {
-        "card_id": card_id,
-        "texts": texts,
-        "images": images,
-        "tags": tags,
-        "type": card_type,
-        "type_label": type_labels.get(card_type, f"Unknown ({card_type})"),
-    }
+# Champs du payload d'une carte utiles au dashboard
+_CONTEXT_KEYS = ("card_id", "texts", "images", "tags", "type", "type_label")
+
+
+def _build_card(payload: dict) -> dict:
+    return {key: payload[key] for key in _CONTEXT_KEYS}
 
 
 @router.get("/learn")
@@ -59,7 +40,6 @@ async def card_context(card_id: str):
     """Retourne la carte et ses parents/enfants immédiats."""
     try:
         db_path = get_data_dir() / "graph.db"
-        images_dir = get_images_dir()
 
         parent_ids: list[str] = []
         child_ids: list[str] = []
@@ -75,24 +55,18 @@ async def card_context(card_id: str):
             finally:
                 graph_conn.close()
 
-        cards_conn = get_cards_db_conn()
-        try:
-            def fetch(cid: str) -> dict | None:
-                row = cards_conn.execute(
-                    f"SELECT {_COLS} FROM cards WHERE card_id = ?", (cid,)
-                ).fetchone()
-                return _build_card(row, images_dir) if row else None
-
-            card = fetch(card_id)
-            if card is None:
-                return JSONResponse({"success": False, "error": "Carte introuvable"}, status_code=404)
+        with cards_db_conn() as cards_conn:
+            # La carte, ses parents et ses enfants en une lecture groupée (via le cache des payloads)
+            fetched = load_card_payloads(cards_conn, [card_id, *parent_ids, *child_ids])
+        payloads = {payload["card_id"]: payload for payload in fetched}
 
-            parents = [c for cid in parent_ids if (c := fetch(cid)) is not None]
-            children = [c for cid in child_ids if (c := fetch(cid)) is not None]
-        finally:
-            cards_conn.close()
+        if card_id not in payloads:
+            return FastJSONResponse({"success": False, "error": "Carte introuvable"}, status_code=404)
+        card = _build_card(payloads[card_id])
+        parents = [_build_card(payloads[cid]) for cid in parent_ids if cid in payloads]
+        children = [_build_card(payloads[cid]) for cid in child_ids if cid in payloads]
 
-        return JSONResponse({"success": True, "card": card, "parents": parents, "children": children})
+        return FastJSONResponse({"success": True, "card": card, "parents": parents, "children": children})
 
     except Exception as e:
-        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+        return FastJSONResponse({"success": False, "error": str(e)}, status_code=500)
@@ -3,6 +3,7 @@ FastAPI application principale pour Anki Sketching.
 Configure les templates Jinja2, les fichiers statiques et les routes.
 """
 import sqlite3
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
@@ -11,7 +12,12 @@ from pathlib import Path
 from src.anki_sketching.api import routes as api_routes
 from src.anki_sketching.web import routes as web_routes
 from src.anki_sketching.learn import routes as learn_routes
-from src.graph.cards_db import migrate_from_legacy, get_cards_db_conn, migrate_cards_db
+from src.anki_interface.health import get_health_monitor
+from src.anki_sketching.api.import_jobs import get_import_job_manager
+from src.anki_sketching.api.scheduling_refresh import get_scheduling_refresher
+from src.anki_sketching.api.media_reconcile import get_media_reconciler
+from src.anki_sketching.api.responses import FastJSONResponse
+from src.graph.cards_db import migrate_from_legacy, cards_db_conn, close_cards_db_conns, migrate_cards_db
 from src.graph.schema import migrate_db
 from src.utilities.paths import get_data_dir
 
@@ -21,8 +27,22 @@ def get_project_root() -> Path:
     return Path(__file__).resolve().parent.parent.parent
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Démarre/arrête les tâches de fond (sonde AnkiConnect, imports, planification, médias)."""
+    get_health_monitor().start()
+    get_scheduling_refresher().start(api_routes.get_crt)
+    await get_media_reconciler().start()
+    yield
+    await get_media_reconciler().stop()
+    await get_scheduling_refresher().stop()
+    await get_import_job_manager().stop()
+    get_health_monitor().stop()
+    close_cards_db_conns()
+
+
 # Crée l'application FastAPI
-app = FastAPI(title="Anki Sketching")
+app = FastAPI(title="Anki Sketching", lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # Monte les fichiers statiques
 static_dir = get_project_root() / 'frontend' / 'static'
@@ -35,12 +55,11 @@ templates = Jinja2Templates(directory=str(templates_dir))
 # Migration legacy : card_info.db + graph.db card_state → cards.db
 migrate_from_legacy()
 
-# Migre cards.db si nécessaire
-cards_conn = get_cards_db_conn()
-migrate_cards_db(cards_conn)
-cards_conn.close()
+# Migrations en attente de cards.db (aucune si PRAGMA user_version est à jour)
+with cards_db_conn() as cards_conn:
+    migrate_cards_db(cards_conn)
 
-# Migre graph.db si nécessaire (edges + config)
+# Migrations en attente de graph.db (edges + config)
 db_path = get_data_dir() / "graph.db"
 if db_path.exists():
     _conn = sqlite3.connect(str(db_path))
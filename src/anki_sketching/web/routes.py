@@ -6,7 +6,7 @@ from fastapi import APIRouter, Request
 from fastapi.templating import Jinja2Templates
 from pathlib import Path
 
-from src.anki_interface.get_all_decks import get_all_decks
+from src.anki_interface.get_all_decks import get_all_decks_async
 
 
 def get_project_root() -> Path:
@@ -25,7 +25,7 @@ router = APIRouter()
 @router.get("/")
 async def index(request: Request):
     """Route principale qui affiche l'interface."""
-    all_decks = get_all_decks()
+    all_decks = await get_all_decks_async()
     dessin_decks = []
     if all_decks:
         parent_deck = 'dessin'
@@ -1,13 +1,28 @@
 """
 Base de données unifiée pour les cartes (cards.db).
 Fusionne card_state, card_info et local_card_content en une seule table.
+
+Accès : `with cards_db_conn() as conn:` fournit la connexion du thread courant,
+ouverte une fois puis réutilisée (PRAGMA appliqués à l'ouverture, schéma créé
+une seule fois par processus). La base est en WAL : les lectures ne bloquent
+pas l'écriture d'un import en cours.
 """
+import hashlib
 import json
 import sqlite3
+import threading
+import unicodedata
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
+from typing import ContextManager, Iterator
 
+from src.graph.migrations import Migration, apply_migrations
+from src.utilities import fast_json
 from src.utilities.paths import get_data_dir
 
+# Nombre max d'IDs par clause IN (...) (limite de variables SQLite)
+_IN_CHUNK_SIZE = 500
+
 _SCHEMA_SQL = """
 CREATE TABLE IF NOT EXISTS cards (
     card_id TEXT PRIMARY KEY,
@@ -27,69 +42,327 @@ CREATE TABLE IF NOT EXISTS cards (
     is_blocked BOOLEAN NOT NULL DEFAULT 0,
     topo_depth INTEGER NOT NULL DEFAULT 0,
     min_interval INTEGER,
-    created_at TEXT
+    created_at TEXT,
+    anki_note_id INTEGER,
+    anki_mod INTEGER,
+    anki_note_mod INTEGER,
+    content_hash TEXT,
+    due_day INTEGER,
+    row_version INTEGER NOT NULL DEFAULT 0
 );
+
+-- Tags : une ligne par (carte, tag). tags_json n'est plus écrit (migré ici).
+CREATE TABLE IF NOT EXISTS card_tags (
+    card_id TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (card_id, tag)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_card_tags_tag ON card_tags (tag, card_id);
+
+-- Nombre de cartes par tag, tenu à jour par triggers : /all_tags ne dépend
+-- pas du nombre de cartes
+CREATE TABLE IF NOT EXISTS tag_counts (
+    tag TEXT PRIMARY KEY,
+    n INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS card_tags_count_insert AFTER INSERT ON card_tags BEGIN
+    INSERT INTO tag_counts (tag, n) VALUES (NEW.tag, 1)
+        ON CONFLICT(tag) DO UPDATE SET n = n + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS card_tags_count_delete AFTER DELETE ON card_tags BEGIN
+    UPDATE tag_counts SET n = n - 1 WHERE tag = OLD.tag;
+    DELETE FROM tag_counts WHERE tag = OLD.tag AND n <= 0;
+END;
+
+-- Manifeste des médias du dossier des images (voir media_manifest.py)
+CREATE TABLE IF NOT EXISTS media (
+    filename TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime REAL,
+    present BOOLEAN NOT NULL DEFAULT 0
+) WITHOUT ROWID;
 """
 
+# Expression SQL des tags d'une carte (tableau JSON trié), à sélectionner
+# depuis cards à la place de l'ancienne colonne tags_json
+TAGS_JSON_SQL = (
+    "(SELECT json_group_array(tag) FROM card_tags WHERE card_tags.card_id = cards.card_id)"
+)
+
+
+# Jour (numéro ordinal, date.toordinal()) à partir duquel une carte entre dans
+# la file de révision : 0 pour une nouvelle carte ou une carte en apprentissage
+# sans date (à réviser tout de suite), NULL pour une carte en révision sans
+# date. Matérialisé dans cards.due_day par triggers (migration 4) : la file du
+# jour est la plage due_day <= aujourd'hui de l'index idx_cards_due_day.
+_DUE_DAY_SQL = """CASE
+    WHEN {row}card_type = 0 OR ({row}due_date IS NULL AND {row}card_type IN (1, 3)) THEN 0
+    ELSE CAST(julianday({row}due_date) - 1721424.5 AS INTEGER)
+END"""
+
+
+# PRAGMA posés à chaque ouverture de connexion (journal_mode=WAL est persistant,
+# posé une fois avec le schéma). synchronous=NORMAL est sûr en WAL : une coupure
+# de courant peut perdre la dernière transaction, jamais corrompre la base.
+_CONN_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",    # 16 Mo de cache de pages
+    "PRAGMA mmap_size = 268435456",  # lectures via mmap, jusqu'à 256 Mo
+)
+
+_local = threading.local()
+_schema_ready: set[str] = set()
+_schema_lock = threading.Lock()
+
 
 def get_cards_db_path() -> Path:
     return get_data_dir() / "cards.db"
 
 
-def get_cards_db_conn() -> sqlite3.Connection:
-    """Ouvre la connexion et crée la table si besoin."""
+def _open_cards_db() -> sqlite3.Connection:
+    """Ouvre une connexion réglée ; crée le schéma au premier appel du processus."""
     db_path = get_cards_db_path()
     db_path.parent.mkdir(parents=True, exist_ok=True)
     conn = sqlite3.connect(str(db_path))
-    conn.executescript(_SCHEMA_SQL)
+    for pragma in _CONN_PRAGMAS:
+        conn.execute(pragma)
+    key = str(db_path)
+    if key not in _schema_ready:
+        with _schema_lock:
+            if key not in _schema_ready:
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.executescript(_SCHEMA_SQL)
+                _schema_ready.add(key)
     return conn
 
 
-def migrate_cards_db(conn: sqlite3.Connection) -> None:
-    """Ajoute les colonnes manquantes à cards et migre les données (idempotent)."""
-    cursor = conn.execute("PRAGMA table_info(cards)")
-    existing = {row[1] for row in cursor.fetchall()}
+def get_cards_db_conn() -> sqlite3.Connection:
+    """Ouvre une connexion dédiée, à fermer par l'appelant (scripts, migrations).
+
+    Dans l'application, préférer cards_db_conn() qui réutilise la connexion du thread.
+    """
+    return _open_cards_db()
+
+
+@contextmanager
+def cards_db_conn() -> Iterator[sqlite3.Connection]:
+    """Connexion à cards.db du thread courant, ouverte au premier usage puis réutilisée.
 
-    add_migrations = [
+    Le bloc le plus externe commite en sortie (rollback si exception) ; les blocs
+    imbriqués partagent sa transaction. Pas de await dans le bloc : les
+    coroutines de la boucle d'événements partagent la connexion de son thread.
+    """
+    conns = _local.__dict__.setdefault("conns", {})
+    key = str(get_cards_db_path())
+    entry = conns.get(key)
+    if entry is None:
+        entry = conns[key] = [_open_cards_db(), 0]
+    conn = entry[0]
+    entry[1] += 1
+    try:
+        yield conn
+    except BaseException:
+        if entry[1] == 1 and conn.in_transaction:
+            conn.rollback()
+        raise
+    else:
+        if entry[1] == 1 and conn.in_transaction:
+            conn.commit()
+    finally:
+        entry[1] -= 1
+
+
+def write_transaction(conn: sqlite3.Connection) -> ContextManager:
+    """Contexte d'une écriture en plusieurs requêtes sur conn.
+
+    Dans un bloc cards_db_conn() (ou une transaction déjà ouverte par
+    l'appelant), ne fait rien : le bloc le plus externe commite ou annule le
+    tout. Sinon (connexion dédiée), commite en sortie comme « with conn: ».
+    """
+    in_block = any(entry[0] is conn and entry[1] > 0
+                   for entry in _local.__dict__.get("conns", {}).values())
+    if in_block or conn.in_transaction:
+        return nullcontext()
+    return conn
+
+
+def close_cards_db_conns() -> None:
+    """Ferme les connexions du thread courant (arrêt de l'application, scripts)."""
+    for conn, _depth in _local.__dict__.pop("conns", {}).values():
+        conn.close()
+
+
+def _cards_columns(conn: sqlite3.Connection) -> set[str]:
+    return {row[1] for row in conn.execute("PRAGMA table_info(cards)")}
+
+
+def _migrate_add_columns(conn: sqlite3.Connection) -> None:
+    """Ajoute à cards les colonnes apparues depuis la première version."""
+    existing = _cards_columns(conn)
+    for col_name, col_def in (
         ("min_interval", "INTEGER"),
-        ("front_text", "TEXT"),
-        ("back_text", "TEXT"),
-        ("image_filename", "TEXT"),
         ("created_at", "TEXT"),
         ("topo_depth", "INTEGER NOT NULL DEFAULT 0"),
         ("tags_json", "TEXT"),
-    ]
-    for col_name, col_def in add_migrations:
+        ("anki_note_id", "INTEGER"),
+        ("anki_mod", "INTEGER"),
+        ("anki_note_mod", "INTEGER"),
+        ("content_hash", "TEXT"),
+    ):
         if col_name not in existing:
             conn.execute(f"ALTER TABLE cards ADD COLUMN {col_name} {col_def}")
-    conn.commit()
-
-    # Migrate local cards: populate texts_json/image_filenames_json from scalar columns
-    rows = conn.execute(
-        "SELECT card_id, front_text, back_text, image_filename FROM cards "
-        "WHERE texts_json IS NULL AND (front_text IS NOT NULL OR back_text IS NOT NULL)"
-    ).fetchall()
-    for card_id, front_text, back_text, image_filename in rows:
-        texts = {}
-        if front_text:
-            texts["Front"] = front_text
-        if back_text:
-            texts["Back"] = back_text
-        images = [image_filename] if image_filename else []
-        conn.execute(
+
+
+def _local_card_json(front_text: str | None, back_text: str | None,
+                     image_filename: str | None) -> tuple[str, str]:
+    """(texts_json, image_filenames_json) d'une carte locale à colonnes scalaires."""
+    texts = {}
+    if front_text:
+        texts["Front"] = front_text
+    if back_text:
+        texts["Back"] = back_text
+    images = [image_filename] if image_filename else []
+    return fast_json.dumps(texts), fast_json.dumps(images)
+
+
+def _migrate_scalar_columns(conn: sqlite3.Connection) -> None:
+    """Cartes locales : front_text/back_text/image_filename → colonnes JSON, puis suppression."""
+    existing = _cards_columns(conn)
+    scalar_cols = [col for col in ("front_text", "back_text", "image_filename") if col in existing]
+    if not scalar_cols:
+        return
+    if len(scalar_cols) == 3:
+        rows = conn.execute(
+            "SELECT card_id, front_text, back_text, image_filename FROM cards "
+            "WHERE texts_json IS NULL AND (front_text IS NOT NULL OR back_text IS NOT NULL)"
+        ).fetchall()
+        conn.executemany(
             "UPDATE cards SET texts_json = ?, image_filenames_json = ? WHERE card_id = ?",
-            (json.dumps(texts), json.dumps(images), card_id),
+            [(*_local_card_json(front, back, image), card_id)
+             for card_id, front, back, image in rows],
         )
-    if rows:
-        conn.commit()
-        print(f"  Migrated {len(rows)} local cards to JSON columns")
+        if rows:
+            print(f"  Migrated {len(rows)} local cards to JSON columns")
+    # DROP COLUMN : SQLite 3.35+
+    for col in scalar_cols:
+        conn.execute(f"ALTER TABLE cards DROP COLUMN {col}")
+
+
+def _migrate_tags_table(conn: sqlite3.Connection) -> None:
+    """tags_json → card_tags (la colonne est vidée : plus jamais relue)."""
+    cursor = conn.execute(
+        "INSERT OR IGNORE INTO card_tags (card_id, tag) "
+        "SELECT cards.card_id, tag.value FROM cards, json_each(cards.tags_json) AS tag "
+        "WHERE cards.tags_json IS NOT NULL AND json_valid(cards.tags_json) "
+        "AND tag.type = 'text' AND tag.value <> ''"
+    )
+    if cursor.rowcount > 0:
+        print(f"  Migrated {cursor.rowcount} tags to card_tags")
+    conn.execute("UPDATE cards SET tags_json = NULL WHERE tags_json IS NOT NULL")
+
+
+def _migrate_due_day(conn: sqlite3.Connection) -> None:
+    """Colonne due_day tenue à jour par triggers, index de la file et du blocking."""
+    if "due_day" not in _cards_columns(conn):
+        conn.execute("ALTER TABLE cards ADD COLUMN due_day INTEGER")
+    conn.execute(f"UPDATE cards SET due_day = {_DUE_DAY_SQL.format(row='')}")
+    due_day = _DUE_DAY_SQL.format(row="NEW.")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS cards_due_day_insert AFTER INSERT ON cards BEGIN
+            UPDATE cards SET due_day = {due_day} WHERE rowid = NEW.rowid;
+        END""")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS cards_due_day_update AFTER UPDATE OF card_type, due_date ON cards
+        WHEN NEW.card_type IS NOT OLD.card_type OR NEW.due_date IS NOT OLD.due_date BEGIN
+            UPDATE cards SET due_day = {due_day} WHERE rowid = NEW.rowid;
+        END""")
+    # File du jour (/due_cards) et cartes lointaines (/reschedule_distant_cards)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cards_due_day ON cards (due_day, card_type) "
+                 "WHERE queue >= 0")
+    # /blocking_cards : ne contient que les cartes bloquantes non bloquées
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cards_blocking ON cards (queue, card_id) "
+                 "WHERE is_blocking = 1 AND is_blocked = 0")
+
+
+# Colonnes de cards qui entrent dans le payload JSON d'une carte : leur
+# changement incrémente row_version (migration 5), comme celui des tags
+PAYLOAD_COLS = (
+    "card_type", "due_date", "raw_due", "interval", "ease_factor",
+    "texts_json", "image_filenames_json", "reps", "lapses",
+)
+
+
+def _migrate_row_version(conn: sqlite3.Connection) -> None:
+    """Colonne row_version incrémentée par triggers à chaque changement du payload d'une carte."""
+    if "row_version" not in _cards_columns(conn):
+        conn.execute("ALTER TABLE cards ADD COLUMN row_version INTEGER NOT NULL DEFAULT 0")
+    changed = " OR ".join(f"NEW.{col} IS NOT OLD.{col}" for col in PAYLOAD_COLS)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS cards_row_version_update
+        AFTER UPDATE OF {", ".join(PAYLOAD_COLS)} ON cards
+        WHEN {changed} BEGIN
+            UPDATE cards SET row_version = row_version + 1 WHERE rowid = NEW.rowid;
+        END""")
+    for event, row in (("INSERT", "NEW"), ("DELETE", "OLD")):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS card_tags_row_version_{event.lower()}
+            AFTER {event} ON card_tags BEGIN
+                UPDATE cards SET row_version = row_version + 1 WHERE card_id = {row}.card_id;
+            END""")
+
+
+# Valeur JSON peut-être non compacte : espaces entre les éléments (json() les
+# retire) ou caractères échappés en \uXXXX (fast_json.dumps écrit l'UTF-8 tel quel).
+# CASE garantit que json() n'est évalué que sur un JSON valide (sinon erreur SQL).
+_NOT_COMPACT_SQL = ("CASE WHEN json_valid({col}) "
+                    "THEN {col} != json({col}) OR instr({col}, '\\u') ELSE 0 END")
+
+
+def _migrate_compact_json(conn: sqlite3.Connection) -> None:
+    """texts_json / image_filenames_json réécrits en JSON compact (encodage de fast_json.dumps).
+
+    Seules les lignes candidates sont relues et seules celles dont l'encodage
+    change sont réécrites : les autres gardent leur row_version (et leur
+    entrée dans le cache des payloads).
+    """
+    def compact_value(value):
+        if not value:
+            return value
+        try:
+            return fast_json.dumps(fast_json.loads(value))
+        except ValueError:  # JSON invalide : laissé tel quel
+            return value
+
+    candidates = " OR ".join(_NOT_COMPACT_SQL.format(col=col)
+                             for col in ("texts_json", "image_filenames_json"))
+    updates = []
+    for card_id, texts_json, images_json in conn.execute(
+        f"SELECT card_id, texts_json, image_filenames_json FROM cards WHERE {candidates}"
+    ):
+        compact = (compact_value(texts_json), compact_value(images_json))
+        if compact != (texts_json, images_json):
+            updates.append((*compact, card_id))
+    conn.executemany(
+        "UPDATE cards SET texts_json = ?, image_filenames_json = ? WHERE card_id = ?", updates
+    )
 
-    # Drop deprecated scalar columns (SQLite 3.35+)
-    existing = {row[1] for row in conn.execute("PRAGMA table_info(cards)").fetchall()}
-    for col in ("front_text", "back_text", "image_filename"):
-        if col in existing:
-            conn.execute(f"ALTER TABLE cards DROP COLUMN {col}")
-    conn.commit()
+
+# Étapes numérotées de cards.db, à compléter en fin de liste (jamais renuméroter).
+# Une base neuve (schéma complet créé par _SCHEMA_SQL) les joue aussi : elles
+# ne trouvent rien à faire.
+CARDS_DB_MIGRATIONS = [
+    Migration(1, "colonnes ajoutées depuis la première version", _migrate_add_columns),
+    Migration(2, "cartes locales : colonnes scalaires → JSON", _migrate_scalar_columns),
+    Migration(3, "tags_json → card_tags", _migrate_tags_table),
+    Migration(4, "due_day et index de la file de révision", _migrate_due_day),
+    Migration(5, "row_version (cache des payloads de cartes)", _migrate_row_version),
+    Migration(6, "colonnes JSON en encodage compact", _migrate_compact_json),
+]
+
+
+def migrate_cards_db(conn: sqlite3.Connection) -> list[int]:
+    """Joue les migrations de cards.db en attente (aucune si user_version est à jour)."""
+    return apply_migrations(conn, CARDS_DB_MIGRATIONS, "cards.db")
 
 
 def migrate_from_legacy() -> None:
@@ -105,157 +378,308 @@ def migrate_from_legacy() -> None:
         return
 
     print("Migrating legacy DBs to cards.db...")
-    cards_conn = get_cards_db_conn()
-    migrate_cards_db(cards_conn)
 
-    try:
+    def legacy_rows(db_path: Path, table: str, query: str) -> list[tuple]:
+        if not db_path.exists():
+            return []
+        conn = sqlite3.connect(str(db_path))
+        try:
+            if conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table,)
+            ).fetchone() is None:
+                return []
+            return conn.execute(query).fetchall()
+        finally:
+            conn.close()
+
+    card_states = legacy_rows(graph_path, "card_state", """
+        SELECT card_id, card_type, queue, due_date, raw_due, interval,
+               ease_factor, locally_managed, texts_json, image_filenames_json,
+               reps, lapses, is_blocking, is_blocked
+        FROM card_state
+    """)
+    card_infos = legacy_rows(card_info_path, "card_info",
+                             "SELECT card_id, min_interval FROM card_info")
+    local_contents = legacy_rows(
+        card_info_path, "local_card_content",
+        "SELECT card_id, front_text, back_text, image_filename, created_at FROM local_card_content",
+    )
+
+    # Une seule transaction : une migration interrompue ne laisse rien à moitié copié
+    with cards_db_conn() as cards_conn:
+        migrate_cards_db(cards_conn)
+
         # 1. Copier card_state depuis graph.db
-        if graph_path.exists():
-            graph_conn = sqlite3.connect(str(graph_path))
-            try:
-                # Vérifier que card_state existe
-                table_check = graph_conn.execute(
-                    "SELECT name FROM sqlite_master WHERE type='table' AND name='card_state'"
-                ).fetchone()
-                if table_check:
-                    rows = graph_conn.execute("""
-                        SELECT card_id, card_type, queue, due_date, raw_due, interval,
-                               ease_factor, locally_managed, texts_json, image_filenames_json,
-                               reps, lapses, is_blocking, is_blocked
-                        FROM card_state
-                    """).fetchall()
-                    for row in rows:
-                        cards_conn.execute("""
-                            INSERT OR IGNORE INTO cards
-                                (card_id, card_type, queue, due_date, raw_due, interval,
-                                 ease_factor, locally_managed, texts_json, image_filenames_json,
-                                 reps, lapses, is_blocking, is_blocked)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        """, row)
-                    cards_conn.commit()
-                    print(f"  Migrated {len(rows)} cards from graph.db card_state")
-            finally:
-                graph_conn.close()
+        cards_conn.executemany("""
+            INSERT OR IGNORE INTO cards
+                (card_id, card_type, queue, due_date, raw_due, interval,
+                 ease_factor, locally_managed, texts_json, image_filenames_json,
+                 reps, lapses, is_blocking, is_blocked)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, card_states)
+        if card_states:
+            print(f"  Migrated {len(card_states)} cards from graph.db card_state")
 
         # 2. Merger card_info.min_interval
-        info_conn = sqlite3.connect(str(card_info_path))
-        try:
-            # card_info table
-            table_check = info_conn.execute(
-                "SELECT name FROM sqlite_master WHERE type='table' AND name='card_info'"
-            ).fetchone()
-            if table_check:
-                rows = info_conn.execute("SELECT card_id, min_interval FROM card_info").fetchall()
-                for card_id, min_interval in rows:
-                    if min_interval is not None:
-                        cards_conn.execute(
-                            "UPDATE cards SET min_interval = ? WHERE card_id = ?",
-                            (min_interval, card_id),
-                        )
-                cards_conn.commit()
-                print(f"  Merged {len(rows)} card_info entries")
-
-            # 3. Merger local_card_content
-            table_check = info_conn.execute(
-                "SELECT name FROM sqlite_master WHERE type='table' AND name='local_card_content'"
-            ).fetchone()
-            if table_check:
-                rows = info_conn.execute(
-                    "SELECT card_id, front_text, back_text, image_filename, created_at FROM local_card_content"
-                ).fetchall()
-                for card_id, front_text, back_text, image_filename, created_at in rows:
-                    # Build JSON columns from scalar values
-                    texts = {}
-                    if front_text:
-                        texts["Front"] = front_text
-                    if back_text:
-                        texts["Back"] = back_text
-                    images = [image_filename] if image_filename else []
-                    # Ensure the card exists in cards table (may not have been in card_state)
-                    cards_conn.execute("""
-                        INSERT OR IGNORE INTO cards
-                            (card_id, card_type, queue, locally_managed, is_blocking, is_blocked)
-                        VALUES (?, 0, 0, 1, 0, 0)
-                    """, (card_id,))
-                    cards_conn.execute("""
-                        UPDATE cards SET front_text=?, back_text=?, image_filename=?,
-                                         texts_json=?, image_filenames_json=?, created_at=?
-                        WHERE card_id=?
-                    """, (front_text, back_text, image_filename,
-                          json.dumps(texts), json.dumps(images), created_at, card_id))
-                cards_conn.commit()
-                print(f"  Merged {len(rows)} local_card_content entries")
-        finally:
-            info_conn.close()
+        cards_conn.executemany(
+            "UPDATE cards SET min_interval = ? WHERE card_id = ?",
+            [(min_interval, card_id) for card_id, min_interval in card_infos
+             if min_interval is not None],
+        )
+        if card_infos:
+            print(f"  Merged {len(card_infos)} card_info entries")
+
+        # 3. Merger local_card_content (la carte peut manquer de card_state)
+        cards_conn.executemany("""
+            INSERT OR IGNORE INTO cards
+                (card_id, card_type, queue, locally_managed, is_blocking, is_blocked)
+            VALUES (?, 0, 0, 1, 0, 0)
+        """, [(row[0],) for row in local_contents])
+        cards_conn.executemany("""
+            UPDATE cards SET texts_json = ?, image_filenames_json = ?, created_at = ?
+            WHERE card_id = ?
+        """, [(*_local_card_json(front, back, image), created_at, card_id)
+              for card_id, front, back, image, created_at in local_contents])
+        if local_contents:
+            print(f"  Merged {len(local_contents)} local_card_content entries")
+
+    # 4. Renommer card_info.db en .bak
+    bak_path = card_info_path.with_suffix(".db.bak")
+    card_info_path.rename(bak_path)
+    print("  Renamed card_info.db → card_info.db.bak")
+    print("Legacy migration complete.")
+
+
+# Colonnes écrites par l'import Anki, dans l'ordre attendu par upsert_anki_cards
+ANKI_CARD_COLS = (
+    "card_id", "card_type", "queue", "due_date", "raw_due", "interval", "ease_factor",
+    "texts_json", "image_filenames_json", "reps", "lapses",
+    "anki_note_id", "anki_mod", "anki_note_mod", "content_hash",
+)
+
+# Colonnes de contenu : réécrites seulement si l'empreinte du contenu a changé
+_CONTENT_COLS = ("texts_json", "image_filenames_json", "content_hash")
+ANKI_META_COLS = tuple(c for c in ANKI_CARD_COLS if c not in _CONTENT_COLS)
+
+
+def content_fingerprint(texts: dict[str, str], image_filenames: list[str]) -> str:
+    """Empreinte du contenu d'une carte (champs normalisés + noms des médias).
+
+    Les textes sont normalisés (NFC, espaces de bord retirés) : une note
+    réenregistrée à l'identique dans Anki garde la même empreinte.
+    """
+    normalized = {name: unicodedata.normalize("NFC", value).strip() for name, value in texts.items()}
+    # json de la bibliothèque standard (et non fast_json) : les empreintes déjà
+    # stockées doivent rester identiques
+    payload = json.dumps([normalized, image_filenames], sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def upsert_anki_cards(conn: sqlite3.Connection, rows: list[tuple],
+                      meta_rows: list[tuple] = ()) -> None:
+    """Insère ou met à jour des cartes importées d'Anki en une transaction.
+
+    Chaque row suit ANKI_CARD_COLS. Une carte existante garde ses données locales
+    (tags, min_interval, blocking, topo_depth) ; ses champs Anki sont remplacés
+    et elle repasse sous la gestion d'Anki (locally_managed = 0).
+
+    meta_rows (ANKI_META_COLS) met à jour des cartes existantes dont le contenu
+    n'a pas changé : planification et dates de modification seulement, sans
+    réécrire texts_json / image_filenames_json.
+
+    Dans un bloc cards_db_conn(), les écritures rejoignent la transaction du
+    bloc (voir write_transaction).
+    """
+    cols = ", ".join(ANKI_CARD_COLS)
+    placeholders = ", ".join("?" for _ in ANKI_CARD_COLS)
+    updates = ", ".join(f"{c} = excluded.{c}" for c in ANKI_CARD_COLS[1:])
+    meta_updates = ", ".join(f"{c} = ?" for c in ANKI_META_COLS[1:])
+    with write_transaction(conn):
+        if rows:
+            conn.executemany(
+                f"""INSERT INTO cards ({cols}, locally_managed, is_blocking, is_blocked)
+                    VALUES ({placeholders}, 0, 0, 0)
+                    ON CONFLICT(card_id) DO UPDATE SET {updates}, locally_managed = 0""",
+                rows,
+            )
+        if meta_rows:
+            conn.executemany(
+                f"UPDATE cards SET {meta_updates}, locally_managed = 0 WHERE card_id = ?",
+                [row[1:] + row[:1] for row in meta_rows],
+            )
+
+
+def get_anki_import_state(conn: sqlite3.Connection, card_ids: list[str]) -> dict[str, tuple]:
+    """Retourne {card_id: (content_hash, locally_managed, valeurs ANKI_META_COLS[1:])} des cartes connues."""
+    meta = ", ".join(ANKI_META_COLS[1:])
+    state: dict[str, tuple] = {}
+    for start in range(0, len(card_ids), _IN_CHUNK_SIZE):
+        chunk = card_ids[start:start + _IN_CHUNK_SIZE]
+        placeholders = ",".join("?" for _ in chunk)
+        for row in conn.execute(
+            f"SELECT card_id, content_hash, locally_managed, {meta} FROM cards "
+            f"WHERE card_id IN ({placeholders})",
+            chunk,
+        ):
+            state[row[0]] = (row[1], row[2], row[3:])
+    return state
+
+
+def get_card_rows(conn: sqlite3.Connection, card_ids: list[str], cols: str) -> list[tuple]:
+    """Lit les colonnes cols (card_id en premier) des cartes card_ids, dans l'ordre demandé.
+
+    Une requête IN (...) par paquet de _IN_CHUNK_SIZE IDs distincts (limite de
+    variables SQLite). Les IDs inconnus sont omis ; un ID répété donne sa ligne
+    à chaque occurrence.
+    """
+    unique_ids = list(dict.fromkeys(card_ids))
+    rows: dict[str, tuple] = {}
+    for start in range(0, len(unique_ids), _IN_CHUNK_SIZE):
+        chunk = unique_ids[start:start + _IN_CHUNK_SIZE]
+        placeholders = ",".join("?" for _ in chunk)
+        for row in conn.execute(f"SELECT {cols} FROM cards WHERE card_id IN ({placeholders})", chunk):
+            rows[row[0]] = row
+    return [rows[card_id] for card_id in card_ids if card_id in rows]
+
+
+def get_anki_sync_state(conn: sqlite3.Connection, card_ids: list[str]) -> dict[str, tuple]:
+    """Retourne {card_id: (anki_note_id, anki_mod, anki_note_mod, locally_managed)} des cartes déjà importées."""
+    state: dict[str, tuple] = {}
+    for start in range(0, len(card_ids), _IN_CHUNK_SIZE):
+        chunk = card_ids[start:start + _IN_CHUNK_SIZE]
+        placeholders = ",".join("?" for _ in chunk)
+        for card_id, note_id, mod, note_mod, locally_managed in conn.execute(
+            f"SELECT card_id, anki_note_id, anki_mod, anki_note_mod, locally_managed FROM cards "
+            f"WHERE card_id IN ({placeholders})",
+            chunk,
+        ):
+            state[card_id] = (note_id, mod, note_mod, locally_managed)
+    return state
+
+
+# Champs de planification rafraîchis depuis Anki, dans l'ordre attendu par update_anki_scheduling
+ANKI_SCHEDULING_COLS = (
+    "card_type", "queue", "due_date", "raw_due", "interval", "ease_factor",
+    "reps", "lapses", "anki_mod",
+)
+
+
+def get_anki_scheduling_state(conn: sqlite3.Connection) -> dict[str, tuple]:
+    """Retourne {card_id: valeurs ANKI_SCHEDULING_COLS} des cartes Anki gérées par Anki.
+
+    Les cartes locales et celles passées en gestion locale (locally_managed = 1)
+    sont exclues : leur planification ne vient plus d'Anki.
+    """
+    cols = ", ".join(ANKI_SCHEDULING_COLS)
+    return {
+        row[0]: row[1:]
+        for row in conn.execute(
+            f"SELECT card_id, {cols} FROM cards "
+            f"WHERE locally_managed = 0 AND card_id NOT LIKE 'local_%'"
+        )
+    }
 
-        # 4. Renommer card_info.db en .bak
-        bak_path = card_info_path.with_suffix(".db.bak")
-        card_info_path.rename(bak_path)
-        print("  Renamed card_info.db → card_info.db.bak")
-        print("Legacy migration complete.")
-    finally:
-        cards_conn.close()
+
+def update_anki_scheduling(conn: sqlite3.Connection, rows: list[tuple]) -> int:
+    """Remplace les champs de planification de cartes Anki en une transaction.
+
+    Chaque row suit ANKI_SCHEDULING_COLS suivi du card_id. Une carte passée en
+    gestion locale entre la lecture et l'écriture n'est pas modifiée.
+
+    Returns:
+        Nombre de cartes mises à jour
+    """
+    updates = ", ".join(f"{c} = ?" for c in ANKI_SCHEDULING_COLS)
+    with write_transaction(conn):
+        cursor = conn.executemany(
+            f"UPDATE cards SET {updates} WHERE card_id = ? AND locally_managed = 0",
+            rows,
+        )
+    return cursor.rowcount
+
+
+def get_scheduling_rows(conn: sqlite3.Connection, card_ids: list[str] | None = None) -> list[tuple]:
+    """Retourne (type, queue, interval, factor, lapses) par carte, factor au format Anki (2500 = 250%).
+
+    Toutes les cartes de cards.db si card_ids est None.
+    """
+    sql = ("SELECT card_type, queue, interval, CAST(ROUND(ease_factor * 1000) AS INTEGER), lapses "
+           "FROM cards")
+    if card_ids is None:
+        return conn.execute(sql).fetchall()
+    rows: list[tuple] = []
+    for start in range(0, len(card_ids), _IN_CHUNK_SIZE):
+        chunk = card_ids[start:start + _IN_CHUNK_SIZE]
+        placeholders = ",".join("?" for _ in chunk)
+        rows.extend(conn.execute(f"{sql} WHERE card_id IN ({placeholders})", chunk))
+    return rows
 
 
 def get_all_tags(conn: sqlite3.Connection | None = None) -> list[str]:
     """Retourne tous les tags distincts utilisés par les cartes, triés."""
-    should_close = conn is None
     if conn is None:
-        conn = get_cards_db_conn()
-    try:
-        rows = conn.execute("SELECT tags_json FROM cards WHERE tags_json IS NOT NULL").fetchall()
-        tags: set[str] = set()
-        for (tags_json,) in rows:
-            try:
-                for t in json.loads(tags_json):
-                    tags.add(t)
-            except (json.JSONDecodeError, TypeError):
-                pass
-        return sorted(tags)
-    finally:
-        if should_close:
-            conn.close()
+        with cards_db_conn() as conn:
+            return get_all_tags(conn)
+    return [tag for (tag,) in conn.execute("SELECT tag FROM tag_counts ORDER BY tag")]
 
 
-def add_tag(card_ids: list[str], tag: str) -> None:
-    """Ajoute un tag aux cartes spécifiées."""
-    conn = get_cards_db_conn()
-    try:
-        for card_id in card_ids:
-            row = conn.execute(
-                "SELECT tags_json FROM cards WHERE card_id = ?", (card_id,)
-            ).fetchone()
-            if row is None:
-                continue
-            tags = json.loads(row[0]) if row[0] else []
-            if tag not in tags:
-                tags.append(tag)
-                conn.execute(
-                    "UPDATE cards SET tags_json = ? WHERE card_id = ?",
-                    (json.dumps(tags), card_id),
-                )
-        conn.commit()
-    finally:
-        conn.close()
+def get_tag_counts(conn: sqlite3.Connection | None = None) -> dict[str, int]:
+    """Retourne {tag: nombre de cartes}, trié par tag."""
+    if conn is None:
+        with cards_db_conn() as conn:
+            return get_tag_counts(conn)
+    return dict(conn.execute("SELECT tag, n FROM tag_counts ORDER BY tag"))
 
 
-def remove_tag(card_ids: list[str], tag: str) -> None:
-    """Retire un tag des cartes spécifiées."""
-    conn = get_cards_db_conn()
-    try:
-        for card_id in card_ids:
-            row = conn.execute(
-                "SELECT tags_json FROM cards WHERE card_id = ?", (card_id,)
-            ).fetchone()
-            if row is None:
-                continue
-            tags = json.loads(row[0]) if row[0] else []
-            if tag in tags:
-                tags.remove(tag)
-                conn.execute(
-                    "UPDATE cards SET tags_json = ? WHERE card_id = ?",
-                    (json.dumps(tags), card_id),
-                )
-        conn.commit()
-    finally:
-        conn.close()
+def get_card_ids_with_tag(tag: str, conn: sqlite3.Connection | None = None) -> list[str]:
+    """Retourne les IDs des cartes portant tag (lecture de l'index idx_card_tags_tag)."""
+    if conn is None:
+        with cards_db_conn() as conn:
+            return get_card_ids_with_tag(tag, conn)
+    return [card_id for (card_id,) in conn.execute(
+        "SELECT card_id FROM card_tags WHERE tag = ? ORDER BY card_id", (tag,)
+    )]
+
+
+def set_card_tags(conn: sqlite3.Connection, card_id: str, tags: list[str]) -> None:
+    """Remplace les tags d'une carte (dans la transaction de l'appelant).
+
+    Seuls les tags retirés ou ajoutés sont écrits : un enregistrement avec les
+    mêmes tags ne déclenche aucun trigger (row_version et tag_counts intacts).
+    """
+    current = {tag for (tag,) in conn.execute("SELECT tag FROM card_tags WHERE card_id = ?", (card_id,))}
+    wanted = {tag for tag in tags if tag}
+    conn.executemany(
+        "DELETE FROM card_tags WHERE card_id = ? AND tag = ?",
+        [(card_id, tag) for tag in current - wanted],
+    )
+    conn.executemany(
+        "INSERT INTO card_tags (card_id, tag) VALUES (?, ?)",
+        [(card_id, tag) for tag in wanted - current],
+    )
+
+
+def add_tag(card_ids: list[str], tag: str) -> int:
+    """Ajoute un tag aux cartes spécifiées, en une seule requête.
+
+    Les IDs passent en un seul paramètre JSON (json_each) : pas de limite de
+    variables SQLite, quel que soit le nombre de cartes. Retourne le nombre de
+    cartes qui n'avaient pas encore le tag.
+    """
+    with cards_db_conn() as conn:
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO card_tags (card_id, tag) "
+            "SELECT card_id, ? FROM cards WHERE card_id IN (SELECT value FROM json_each(?))",
+            (tag, fast_json.dumps(card_ids)),
+        )
+        return cursor.rowcount
+
+
+def remove_tag(card_ids: list[str], tag: str) -> int:
+    """Retire un tag des cartes spécifiées, en une seule requête. Retourne le nombre de cartes modifiées."""
+    with cards_db_conn() as conn:
+        cursor = conn.execute(
+            "DELETE FROM card_tags WHERE tag = ? AND card_id IN (SELECT value FROM json_each(?))",
+            (tag, fast_json.dumps(card_ids)),
+        )
+        return cursor.rowcount
@@ -0,0 +1,112 @@
+"""
+Manifeste des médias (table media de cards.db).
+
+Une ligne par fichier image connu : taille, mtime et présence dans le dossier
+des images. La sérialisation des cartes consulte cette table (une requête par
+réponse) au lieu d'un stat par image et par requête.
+
+Tenu à jour par l'import (médias téléchargés ou copiés), /upload_image et la
+suppression des cartes locales ; reconcile_media rattrape les changements
+faits hors de l'application (fichiers ajoutés, supprimés ou remplacés à la
+main) et remplit le manifeste au premier démarrage.
+"""
+import os
+import sqlite3
+from pathlib import Path
+from typing import Iterable
+
+from src.graph.cards_db import write_transaction
+from src.utilities import fast_json
+
+
+def _stat_row(images_dir: Path, filename: str) -> tuple:
+    """(filename, size, mtime, present) d'un fichier du dossier des images."""
+    try:
+        stat = os.stat(images_dir / filename)
+    except OSError:
+        return filename, None, None, 0
+    return filename, stat.st_size, stat.st_mtime, 1
+
+
+def _upsert(conn: sqlite3.Connection, rows: list[tuple]) -> None:
+    conn.executemany(
+        """INSERT INTO media (filename, size, mtime, present) VALUES (?, ?, ?, ?)
+           ON CONFLICT(filename) DO UPDATE SET
+               size = excluded.size, mtime = excluded.mtime, present = excluded.present""",
+        rows,
+    )
+
+
+def record_media(conn: sqlite3.Connection, images_dir: Path, filenames: Iterable[str]) -> None:
+    """Enregistre l'état sur le disque des fichiers filenames (écrits, copiés ou manquants)."""
+    _upsert(conn, [_stat_row(Path(images_dir), fn) for fn in dict.fromkeys(filenames)])
+
+
+def mark_media_removed(conn: sqlite3.Connection, filenames: Iterable[str]) -> None:
+    """Marque des fichiers comme supprimés du dossier des images."""
+    _upsert(conn, [(fn, None, None, 0) for fn in dict.fromkeys(filenames)])
+
+
+def get_present_media(conn: sqlite3.Connection, filenames: Iterable[str]) -> set[str]:
+    """Parmi filenames, ceux présents dans le dossier des images (une seule requête)."""
+    wanted = list(dict.fromkeys(filenames))
+    if not wanted:
+        return set()
+    return {filename for (filename,) in conn.execute(
+        "SELECT filename FROM media "
+        "WHERE present = 1 AND filename IN (SELECT value FROM json_each(?))",
+        (fast_json.dumps(wanted),),
+    )}
+
+
+def _scan_images_dir(images_dir: Path) -> dict[str, tuple]:
+    """{filename: (size, mtime)} des fichiers du dossier (fichiers temporaires « .* » exclus)."""
+    found = {}
+    try:
+        with os.scandir(images_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith(".") or not entry.is_file():
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                found[entry.name] = (stat.st_size, stat.st_mtime)
+    except FileNotFoundError:
+        pass
+    return found
+
+
+def reconcile_media(conn: sqlite3.Connection, images_dir: Path) -> dict[str, int]:
+    """Aligne le manifeste sur le contenu réel du dossier des images.
+
+    Returns:
+        dict {scanned, added, changed, removed} — added : fichiers absents du
+        manifeste ou qui y étaient marqués manquants, changed : taille ou mtime
+        différents, removed : fichiers du manifeste disparus du disque
+    """
+    on_disk = _scan_images_dir(Path(images_dir))
+    known = {
+        filename: (size, mtime, present)
+        for filename, size, mtime, present in conn.execute(
+            "SELECT filename, size, mtime, present FROM media"
+        )
+    }
+
+    added = changed = 0
+    rows = []
+    for filename, (size, mtime) in on_disk.items():
+        entry = known.get(filename)
+        if entry is None or not entry[2]:
+            added += 1
+        elif entry[:2] != (size, mtime):
+            changed += 1
+        else:
+            continue
+        rows.append((filename, size, mtime, 1))
+    removed = [fn for fn, (_size, _mtime, present) in known.items() if present and fn not in on_disk]
+
+    with write_transaction(conn):
+        _upsert(conn, rows)
+        mark_media_removed(conn, removed)
+    return {"scanned": len(on_disk), "added": added, "changed": changed, "removed": len(removed)}
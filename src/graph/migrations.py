@@ -0,0 +1,55 @@
+"""
+Migrations de schéma versionnées, communes à cards.db et graph.db.
+
+La version du schéma est mémorisée dans PRAGMA user_version (en-tête du
+fichier SQLite). Au démarrage, seules les étapes de numéro supérieur sont
+jouées, chacune dans sa propre transaction avec la mise à jour de
+user_version : une étape interrompue est annulée en entier et rejouée au
+démarrage suivant. Sur une base à jour, le coût se limite à une lecture
+de user_version.
+
+Les étapes restent idempotentes : une base créée ou migrée avant
+l'introduction de user_version (version 0) les rejoue toutes une fois.
+"""
+import sqlite3
+from typing import Callable, NamedTuple
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Connection], None]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def apply_migrations(conn: sqlite3.Connection, migrations: list[Migration],
+                     db_name: str) -> list[int]:
+    """Joue les migrations dont la version dépasse user_version, dans l'ordre.
+
+    Returns:
+        Les versions appliquées (liste vide si la base était à jour)
+    """
+    current = get_schema_version(conn)
+    pending = [m for m in migrations if m.version > current]
+    if not pending:
+        return []
+
+    if conn.in_transaction:
+        conn.commit()
+    applied = []
+    for migration in sorted(pending, key=lambda m: m.version):
+        # BEGIN explicite : sqlite3 n'ouvre pas de transaction avant un ALTER TABLE
+        conn.execute("BEGIN")
+        try:
+            migration.apply(conn)
+            conn.execute(f"PRAGMA user_version = {int(migration.version)}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        applied.append(migration.version)
+        print(f"  {db_name} migration {migration.version}: {migration.description}")
+    return applied
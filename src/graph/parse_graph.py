@@ -1,11 +1,12 @@
 """
 Parse card_positions.json et peuple la table edges en explosant les groupes.
 """
-import json
 import sqlite3
 from pathlib import Path
 from typing import Set, Union
 
+from src.utilities import fast_json
+
 
 def parse_json_to_db(
     json_path: Union[Path, str],
@@ -23,8 +24,7 @@ def parse_json_to_db(
         Set de tous les card_ids (clés de cards + membres des groups)
     """
     json_path = Path(json_path)
-    with open(json_path, encoding="utf-8") as f:
-        data = json.load(f)
+    data = fast_json.loads(json_path.read_bytes())
 
     cards_data = data.get("cards", {})
     groups_data = data.get("groups", {})
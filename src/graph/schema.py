@@ -6,6 +6,8 @@ import sqlite3
 from pathlib import Path
 from typing import Union
 
+from src.graph.migrations import Migration, apply_migrations
+
 _SCHEMA_SQL = """
 -- Relations parent → enfant (après expansion des groupes du JSON)
 CREATE TABLE edges (
@@ -22,10 +24,19 @@ CREATE TABLE IF NOT EXISTS config (
 """
 
 
-def migrate_db(conn: sqlite3.Connection) -> None:
-    """S'assure que la table config existe (idempotent)."""
+def _migrate_config_table(conn: sqlite3.Connection) -> None:
     conn.execute("CREATE TABLE IF NOT EXISTS config (key TEXT PRIMARY KEY, value TEXT)")
-    conn.commit()
+
+
+# Étapes numérotées de graph.db (voir src/graph/migrations.py)
+GRAPH_DB_MIGRATIONS = [
+    Migration(1, "table config", _migrate_config_table),
+]
+
+
+def migrate_db(conn: sqlite3.Connection) -> list[int]:
+    """Joue les migrations de graph.db en attente (aucune si user_version est à jour)."""
+    return apply_migrations(conn, GRAPH_DB_MIGRATIONS, "graph.db")
 
 
 def get_config(conn: sqlite3.Connection, key: str) -> str | None:
@@ -56,5 +67,7 @@ def create_database(db_path: Union[Path, str]) -> sqlite3.Connection:
 
     conn = sqlite3.connect(str(db_path))
     conn.executescript(_SCHEMA_SQL)
+    # Le schéma créé est déjà le dernier : rien à migrer
+    conn.execute(f"PRAGMA user_version = {GRAPH_DB_MIGRATIONS[-1].version}")
     conn.commit()
     return conn
@@ -0,0 +1,40 @@
+"""
+Encodage et décodage JSON rapides, pour les colonnes JSON de cards.db et les
+réponses de l'API.
+
+orjson est optionnel (extra `fast-json`) : sans lui, les mêmes fonctions
+passent par json avec des options équivalentes et produisent le même texte
+compact (séparateurs sans espaces, UTF-8 non échappé). L'encodage stocké
+dans cards.db ne dépend donc pas de l'environnement.
+"""
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dépend de l'environnement
+    orjson = None
+
+
+def loads(data: str | bytes) -> Any:
+    """Décode un document JSON (texte ou octets UTF-8)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> str:
+    """Texte JSON compact : colonnes *_json de cards.db, listes passées à json_each."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def dumps_bytes(obj: Any, indent: bool = False) -> bytes:
+    """Document JSON en octets UTF-8 (corps de réponse, fichiers) ; indent : indentation de 2."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=option)
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
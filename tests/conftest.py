@@ -0,0 +1,71 @@
+"""
+Fixtures communes : transport AnkiConnect factice, requêtes des routes API.
+"""
+import json
+
+import pytest
+
+from src.anki_interface.utils import AnkiConnectClient
+
+
+class StubResponse:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._payload
+
+
+class StubSession:
+    """Remplace requests.Session : chaque POST est décodé et passé à handler."""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = []
+
+    def post(self, url, data, timeout):
+        request = json.loads(data)
+        self.requests.append(request)
+        return StubResponse(self.handler(request))
+
+    def close(self):
+        pass
+
+
+class StubRequest:
+    """Requête FastAPI minimale pour appeler une route directement : seul json() est lu."""
+
+    def __init__(self, data):
+        self._data = data
+
+    async def json(self):
+        return self._data
+
+
+@pytest.fixture
+def stub_anki_client():
+    """Fabrique de AnkiConnectClient dont les requêtes sont servies par handler(request)."""
+    def make(handler) -> AnkiConnectClient:
+        client = AnkiConnectClient()
+        client.session = StubSession(handler)
+        return client
+    return make
+
+
+@pytest.fixture
+def cards_db_path(tmp_path, monkeypatch):
+    """cards.db temporaire, migrée, servie par cards_db_conn() pendant le test."""
+    from src.graph import cards_db
+
+    path = tmp_path / "cards.db"
+    monkeypatch.setattr(cards_db, "get_cards_db_path", lambda: path)
+    conn = cards_db.get_cards_db_conn()
+    try:
+        cards_db.migrate_cards_db(conn)
+    finally:
+        conn.close()
+    yield path
+    cards_db.close_cards_db_conns()
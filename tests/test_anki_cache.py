@@ -0,0 +1,52 @@
+"""
+Cache TTL des actions AnkiConnect en lecture seule : hits, lecture forcée, invalidation.
+"""
+import asyncio
+
+import pytest
+
+from src.anki_interface import cache
+from src.anki_interface.cache import (
+    TTLCache, async_cached_anki_request, cached_anki_request, invalidate_anki_cache,
+)
+
+
+@pytest.fixture
+def anki(monkeypatch):
+    """Remplace AnkiConnect : findCards renvoie une nouvelle liste à chaque appel."""
+    calls = []
+
+    def request(action, **params):
+        calls.append(action)
+        return list(range(len(calls)))
+
+    async def async_request(action, **params):
+        return request(action, **params)
+
+    monkeypatch.setattr(cache, "_cache", TTLCache())
+    monkeypatch.setattr(cache, "anki_request", request)
+    monkeypatch.setattr(cache, "async_anki_request", async_request)
+    return calls
+
+
+def test_find_cards_is_served_from_cache(anki):
+    assert cached_anki_request('findCards', query='deck:a') == [0]
+    assert cached_anki_request('findCards', query='deck:a') == [0]
+    assert anki == ['findCards']
+
+
+def test_fresh_bypasses_cache_and_replaces_entry(anki):
+    cached_anki_request('findCards', query='deck:a')
+    assert cached_anki_request('findCards', _fresh=True, query='deck:a') == [0, 1]
+    assert cached_anki_request('findCards', query='deck:a') == [0, 1]
+    assert asyncio.run(async_cached_anki_request('findCards', _fresh=True, query='deck:a')) == [0, 1, 2]
+    assert len(anki) == 3
+
+
+def test_invalidate_drops_only_the_given_action(anki):
+    cached_anki_request('findCards', query='deck:a')
+    cached_anki_request('deckNames')
+    assert invalidate_anki_cache('findCards') == 1
+    cached_anki_request('findCards', query='deck:a')
+    cached_anki_request('deckNames')
+    assert anki == ['findCards', 'deckNames', 'findCards']
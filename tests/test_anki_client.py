@@ -0,0 +1,122 @@
+"""
+Transport AnkiConnect : action multi et lots AnkiBatch, sur une session factice.
+"""
+import json
+
+import pytest
+
+from src.anki_interface.utils import AnkiConnectClient, CircuitBreaker
+from tests.conftest import StubSession
+
+
+def _multi_echo(request):
+    """Réponse multi : « action:params » par sous-action, erreur pour l'action « fail »."""
+    results = []
+    for sub in request["params"]["actions"]:
+        if sub["action"] == "fail":
+            results.append({"result": None, "error": "boom"})
+        else:
+            results.append({"result": f"{sub['action']}:{json.dumps(sub['params'])}", "error": None})
+    return {"result": results, "error": None}
+
+
+@pytest.fixture
+def client(stub_anki_client):
+    return stub_anki_client(_multi_echo)
+
+
+def test_multi_returns_results_in_action_order(client):
+    results = client.multi([
+        {"action": "findCards", "params": {"query": "deck:a"}},
+        {"action": "cardsInfo", "params": {"cards": [1, 2]}},
+        {"action": "retrieveMediaFile", "params": {"filename": "x.png"}},
+    ])
+    assert results == [
+        'findCards:{"query": "deck:a"}',
+        'cardsInfo:{"cards": [1, 2]}',
+        'retrieveMediaFile:{"filename": "x.png"}',
+    ]
+    assert len(client.session.requests) == 1
+    assert client.session.requests[0]["action"] == "multi"
+
+
+def test_multi_maps_per_action_error_to_none(client, capsys):
+    results = client.multi([
+        {"action": "findCards", "params": {"query": "deck:a"}},
+        {"action": "fail"},
+        {"action": "findCards", "params": {"query": "deck:b"}},
+    ])
+    assert results == ['findCards:{"query": "deck:a"}', None, 'findCards:{"query": "deck:b"}']
+    assert "boom" in capsys.readouterr().out
+
+
+def test_multi_rejects_response_with_wrong_length(client):
+    client.session = StubSession(lambda request: {"result": [{"result": 1, "error": None}], "error": None})
+    assert client.multi([{"action": "a"}, {"action": "b"}]) is None
+
+
+def test_multi_without_actions_sends_nothing(client):
+    assert client.multi([]) == []
+    assert client.session.requests == []
+
+
+def test_batch_splits_into_chunks_and_keeps_indexes(client):
+    batch = client.batch(max_actions=2)
+    indexes = [batch.add("findCards", query=f"deck:{i}") for i in range(5)]
+    results = batch.flush()
+    assert indexes == [0, 1, 2, 3, 4]
+    assert results == [f'findCards:{{"query": "deck:{i}"}}' for i in range(5)]
+    assert len(client.session.requests) == 3
+    assert len(batch) == 0
+
+
+def test_batch_failed_chunk_gives_none_for_its_actions(client):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 2:
+            return {"result": None, "error": "collection is not available"}
+        return _multi_echo(request)
+
+    client.session = StubSession(handler)
+    with client.batch(max_actions=2) as batch:
+        for i in range(4):
+            batch.add("findCards", query=f"deck:{i}")
+    assert batch.results == ['findCards:{"query": "deck:0"}', 'findCards:{"query": "deck:1"}', None, None]
+
+
+class _InvalidJson:
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        raise ValueError("réponse illisible")
+
+
+def _half_open_client(stub_anki_client, handler) -> AnkiConnectClient:
+    """Client dont le disjoncteur vient de s'ouvrir et passe aussitôt en semi-ouvert."""
+    client = stub_anki_client(handler)
+    client.breaker = CircuitBreaker(threshold=1, reset_after=0.0)
+    client.breaker.record_failure()
+    assert client.breaker.state == CircuitBreaker.HALF_OPEN
+    return client
+
+
+def test_breaker_trial_released_when_params_are_not_serialisable(stub_anki_client):
+    client = _half_open_client(stub_anki_client, lambda request: {"result": 6, "error": None})
+    with pytest.raises(TypeError):
+        client.invoke("findCards", query=object())
+    assert client.session.requests == []
+    # L'essai a été libéré : l'appel suivant peut partir et referme le disjoncteur
+    assert client.invoke("version") == 6
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_records_failure_on_unreadable_response(stub_anki_client):
+    client = _half_open_client(stub_anki_client, None)
+    client.session.post = lambda url, data, timeout: _InvalidJson()
+    with pytest.raises(ValueError):
+        client.invoke("version")
+    assert client.breaker.failures == 2
+    assert not client.breaker._trial_in_flight
@@ -0,0 +1,91 @@
+"""
+Chargement groupé des cartes : propagation de la priorité AnkiConnect aux threads du pool.
+"""
+import asyncio
+import weakref
+
+from src.anki_interface import card as card_module
+from src.anki_interface.card import Card
+from src.anki_interface.scheduler import BULK, anki_priority, current_priority
+
+
+class _AsyncClient:
+    async def cards_info(self, card_ids, chunk_size):
+        return [{"cardId": cid, "fields": {}} for cid in card_ids]
+
+
+def test_aload_many_downloads_images_under_caller_priority(monkeypatch, tmp_path):
+    seen = []
+    monkeypatch.setattr(card_module, "get_async_anki_client", lambda: _AsyncClient())
+    monkeypatch.setattr(Card, "download_images",
+                        classmethod(lambda cls, cards, output_dir: seen.append(current_priority())))
+
+    async def load():
+        with anki_priority(BULK):
+            return await Card.aload_many([1, 2], load_images=True, image_output_dir=str(tmp_path))
+
+    cards = asyncio.run(load())
+    assert [card.card_id for card in cards] == [1, 2]
+    assert seen == [BULK]
+
+
+def _fake_anki_request(actions):
+    """anki_request factice : trois cartes, seule la 2 a un facteur au-dessus du seuil."""
+    factors = {1: 2100, 2: 2600, 3: 1800}
+
+    def request(action, **params):
+        actions.append(action)
+        if action == 'findCards':
+            return [1, 2, 3]
+        if action == 'getEaseFactors':
+            return [factors[cid] for cid in params['cards']]
+        if action == 'cardsInfo':
+            return [{'cardId': cid, 'factor': factors[cid], 'type': 2,
+                     'fields': {'Front': {'value': f'Carte {cid}'}}} for cid in params['cards']]
+        raise AssertionError(action)
+    return request
+
+
+def test_find_difficult_cards_loads_content_in_one_batch(monkeypatch):
+    actions = []
+    monkeypatch.setattr(card_module, 'anki_request', _fake_anki_request(actions))
+
+    cards = Card.find_difficult_cards('dessin')
+    assert [card.front for card in cards] == ['Carte 3', 'Carte 1']
+    assert 'Carte 3' in repr(cards[0])
+    assert actions == ['findCards', 'getEaseFactors', 'cardsInfo']
+
+
+def test_repr_of_scheduling_only_card_makes_no_request(monkeypatch):
+    actions = []
+    monkeypatch.setattr(card_module, 'anki_request', _fake_anki_request(actions))
+
+    (card,) = Card.load_scheduling([1])
+    assert repr(card).startswith('Card(1) [Review]')
+    assert actions == ['cardsInfo']
+
+
+class _Info(dict):
+    """Entrée cardsInfo (dict sous-classé pour pouvoir la suivre par weakref)."""
+
+
+def test_deck_statistics_keep_one_cards_info_chunk_in_memory(monkeypatch):
+    live = []
+
+    def request(action, **params):
+        if action == 'findCards':
+            return list(range(10))
+        # Les paquets déjà lus ont été versés dans les colonnes puis libérés
+        assert all(ref() is None for ref in live)
+        chunk = [_Info(cardId=cid, type=2, queue=2, interval=cid, factor=2500,
+                       lapses=cid % 2, fields={'Front': {'value': 'x' * 100}})
+                 for cid in params['cards']]
+        live.extend(weakref.ref(info) for info in chunk)
+        return chunk
+
+    monkeypatch.setattr(card_module, 'anki_request', request)
+    monkeypatch.setattr(card_module, 'CARDS_INFO_CHUNK_SIZE', 3)
+
+    stats = Card.get_deck_statistics('dessin')
+    assert len(live) == 10
+    assert (stats['total_cards'], stats['review_cards'], stats['avg_interval']) == (10, 10, 4.5)
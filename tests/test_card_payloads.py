@@ -0,0 +1,80 @@
+"""
+Cache des payloads de cartes : invalidation par row_version et par discard.
+"""
+import asyncio
+
+import pytest
+
+from src.anki_sketching.api import card_payloads, routes
+from src.anki_sketching.api.card_payloads import CardPayloadCache, load_card_payloads
+from src.graph.cards_db import add_tag, cards_db_conn
+from tests.conftest import StubRequest
+
+
+def _insert_local_card(card_id: str, front: str) -> None:
+    with cards_db_conn() as conn:
+        conn.execute(
+            "INSERT INTO cards (card_id, locally_managed, texts_json, image_filenames_json) "
+            "VALUES (?, 1, ?, '[]')",
+            (card_id, f'{{"Front":"{front}"}}'),
+        )
+
+
+def _load(card_id: str) -> dict:
+    with cards_db_conn() as conn:
+        (card,) = load_card_payloads(conn, [card_id])
+    return card
+
+
+@pytest.fixture
+def cache(cards_db_path, monkeypatch):
+    """Cache vide propre au test (le cache partagé n'est pas touché)."""
+    cache = CardPayloadCache(max_entries=10)
+    monkeypatch.setattr(card_payloads, "_cache", cache)
+    return cache
+
+
+def test_row_version_bump_invalidates_entry(cache):
+    _insert_local_card("local_1", "Recto")
+    assert _load("local_1")["tags"] == []
+    assert _load("local_1")["texts"] == {"Front": "Recto"}
+    assert (cache.misses, cache.hits) == (1, 1)
+
+    add_tag(["local_1"], "dessin")
+    assert _load("local_1")["tags"] == ["dessin"]
+    assert cache.outdated == 1
+
+    with cards_db_conn() as conn:
+        conn.execute("UPDATE cards SET texts_json = '{\"Front\":\"Verso\"}' WHERE card_id = 'local_1'")
+    assert _load("local_1")["texts"] == {"Front": "Verso"}
+    assert cache.outdated == 2
+    # Colonne hors payload : l'entrée reste valide
+    with cards_db_conn() as conn:
+        conn.execute("UPDATE cards SET topo_depth = 3 WHERE card_id = 'local_1'")
+    _load("local_1")
+    assert (cache.outdated, cache.hits) == (2, 2)
+
+
+def test_deleted_card_is_discarded(cache):
+    _insert_local_card("local_1", "Recto")
+    assert _load("local_1")["texts"] == {"Front": "Recto"}
+
+    asyncio.run(routes.delete_local_card_endpoint(StubRequest({"card_id": "local_1"})))
+    assert cache.stats()["entries"] == 0
+
+    # Même ID recréé : row_version repart de 0, l'ancienne entrée ne doit pas resservir
+    _insert_local_card("local_1", "Autre")
+    assert _load("local_1")["texts"] == {"Front": "Autre"}
+
+
+def test_lru_eviction_and_disabled_cache():
+    cache = CardPayloadCache(max_entries=2)
+    for card_id in ("a", "b", "c"):
+        cache.put(card_id, 0, card_id)
+    assert cache.get("a", 0) is None
+    assert cache.get("c", 0) == "c"
+    assert cache.evictions == 1
+
+    disabled = CardPayloadCache(max_entries=0)
+    disabled.put("a", 0, "a")
+    assert disabled.get("a", 0) is None
@@ -0,0 +1,96 @@
+"""
+Triggers de cards.db : row_version, due_day et tag_counts suivent chaque chemin
+d'écriture (import, révision, replanification, tags).
+"""
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+
+from src.anki_sketching.api import routes
+from src.graph.cards_db import (
+    add_tag,
+    cards_db_conn,
+    get_tag_counts,
+    remove_tag,
+    set_card_tags,
+    upsert_anki_cards,
+)
+from tests.conftest import StubRequest
+
+
+def _anki_row(card_id: str, due_date: str = "2030-01-01T00:00:00", front: str = "f") -> tuple:
+    """Row ANKI_CARD_COLS d'une carte en révision."""
+    return (card_id, 2, 2, due_date, 900, 10, 2.5, f'{{"Front":"{front}"}}', "[]",
+            3, 0, 10, 5, 100, f"hash{card_id}{front}")
+
+
+def _state(card_id: str) -> tuple:
+    """(row_version, due_day) d'une carte."""
+    with cards_db_conn() as conn:
+        return conn.execute("SELECT row_version, due_day FROM cards WHERE card_id = ?", (card_id,)).fetchone()
+
+
+@pytest.fixture
+def cards(cards_db_path, monkeypatch):
+    """Deux cartes importées, sans graph.db (pas de recalcul du blocking)."""
+    monkeypatch.setattr(routes, "_get_graph_conn", lambda: None)
+    with cards_db_conn() as conn:
+        upsert_anki_cards(conn, [_anki_row("1"), _anki_row("2")])
+    return cards_db_path
+
+
+def test_import_sets_due_day_and_bumps_row_version_on_change(cards):
+    assert _state("1") == (0, date(2030, 1, 1).toordinal())
+
+    with cards_db_conn() as conn:
+        # Réimport identique : aucune colonne du payload ne change
+        upsert_anki_cards(conn, [_anki_row("1")])
+        assert _state("1") == (0, date(2030, 1, 1).toordinal())
+        upsert_anki_cards(conn, [_anki_row("1", due_date="2030-02-01T00:00:00", front="g")])
+    assert _state("1") == (1, date(2030, 2, 1).toordinal())
+    assert _state("2")[0] == 0
+
+
+def test_review_and_reschedule_update_due_day_and_row_version(cards):
+    today = date.today()
+    asyncio.run(routes.review_card_endpoint(StubRequest({"card_id": "1", "action": "failed"})))
+    assert _state("1") == (1, (today + timedelta(days=1)).toordinal())
+
+    asyncio.run(routes.reschedule_card(StubRequest({"card_id": "1"})))
+    assert _state("1") == (2, today.toordinal())
+
+    asyncio.run(routes.reschedule_distant_cards())
+    assert _state("2") == (1, today.toordinal())
+    # Déjà due aujourd'hui : la carte 1 n'est pas réécrite
+    assert _state("1") == (2, today.toordinal())
+
+
+def test_tags_update_counts_and_row_version(cards):
+    assert add_tag(["1", "2", "inconnue"], "dessin") == 2
+    assert add_tag(["1"], "dessin") == 0
+    assert add_tag(["1"], "visages") == 1
+    assert get_tag_counts() == {"dessin": 2, "visages": 1}
+    assert _state("1")[0] == 2
+    assert _state("2")[0] == 1
+
+    assert remove_tag(["1"], "visages") == 1
+    assert remove_tag(["1", "2"], "dessin") == 2
+    assert get_tag_counts() == {}
+    assert _state("1")[0] == 4
+    assert _state("2")[0] == 2
+
+
+def test_saving_the_same_tags_keeps_row_version(cards):
+    with cards_db_conn() as conn:
+        set_card_tags(conn, "1", ["dessin", "visages"])
+    assert _state("1")[0] == 2
+
+    with cards_db_conn() as conn:
+        set_card_tags(conn, "1", ["visages", "dessin", "", "dessin"])
+    assert _state("1")[0] == 2
+
+    with cards_db_conn() as conn:
+        set_card_tags(conn, "1", ["dessin", "mains"])
+    assert _state("1")[0] == 4
+    assert get_tag_counts() == {"dessin": 1, "mains": 1}
@@ -0,0 +1,90 @@
+"""
+Connexions cards_db_conn() : une par thread, transaction commitée par le bloc le plus externe.
+"""
+import threading
+
+import pytest
+
+from src.graph.cards_db import (
+    cards_db_conn,
+    close_cards_db_conns,
+    get_cards_db_conn,
+    update_anki_scheduling,
+    upsert_anki_cards,
+)
+from src.graph.media_manifest import reconcile_media
+
+
+def _count(conn) -> int:
+    return conn.execute("SELECT COUNT(*) FROM cards").fetchone()[0]
+
+
+def test_connection_is_reused_per_thread(cards_db_path):
+    with cards_db_conn() as conn, cards_db_conn() as nested:
+        assert nested is conn
+    with cards_db_conn() as again:
+        assert again is conn
+
+    other = []
+
+    def use_connection():
+        with cards_db_conn() as thread_conn:
+            other.append(thread_conn)
+        close_cards_db_conns()
+
+    thread = threading.Thread(target=use_connection)
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+
+def test_outermost_block_commits(cards_db_path):
+    reader = get_cards_db_conn()
+    try:
+        with cards_db_conn() as conn:
+            with cards_db_conn() as nested:
+                nested.execute("INSERT INTO cards (card_id) VALUES ('1')")
+            # Bloc imbriqué terminé : rien n'est encore visible ailleurs
+            assert conn.in_transaction
+            assert _count(reader) == 0
+        assert _count(reader) == 1
+    finally:
+        reader.close()
+
+
+def test_exception_rolls_back_the_whole_block(cards_db_path):
+    with pytest.raises(RuntimeError):
+        with cards_db_conn() as conn:
+            conn.execute("INSERT INTO cards (card_id) VALUES ('1')")
+            with cards_db_conn() as nested:
+                nested.execute("INSERT INTO cards (card_id) VALUES ('2')")
+            raise RuntimeError("échec")
+    with cards_db_conn() as conn:
+        assert _count(conn) == 0
+
+
+def test_write_helpers_join_the_outer_block(cards_db_path, tmp_path):
+    (tmp_path / "a.png").write_bytes(b"")
+    row = ("1", 2, 2, "2030-01-01", 900, 10, 2.5, "{}", "[]", 3, 0, 10, 5, 100, "hash")
+    with pytest.raises(RuntimeError):
+        with cards_db_conn() as conn:
+            upsert_anki_cards(conn, [row])
+            update_anki_scheduling(conn, [(2, 2, "2031-01-01", 900, 20, 2.5, 4, 0, 6, "1")])
+            reconcile_media(conn, tmp_path)
+            assert conn.in_transaction
+            raise RuntimeError("échec après les écritures")
+    with cards_db_conn() as conn:
+        assert _count(conn) == 0
+        assert conn.execute("SELECT COUNT(*) FROM media").fetchone()[0] == 0
+
+
+def test_write_helpers_commit_on_a_dedicated_connection(cards_db_path):
+    row = ("1", 2, 2, "2030-01-01", 900, 10, 2.5, "{}", "[]", 3, 0, 10, 5, 100, "hash")
+    conn = get_cards_db_conn()
+    try:
+        upsert_anki_cards(conn, [row])
+        assert not conn.in_transaction
+    finally:
+        conn.close()
+    with cards_db_conn() as conn:
+        assert _count(conn) == 1
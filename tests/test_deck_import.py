@@ -0,0 +1,104 @@
+"""
+Import de paquets : sélection des cartes à recharger (delta) et relecture de findCards.
+"""
+import asyncio
+
+import pytest
+
+from src.anki_sketching.api import deck_import, routes
+from src.anki_sketching.api.deck_import import cards_to_fetch
+from src.graph.cards_db import cards_db_conn, upsert_anki_cards
+
+
+def _anki_row(card_id: str, mod: int, note_id: int = 10, note_mod: int = 100) -> tuple:
+    """Row ANKI_CARD_COLS d'une carte en révision."""
+    return (card_id, 2, 2, "2030-01-01T00:00:00", 900, 10, 2.5, '{"Front":"f"}', "[]",
+            3, 0, note_id, mod, note_mod, f"hash{card_id}")
+
+
+def _store_cards(locally_managed_id: str) -> None:
+    with cards_db_conn() as conn:
+        upsert_anki_cards(conn, [_anki_row("1", mod=5), _anki_row("2", mod=5)])
+        conn.execute("UPDATE cards SET locally_managed = 1, due_date = '2031-01-01' WHERE card_id = ?",
+                     (locally_managed_id,))
+
+
+def test_delta_refetches_locally_managed_cards(cards_db_path, monkeypatch):
+    _store_cards(locally_managed_id="2")
+
+    async def card_mod_times(card_ids):
+        return {1: 5, 2: 5, 3: 7}
+
+    async def note_mod_times(note_ids):
+        return {10: 100}
+
+    monkeypatch.setattr(deck_import, "_card_mod_times", card_mod_times)
+    monkeypatch.setattr(deck_import, "_note_mod_times", note_mod_times)
+
+    # 1 inchangée dans Anki, 2 replanifiée localement, 3 nouvelle
+    assert asyncio.run(cards_to_fetch([1, 2, 3], delta=True)) == [2, 3]
+    assert asyncio.run(cards_to_fetch([1, 2, 3], delta=False)) == [1, 2, 3]
+
+
+def test_delta_from_collection_refetches_locally_managed_cards(cards_db_path):
+    _store_cards(locally_managed_id="1")
+    infos = [{"cardId": cid, "mod": 5, "noteMod": 100} for cid in (1, 2)]
+    assert asyncio.run(cards_to_fetch([1, 2], delta=True, card_infos=infos)) == [1]
+
+
+def test_every_import_rereads_find_cards(monkeypatch):
+    invalidated = []
+    monkeypatch.setattr(routes, "invalidate_anki_cache", invalidated.append)
+
+    async def get_cards_ids_async(deck_name, fresh=False):
+        assert fresh
+        return [1, 2]
+
+    monkeypatch.setattr(routes, "get_cards_ids_async", get_cards_ids_async)
+
+    for delta in (True, False):
+        card_ids, card_infos, media_dir = asyncio.run(routes._resolve_import("dessin", delta, "ankiconnect"))
+        assert card_ids == [1, 2]
+    assert invalidated == ["findCards", "findCards"]
+
+
+def test_cards_and_media_manifest_share_one_transaction(cards_db_path):
+    try:
+        with cards_db_conn() as conn:
+            upsert_anki_cards(conn, [_anki_row("1", mod=5)])
+            assert conn.in_transaction
+            raise OSError("échec du manifeste des médias")
+    except OSError:
+        pass
+    with cards_db_conn() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM cards").fetchone()[0] == 0
+
+
+def test_sync_decks_reports_each_deck_share_of_the_timings(monkeypatch):
+    class Client:
+        async def multi(self, actions):
+            return [[1, 2, 3], [3, 4], []]
+
+    async def cards_to_fetch(card_ids, delta):
+        return [1, 3, 4]
+
+    async def sync_deck(label, card_ids, crt, images_dir):
+        return {"inserted": 3, "updated": 0, "untouched": 0, "media": None,
+                "timings": {"check": 0.0, "cards": 3.0, "media": 1.5, "write": 0.6}}
+
+    monkeypatch.setattr(deck_import, "get_async_anki_client", lambda: Client())
+    monkeypatch.setattr(deck_import, "cards_to_fetch", cards_to_fetch)
+    monkeypatch.setattr(deck_import, "sync_deck", sync_deck)
+
+    result = asyncio.run(deck_import.sync_decks(["a", "a::b", "vide"], None, "images", delta=True))
+    decks = result["decks"]
+    assert {name: (deck["cards"], deck["fetched"]) for name, deck in decks.items()} == {
+        "a": (3, 2), "a::b": (2, 2), "vide": (0, 0),
+    }
+    assert set(decks["a"]["timings"]) == {"find", "check", "cards", "media", "write"}
+    # Rechargées : 1 et la moitié de 3 pour a, 4 et l'autre moitié de 3 pour a::b
+    assert decks["a"]["timings"]["cards"] == pytest.approx(1.5)
+    assert decks["a::b"]["timings"]["write"] == pytest.approx(0.3)
+    assert decks["vide"]["timings"]["cards"] == 0
+    for step, elapsed in result["timings"].items():
+        assert sum(deck["timings"][step] for deck in decks.values()) == pytest.approx(elapsed)
@@ -0,0 +1,40 @@
+"""
+Extraction du texte et des images des champs HTML.
+"""
+import pytest
+
+from src.anki_interface.html_fields import extract_field, extract_fields
+
+
+@pytest.mark.parametrize("html", [
+    '<img src="a.png">',
+    "<IMG SRC='a.png'>",
+    '<Img alt="x" src=a.png>',
+    '<iMg src="a.png"/>',
+])
+def test_img_tags_are_found_in_any_case(html):
+    assert extract_field(f"Recto {html}") == ("Recto", ["a.png"])
+
+
+def test_plain_text_and_entities():
+    assert extract_field("  l&#39;ombre &eacute;claire ") == ("l'ombre éclaire", [])
+    assert extract_field("<b>a</b>&nbsp;&quot;b&quot;") == ('a\xa0"b"', [])
+
+
+@pytest.mark.parametrize("html, text", [
+    # Texte affiché tel quel dans Anki : le frontend l'insère par innerHTML
+    ("<div>5 &lt;img src=x onerror=alert(1)&gt;</div>", "5 &lt;img src=x onerror=alert(1)&gt;"),
+    ("x &lt; y &amp;&amp; y &gt; z", "x &lt; y &amp;&amp; y &gt; z"),
+    ("&#60;script&#x3E; &amp;lt; &copy;", "&lt;script&gt; &amp;lt; ©"),
+    ("AT&amp;T &inconnue;", "AT&amp;T &inconnue;"),
+])
+def test_markup_entities_stay_escaped(html, text):
+    assert extract_field(html) == (text, [])
+
+
+def test_fields_dedup_images_and_drop_empty_texts():
+    fields = {
+        "Front": {"value": '<div>Cube</div><img src="c%20.png">'},
+        "Back": {"value": '<img src="c%20.png"><img src="d&amp;e.png">'},
+    }
+    assert extract_fields(fields) == ({"Front": "Cube"}, ["c%20.png", "d&e.png"])
@@ -0,0 +1,57 @@
+"""
+fetch_media : dédoublonnage, lots retrieveMediaFile via multi, écritures atomiques.
+"""
+import base64
+
+from src.anki_interface import media
+from src.anki_interface.media import fetch_media
+
+FILES = {f"img_{i}.png": f"image {i}".encode() for i in range(10)}
+
+
+def _serve_media(request):
+    assert request["action"] == "multi"
+    results = []
+    for sub in request["params"]["actions"]:
+        assert sub["action"] == "retrieveMediaFile"
+        data = FILES.get(sub["params"]["filename"])
+        results.append({"result": base64.b64encode(data).decode() if data else False, "error": None})
+    return {"result": results, "error": None}
+
+
+def test_fetch_media_batches_missing_files(stub_anki_client, tmp_path, monkeypatch):
+    monkeypatch.setattr(media, "_MEDIA_BATCH_SIZE", 4)
+    client = stub_anki_client(_serve_media)
+    (tmp_path / "img_0.png").write_bytes(b"deja la")
+    wanted = list(FILES) + ["img_1.png", "absent.png"]
+
+    stats = fetch_media(wanted, str(tmp_path), max_workers=2, client=client)
+
+    assert stats["requested"] == 12
+    assert stats["unique"] == 11
+    assert stats["already_present"] == 1
+    assert stats["downloaded"] == 9
+    assert stats["failed"] == 1
+    assert stats["available"] == set(FILES)
+    # 10 fichiers manquants, lots de 4 au plus : 3 requêtes multi
+    assert len(client.session.requests) == 3
+    assert (tmp_path / "img_0.png").read_bytes() == b"deja la"
+    assert (tmp_path / "img_7.png").read_bytes() == FILES["img_7.png"]
+    assert not list(tmp_path.glob(".*.part"))
+
+
+def test_fetch_media_copies_from_source_dir(stub_anki_client, tmp_path):
+    source = tmp_path / "collection.media"
+    source.mkdir()
+    (source / "a.png").write_bytes(b"a")
+    client = stub_anki_client(_unexpected_request)
+
+    stats = fetch_media(["a.png", "b.png"], str(tmp_path / "out"), client=client, source_dir=str(source))
+
+    assert stats["available"] == {"a.png"}
+    assert stats["failed"] == 1
+    assert client.session.requests == []
+
+
+def _unexpected_request(request):
+    raise AssertionError(f"requête AnkiConnect inattendue : {request}")
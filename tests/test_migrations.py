@@ -0,0 +1,135 @@
+"""
+Migrations de cards.db : d'une base au schéma d'origine jusqu'à user_version 6.
+"""
+import json
+import sqlite3
+from datetime import date
+
+import pytest
+
+from src.graph import cards_db
+from src.graph.migrations import Migration, apply_migrations, get_schema_version
+
+# Schéma de cards.db avant les migrations numérotées (colonnes scalaires des
+# cartes locales et tags_json compris)
+_BASELINE_SCHEMA_SQL = """
+CREATE TABLE cards (
+    card_id TEXT PRIMARY KEY,
+    card_type INTEGER NOT NULL DEFAULT 0,
+    queue INTEGER NOT NULL DEFAULT 0,
+    due_date TEXT,
+    raw_due INTEGER,
+    interval INTEGER NOT NULL DEFAULT 0,
+    ease_factor REAL NOT NULL DEFAULT 2.5,
+    locally_managed BOOLEAN NOT NULL DEFAULT 0,
+    texts_json TEXT,
+    image_filenames_json TEXT,
+    tags_json TEXT,
+    reps INTEGER NOT NULL DEFAULT 0,
+    lapses INTEGER NOT NULL DEFAULT 0,
+    is_blocking BOOLEAN NOT NULL DEFAULT 0,
+    is_blocked BOOLEAN NOT NULL DEFAULT 0,
+    topo_depth INTEGER NOT NULL DEFAULT 0,
+    min_interval INTEGER,
+    front_text TEXT,
+    back_text TEXT,
+    image_filename TEXT,
+    created_at TEXT
+);
+"""
+
+
+@pytest.fixture
+def baseline_db(tmp_path, monkeypatch):
+    """cards.db au schéma d'origine : une carte Anki en révision, une carte locale."""
+    path = tmp_path / "cards.db"
+    conn = sqlite3.connect(str(path))
+    conn.executescript(_BASELINE_SCHEMA_SQL)
+    conn.execute(
+        "INSERT INTO cards (card_id, card_type, due_date, texts_json, image_filenames_json, tags_json) "
+        "VALUES ('1', 2, '2030-01-01T00:00:00', ?, ?, ?)",
+        (json.dumps({"Front": "été"}), json.dumps(["a.png", "b.png"]), json.dumps(["dessin", "visages"])),
+    )
+    conn.execute(
+        "INSERT INTO cards (card_id, front_text, image_filename, tags_json) "
+        "VALUES ('local_1', 'Recto', 'c.png', '[\"dessin\", \"\"]')"
+    )
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(cards_db, "get_cards_db_path", lambda: path)
+    return path
+
+
+def test_baseline_schema_migrates_to_latest_version(baseline_db):
+    conn = cards_db.get_cards_db_conn()
+    try:
+        assert cards_db.migrate_cards_db(conn) == [1, 2, 3, 4, 5, 6]
+        assert get_schema_version(conn) == 6
+
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(cards)")}
+        assert {"anki_mod", "content_hash", "due_day", "row_version"} <= columns
+        assert not columns & {"front_text", "back_text", "image_filename"}
+
+        rows = dict((row[0], row[1:]) for row in conn.execute(
+            "SELECT card_id, texts_json, image_filenames_json, tags_json, due_day FROM cards"
+        ))
+        # JSON compact, carte locale passée aux colonnes JSON, tags_json vidé
+        assert rows["1"] == ('{"Front":"été"}', '["a.png","b.png"]', None, date(2030, 1, 1).toordinal())
+        assert rows["local_1"] == ('{"Front":"Recto"}', '["c.png"]', None, 0)
+        assert cards_db.get_tag_counts(conn) == {"dessin": 2, "visages": 1}
+
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {"idx_cards_due_day", "idx_cards_blocking", "idx_card_tags_tag"} <= indexes
+
+        # Base à jour : plus rien à jouer
+        assert cards_db.migrate_cards_db(conn) == []
+    finally:
+        conn.close()
+
+
+def test_interrupted_migration_is_rolled_back():
+    conn = sqlite3.connect(":memory:")
+
+    def fail(conn):
+        conn.execute("CREATE TABLE t (x)")
+        raise RuntimeError("coupure")
+
+    migrations = [
+        Migration(1, "table config", lambda c: c.execute("CREATE TABLE config (key, value)")),
+        Migration(2, "échoue", fail),
+    ]
+    with pytest.raises(RuntimeError):
+        apply_migrations(conn, migrations, "test.db")
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert get_schema_version(conn) == 1
+    assert tables == {"config"}
+
+
+def test_compact_json_migration_only_rewrites_non_compact_rows(cards_db_path):
+    rows = [
+        ("compact", '{"Front":"été"}', '["a.png"]'),
+        ("spaces", '{"Front": "x"}', '[]'),
+        ("escaped", '{"Front":"\\u00e9t\\u00e9"}', '[]'),
+        ("invalid", '{"Front":', '["b.png", "c.png"]'),
+    ]
+    conn = cards_db.get_cards_db_conn()
+    try:
+        conn.executemany(
+            "INSERT INTO cards (card_id, texts_json, image_filenames_json, row_version) VALUES (?, ?, ?, 3)",
+            rows,
+        )
+        conn.execute("PRAGMA user_version = 5")
+        conn.commit()
+
+        assert cards_db.migrate_cards_db(conn) == [6]
+        migrated = {row[0]: row[1:] for row in conn.execute(
+            "SELECT card_id, texts_json, image_filenames_json, row_version FROM cards"
+        )}
+    finally:
+        conn.close()
+    assert migrated == {
+        "compact": ('{"Front":"été"}', '["a.png"]', 3),
+        "spaces": ('{"Front":"x"}', '[]', 4),
+        "escaped": ('{"Front":"été"}', '[]', 4),
+        "invalid": ('{"Front":', '["b.png","c.png"]', 4),
+    }
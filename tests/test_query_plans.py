@@ -0,0 +1,45 @@
+"""
+Plans de requête (EXPLAIN QUERY PLAN) : la file du jour, les cartes lointaines
+et les cartes bloquantes sont lues par leur index partiel, pas par un scan de cards.
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from src.anki_sketching.api import routes
+from src.graph.cards_db import cards_db_conn
+
+_TODAY = date.today().toordinal()
+
+
+@pytest.fixture
+def conn(cards_db_path):
+    """cards.db avec des cartes de tous types (nouvelles, en révision, suspendues, bloquantes)."""
+    today = date.today()
+    rows = [
+        (str(i), i % 4, -1 if i % 10 == 0 else i % 4,
+         None if i % 4 == 0 else (today + timedelta(days=i % 30 - 5)).isoformat(),
+         int(i % 7 == 0))
+        for i in range(500)
+    ]
+    with cards_db_conn() as conn:
+        conn.executemany(
+            "INSERT INTO cards (card_id, card_type, queue, due_date, is_blocking) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        yield conn
+
+
+def _plan(conn, sql: str, params: tuple) -> list[str]:
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+@pytest.mark.parametrize("sql, params, index", [
+    (routes._DUE_CARDS_SQL, (_TODAY,), "idx_cards_due_day"),
+    (routes._DISTANT_CARDS_SQL, (_TODAY + 5,), "idx_cards_due_day"),
+    (routes._BLOCKING_CARDS_SQL, (), "idx_cards_blocking"),
+], ids=["due_cards", "distant_cards", "blocking_cards"])
+def test_queue_queries_use_their_index(conn, sql, params, index):
+    plan = _plan(conn, sql, params)
+    assert plan[0].startswith("SEARCH cards USING") and index in plan[0], plan
+    assert not any(step.startswith("SCAN cards") for step in plan), plan